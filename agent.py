@@ -1,106 +1,144 @@
-from langchain.vectorstores import Chroma
-from langchain.embeddings import SentenceTransformerEmbeddings
 from langchain.agents import initialize_agent, AgentType
 from langchain.tools import Tool
-from langchain_google_genai import ChatGoogleGenerativeAI
 from web_search import web_search_tool
 from product_scraper import product_scraper_tool
-import os, sys
+import os, sys, threading
 from product_tool import product_comparison_agent_tool, product_comparison_tool
-from memory_manager import add_new_memory, get_all_memories
+from memory_manager import add_new_memory, get_all_memories, request_preferences
 from review_synthesis_tool import review_synthesis_tool
+from request_context import DEFAULT_USER_ID, current_user_id, request_scope
+from response_cache import response_cache, context_key
+from context_builder import PromptBudgetCallback, build_preference_context
+from agent_events import AgentEventStream
+from tracing import span
+from vector_index import get_preference_index
+from shared_resources import get_llm, get_vectorstore, get_embeddings, lazy_resource, startup_report
 
 
 sys.path.append(os.path.dirname(__file__))
 
-# Initialize LLM (can use OpenAI or any supported LLM)
-llm = ChatGoogleGenerativeAI(
-    model="gemini-pro-latest",
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    temperature=0
-)
+# The LLM (Gemini), embedding model and ChromaDB store are built lazily by
+# shared_resources on first use, so importing this module stays cheap.
 #for m in genai.list_models():
 #    print(m.name, " — supports ", m.supported_generation_methods)
 
-# Embedding wrapper
-embedding_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-
-# Connect to ChromaDB
-vectorstore = Chroma(
-    collection_name="user_preferences",
-    embedding_function=embedding_model,
-    persist_directory="./chroma_db"
-)
-
-print(vectorstore._collection.name)
-# Get count of stored items
-try:
-    count = len(vectorstore.get())
-    print(f"Number of stored preference documents: {count}")
-except Exception as e:
-    print("Could not read from ChromaDB:", e)
-
-    
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
 
 # Tools
 retriever_tool = Tool(
     name="PreferenceRetriever",
-    func=lambda query: retriever.get_relevant_documents(query),
-    description="Fetches user preferences for personalized shopping."
+    # Reuses the preferences already retrieved for this request (see request_preferences)
+    func=lambda query: request_preferences(query),
+    description="Fetches the current user's preferences for personalized shopping."
 )
 
 # Load tools
 tools = [retriever_tool, web_search_tool, product_scraper_tool, review_synthesis_tool, product_comparison_agent_tool]  # Add more tools as needed
 
+
 # Initialize Agent
-agent = initialize_agent(
-    tools=tools,
-    llm=llm,
-    agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-    verbose=True,
-    handle_parsing_errors=True
-)
+def build_agent():
+    """Build a new agent executor over the shared LLM and tools (used by the agent pool)."""
+    return initialize_agent(
+        tools=tools,
+        llm=get_llm(),
+        agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        verbose=True,
+        handle_parsing_errors=True
+    )
+
+
+@lazy_resource("agent")
+def get_agent():
+    return build_agent()
+
+
+def __getattr__(name):
+    # Backwards compatibility for code that used the old import-time globals
+    lazy = {"llm": get_llm, "embedding_model": get_embeddings, "vectorstore": get_vectorstore,
+            "agent": get_agent}
+    if name in lazy:
+        return lazy[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up():
+    """Build the shared components every request uses: LLM, embedder, vector store and preference index."""
+    get_llm()
+    get_embeddings()
+    get_vectorstore()
+    get_preference_index()
+
 
-def run_rag_agent(query: str, k: int = 3) -> str:
+def profile_startup() -> str:
+    """Build every lazy component in dependency order and return the per-component timing report."""
+    warm_up()
+    get_agent()
+    return startup_report()
+
+
+def run_rag_agent(query: str, k: int = 3, agent_executor=None, user_id: str = DEFAULT_USER_ID,
+                  use_cache: bool = True, stream: bool = False, events: AgentEventStream = None):
     """Orchestrator that combines RAG retrieval with the existing multi-step agent.
 
     Steps:
-    1. Use the Chroma retriever to fetch top-k documents relevant to `query`.
+    1. Fetch the user's top-k preferences for `query` with request_preferences (once per
+       request; PreferenceRetriever tool calls reuse them).
     2. Create a compact context summary from those documents.
     3. Call the initialized agent with the augmented prompt (context + user query).
 
     Returns the agent response string. Errors and empty retrievals are handled gracefully.
+    `agent_executor` overrides the process-wide agent (the agent pool passes its own).
+    Preference lookups, including PreferenceRetriever tool calls, only see `user_id`'s data.
+    With `use_cache`, near-identical earlier questions with the same user context are
+    answered from the semantic response cache (see response_cache).
+
+    With `stream=True` this returns a generator of event dicts instead (see
+    stream_rag_agent). `events` attaches an AgentEventStream to the run without
+    changing the return value; the caller is responsible for closing it.
     """
+    if stream:
+        return stream_rag_agent(query, k, agent_executor, user_id, use_cache)
+    with request_scope(user_id, query), span("run_rag_agent", "request", user_id=user_id, k=k) as s:
+        answer = _run_rag_agent(query, k, agent_executor, use_cache, events)
+        if isinstance(answer, str) and answer.startswith(("Agent execution failed:", "Both retriever and agent failed:")):
+            s.status = "error"
+        return answer
+
+
+def stream_rag_agent(query: str, k: int = 3, agent_executor=None, user_id: str = DEFAULT_USER_ID,
+                     use_cache: bool = True):
+    """Run the agent in a background thread and yield its events (see agent_events), ending with "final"."""
+    events = AgentEventStream()
+
+    def _run():
+        try:
+            events.close(output=run_rag_agent(query, k, agent_executor, user_id, use_cache, events=events))
+        except Exception as e:
+            events.close(error=str(e))
+
+    threading.Thread(target=_run, name="agent-stream", daemon=True).start()
+    yield from events.events()
+
+
+def _run_rag_agent(query: str, k: int, agent_executor, use_cache: bool, events=None) -> str:
+    agent = agent_executor or get_agent()
+    budget_report = PromptBudgetCallback()
+    callbacks = [budget_report] + ([events] if events else [])
     try:
-        # fetch docs (respect the requested k)
-        docs = retriever.get_relevant_documents(query)
+        # fetch docs once per request (respect the requested k)
+        docs = request_preferences(query, k=k)
     except Exception as e:
         # Retriever failed — fall back to running the agent without context
         print(f"Retriever error: {e}")
         try:
-            return agent.run({"input": query})
+            return agent.run({"input": query}, callbacks=callbacks)
         except Exception as agent_e:
             return f"Both retriever and agent failed: retriever={e}; agent={agent_e}"
+        finally:
+            print("Prompt tokens per agent step:\n" + budget_report.report())
 
-    # Build compact context
-    if not docs:
-        context = ""  # no retrieved context
-    else:
-        # Keep each doc short: include source (if available) and first 300 characters
-        ctx_items = []
-        for d in docs[:k]:
-            src = None
-            try:
-                src = d.metadata.get("source") if isinstance(d.metadata, dict) else None
-            except Exception:
-                src = None
-            snippet = (d.page_content[:300] + "...") if len(d.page_content) > 300 else d.page_content
-            if src:
-                ctx_items.append(f"Source: {src}\n{snippet}")
-            else:
-                ctx_items.append(snippet)
-        context = "\n\n".join(ctx_items)
+    # Build compact context within the preference token budget
+    context = build_preference_context(docs)
 
     # Compose an augmented prompt for the agent
     if context:
@@ -112,13 +150,45 @@ def run_rag_agent(query: str, k: int = 3) -> str:
     else:
         augmented = query
 
+    # Serve near-identical questions with the same user context from the semantic cache
+    cache_vec = ctx_key = None
+    if use_cache:
+        try:
+            cache_vec = response_cache.embed(query)
+            ctx_key = context_key(current_user_id.get(), context)
+            hit = response_cache.lookup(cache_vec, ctx_key)
+            if hit is not None:
+                answer, similarity, cached_query = hit
+                print(f"Response cache hit ({similarity:.3f} similar to: {cached_query!r})")
+                return answer
+        except Exception as e:
+            print(f"Response cache unavailable: {e}")
+            cache_vec = None
+
     try:
-        return agent.run({"input": augmented})
+        answer = agent.run({"input": augmented}, callbacks=callbacks)
     except Exception as e:
         return f"Agent execution failed: {e}"
+    finally:
+        print("Prompt tokens per agent step:\n" + budget_report.report())
+    if cache_vec is not None:
+        response_cache.store(query, cache_vec, ctx_key, answer)
+    return answer
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        print(profile_startup())
+        sys.exit(0)
+    if "--compare" in sys.argv:
+        # Parallel pipeline instead of the ReAct loop: agent.py --compare "<query>" [n]
+        from comparison_pipeline import compare_products
+
+        args = sys.argv[sys.argv.index("--compare") + 1:]
+        for comparison in compare_products(args[0], int(args[1]) if len(args) > 1 else 3):
+            print(comparison.json())
+        sys.exit(0)
+
     query = "Compare the top three noise-canceling headphones and summarize their user reviews"
     # Use the RAG + multi-step agent executor
     response = run_rag_agent(query)
-    print(response)
\ No newline at end of file
+    print(response)
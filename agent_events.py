@@ -0,0 +1,96 @@
+# agent_events.py
+"""
+Live events from an agent run, for streaming UIs.
+
+AgentEventStream is a callback handler that turns LangChain callbacks into
+plain dicts on a thread-safe queue; the agent runs in a worker thread and the
+UI iterates `events()` in its own thread. Event types:
+
+  token        {"text"}                  LLM output as it is generated
+  tool_start   {"tool", "input"}
+  tool_end     {"tool", "output"}
+  tool_error   {"tool", "error"}
+  comparison   {"rows"}                  product rows produced by product_comparison_tool
+  final        {"output"} or {"error"}   always the last event
+"""
+import json
+import queue
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Tool observations are cut to this many characters in tool_end events.
+MAX_EVENT_OUTPUT_CHARS = 2000
+
+_DONE = object()
+
+
+def comparison_rows(output) -> list:
+    """Product rows in a product_comparison_tool output (single object or batch array), errors skipped."""
+    try:
+        data = json.loads(output) if isinstance(output, str) else output
+    except (TypeError, ValueError):
+        return []
+    items = data if isinstance(data, list) else [data]
+    return [item for item in items if isinstance(item, dict) and "error" not in item and item.get("product_name")]
+
+
+class AgentEventStream(BaseCallbackHandler):
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.closed = False
+
+    def emit(self, event_type: str, **data):
+        self._queue.put(dict(data, type=event_type))
+
+    # Having these two methods makes LangChain chat models stream (so on_llm_new_token
+    # fires) when this handler is attached; outputs pass through unchanged.
+    def tap_output_iter(self, run_id, output):
+        return output
+
+    def tap_output_aiter(self, run_id, output):
+        return output
+
+    def on_llm_new_token(self, token, **kwargs):
+        if token:
+            self.emit("token", text=token)
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.emit("tool_start", tool=(serialized or {}).get("name") or kwargs.get("name"), input=str(input_str))
+
+    def on_tool_end(self, output, **kwargs):
+        name = kwargs.get("name")
+        text = output if isinstance(output, str) else json.dumps(output, default=str)
+        self.emit("tool_end", tool=name, output=text[:MAX_EVENT_OUTPUT_CHARS])
+        if name == "product_comparison_tool":
+            rows = comparison_rows(text)
+            if rows:
+                self.emit("comparison", rows=rows)
+
+    def on_tool_error(self, error, **kwargs):
+        self.emit("tool_error", tool=kwargs.get("name"), error=str(error))
+
+    def close(self, output: str = None, error: str = None):
+        """Emit the final event and end `events()`. Only the first call has any effect."""
+        if self.closed:
+            return
+        self.closed = True
+        if error is not None:
+            self.emit("final", error=error)
+        else:
+            self.emit("final", output=output)
+        self._queue.put(_DONE)
+
+    def events(self, poll_interval: float = None):
+        """
+        Yield events until the final one. With `poll_interval`, yield None whenever
+        that many seconds pass without an event, so callers can refresh their UI.
+        """
+        while True:
+            try:
+                event = self._queue.get(timeout=poll_interval)
+            except queue.Empty:
+                yield None
+                continue
+            if event is _DONE:
+                return
+            yield event
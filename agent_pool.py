@@ -0,0 +1,160 @@
+# agent_pool.py
+"""
+Process-wide pool of warm agent executors shared by every Streamlit session.
+
+A fixed number of worker threads each build their own agent executor up front
+and then serve requests from one FIFO queue. Before taking work, the workers
+also build the shared LLM, embedder, vector store and preference index, so the
+first request does not pay for loading them. The queue is bounded: when it is
+full, `submit` raises PoolBusyError so the UI can push back instead of piling
+up work. Each request gets an AgentTicket that reports its queue position and,
+for streaming requests, carries the run's live events.
+"""
+from collections import deque
+from concurrent.futures import Future
+import itertools
+import os
+import threading
+
+POOL_WORKERS = int(os.getenv("AGENT_POOL_WORKERS", "3"))
+MAX_PENDING = int(os.getenv("AGENT_POOL_MAX_PENDING", "12"))
+
+
+class PoolBusyError(RuntimeError):
+    """Raised when the request queue is full."""
+
+
+class AgentTicket:
+    """Handle for one queued agent request."""
+
+    def __init__(self, pool, ticket_id, question, k, user_id, stream=False):
+        from agent_events import AgentEventStream
+
+        self.id = ticket_id
+        self.question = question
+        self.k = k
+        self.user_id = user_id
+        self.future = Future()
+        # Live events of the run (see agent_events); None unless submitted with stream=True
+        self.events = AgentEventStream() if stream else None
+        self._pool = pool
+
+    def position(self) -> int:
+        """1-based position in the queue, or 0 once a worker has picked it up."""
+        return self._pool.position(self)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout=None) -> str:
+        return self.future.result(timeout=timeout)
+
+
+class AgentPool:
+    def __init__(self, workers: int = POOL_WORKERS, max_pending: int = MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._busy = 0
+        self._ready = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"agent-pool-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, question: str, k: int = 3, user_id: str = None, stream: bool = False) -> AgentTicket:
+        """Queue a request; raises PoolBusyError if MAX_PENDING requests are already waiting.
+
+        With `stream`, the ticket's `events` stream the run's progress as it happens.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Agent pool is shut down.")
+            if len(self._pending) >= self.max_pending:
+                raise PoolBusyError(f"Agent queue is full ({self.max_pending} requests waiting).")
+            ticket = AgentTicket(self, next(self._ids), question, k, user_id, stream)
+            self._pending.append(ticket)
+            self._cond.notify()
+        return ticket
+
+    def position(self, ticket: AgentTicket) -> int:
+        with self._cond:
+            try:
+                return self._pending.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"workers": self.workers, "ready": self._ready, "busy": self._busy, "queued": len(self._pending)}
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            while self._pending:
+                ticket = self._pending.popleft()
+                ticket.future.set_exception(RuntimeError("Agent pool is shut down."))
+                if ticket.events:
+                    ticket.events.close(error="Agent pool is shut down.")
+            self._cond.notify_all()
+
+    def _worker(self):
+        from agent import build_agent, run_rag_agent, warm_up
+
+        try:
+            warm_up()  # shared lazy resources; only the first worker actually builds them
+        except Exception as e:
+            print(f"Agent pool warm-up failed: {e}")
+        try:
+            executor = build_agent()
+        except Exception as e:
+            print(f"Agent pool worker failed to start: {e}")
+            executor = None
+        with self._cond:
+            self._ready += 1
+
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                ticket = self._pending.popleft()
+                self._busy += 1
+            try:
+                if ticket.future.set_running_or_notify_cancel():
+                    result = run_rag_agent(
+                        ticket.question, k=ticket.k, agent_executor=executor, user_id=ticket.user_id,
+                        events=ticket.events,
+                    )
+                    ticket.future.set_result(result)
+                    if ticket.events:
+                        ticket.events.close(output=result)
+            except Exception as e:
+                ticket.future.set_exception(e)
+                if ticket.events:
+                    ticket.events.close(error=str(e))
+            finally:
+                if ticket.events:
+                    ticket.events.close(error="Request was cancelled.")
+                with self._cond:
+                    self._busy -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> AgentPool:
+    """Return the process-wide pool, starting (and warming) it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = AgentPool()
+    return _pool
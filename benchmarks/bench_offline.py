@@ -0,0 +1,233 @@
+# benchmarks/bench_offline.py
+"""
+Offline throughput and latency suite for the main request paths.
+
+Nothing touches the network: pages come from benchmarks/fixtures through a
+requests adapter, SerpAPI, Gemini, OpenAI and the embedding model are replaced
+by the deterministic stand-ins in benchmarks/offline.py, and every store the
+app writes (Chroma, caches, traces) lives in a scratch --workdir. Each fake
+backend sleeps for a configurable latency, so results reflect our own
+overhead plus a realistic, fixed backend cost.
+
+Benchmarks:
+  scraper     product_scraper_tool over the Amazon, Flipkart and generic fixtures
+              (scrape cache off unless --scrape-cache)
+  synthesis   safe_synthesize_reviews in "llm" and "local" modes
+  retrieval   retrieve_preferences for one user out of --users, over --preferences rows
+  agent       end-to-end run_rag_agent (search -> synthesis -> comparison), response cache off
+
+Usage:
+    python benchmarks/bench_offline.py --iterations 50 --concurrency 4 --output bench.json
+    python benchmarks/bench_offline.py --only scraper agent --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import offline  # noqa: E402
+
+BENCHES = ("scraper", "synthesis", "retrieval", "agent")
+QUERY = "Compare the top three noise-canceling headphones and summarize their user reviews"
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(name, fn, iterations, concurrency, warmup=1):
+    """Call `fn(i)` `iterations` times from `concurrency` threads; a call fails if it raises or returns False."""
+    for i in range(warmup):
+        fn(-1 - i)
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            ok = fn(i) is not False
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with contextlib.redirect_stdout(io.StringIO()):  # the app prints progress on every call
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(iterations)))
+        wall = time.perf_counter() - started
+
+    latencies = [s for s, _ in samples]
+    return {
+        "name": name,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, ok in samples if not ok),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(iterations / wall, 2) if wall else None,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+    }
+
+
+# --- Benchmarks --- #
+def bench_scraper(args):
+    import scrape_cache
+    from product_scraper import product_scraper_tool
+
+    scrape_cache.CACHE_ENABLED = args.scrape_cache
+
+    def run(_):
+        results = json.loads(product_scraper_tool.invoke({"url_list": offline.PRODUCT_URLS}))
+        return all(r.get("status") == "ok" for r in results)
+
+    return [measure("scraper", run, args.iterations, args.concurrency)]
+
+
+def bench_synthesis(args):
+    from review_synthesis_tool import safe_synthesize_reviews
+
+    with open(os.path.join(offline.FIXTURE_DIR, "amazon_product.html"), encoding="utf-8") as f:
+        html = f.read()
+    from product_scraper import parse_page, scrape_amazon
+    _, base = scrape_amazon(parse_page(html, "amazon"))
+    # Mostly distinct reviews with some verbatim repeats, like a harvested review set
+    reviews = [f"{base[i % len(base)]} (order {i // 2})" for i in range(args.reviews)]
+
+    rows = []
+    for mode in ("llm", "local"):
+        rows.append(measure(f"synthesis[{mode}]", lambda _, m=mode: bool(safe_synthesize_reviews(reviews, mode=m)),
+                            args.iterations, args.concurrency))
+    return rows
+
+
+def _seed_preferences(args):
+    from user_preference import ingest
+
+    topics = ["budget under $100", "over-ear headphones", "long battery life", "eco-friendly brands",
+              "leather goods", "noise cancellation", "fast shipping", "lightweight laptops"]
+    records = (
+        (f"bench:{i}", f"User {i % args.users} prefers {topics[i % len(topics)]} and {topics[(i * 7) % len(topics)]}.",
+         f"user{i % args.users}")
+        for i in range(args.preferences)
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest(records)
+
+
+def bench_retrieval(args):
+    from memory_manager import retrieve_preferences
+
+    _seed_preferences(args)
+    queries = ["noise cancelling headphones", "cheap gifts", "laptop for travel", "sustainable fashion"]
+
+    def run(i):
+        return bool(retrieve_preferences(queries[i % len(queries)], k=3, user_id=f"user{i % args.users}"))
+
+    return [measure("retrieval", run, args.iterations, args.concurrency)]
+
+
+def bench_agent(args):
+    from agent import build_agent, run_rag_agent
+
+    local = threading.local()
+
+    def run(i):
+        # One executor per client thread, as in the agent pool
+        if not hasattr(local, "executor"):
+            local.executor = build_agent()
+        answer = run_rag_agent(QUERY, k=3, agent_executor=local.executor, user_id=f"user{i % args.users}",
+                               use_cache=False)
+        return isinstance(answer, str) and answer.lstrip().startswith("[")
+
+    return [measure("agent", run, args.iterations, args.concurrency)]
+
+
+# --- Report --- #
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results, baseline):
+    """Attach ratios against a previous report's rows with the same name (<1 latency / >1 throughput is better)."""
+    previous = {row["name"]: row for row in baseline.get("results", [])}
+    for row in results:
+        old = previous.get(row["name"])
+        if not old:
+            continue
+        row["vs_baseline"] = {
+            key: round(row[key] / old[key], 3) if old.get(key) else None
+            for key in ("p50_ms", "p95_ms", "throughput_per_s")
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHES, default=list(BENCHES))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="seconds per fixture page fetch")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="seconds per SerpAPI call")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per chat model call")
+    parser.add_argument("--embed-latency", type=float, default=0.002, help="seconds per embedded text")
+    parser.add_argument("--reviews", type=int, default=40, help="reviews per synthesis call")
+    parser.add_argument("--preferences", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--scrape-cache", action="store_true", help="keep the scrape cache on")
+    parser.add_argument("--workdir", default=None, help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--output", default=None, help="write the JSON report here as well")
+    parser.add_argument("--baseline", default=None, help="earlier report to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_offline_")
+    offline.install(workdir, fetch_latency=args.fetch_latency, search_latency=args.search_latency,
+                    llm_latency=args.llm_latency, embed_latency=args.embed_latency)
+
+    runners = {"scraper": bench_scraper, "synthesis": bench_synthesis,
+               "retrieval": bench_retrieval, "agent": bench_agent}
+    results = []
+    if "agent" in args.only and "retrieval" not in args.only:
+        _seed_preferences(args)
+    for name in BENCHES:
+        if name in args.only:
+            results.extend(runners[name](args))
+    if baseline:
+        compare(results, baseline)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+            "workdir": workdir,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,68 @@
+# benchmarks/bench_parse.py
+"""
+Compare full vs targeted HTML extraction on saved product pages.
+
+Usage:
+    python benchmarks/bench_parse.py amazon benchmarks/fixtures/amazon_product.html
+    python benchmarks/bench_parse.py flipkart benchmarks/fixtures/flipkart_product.html --repeat 20
+
+For every page, checks that both modes extract identical (specs, reviews) and
+reports mean parse+extract time and tracemalloc peak memory per mode as JSON.
+benchmarks/fixtures holds saved Amazon, Flipkart and generic product pages;
+the Amazon one embeds tag-like text in an inline script to exercise region
+slicing.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_scraper import EXTRACTORS, parse_page  # noqa: E402
+
+
+def measure(html, kind, mode, repeat):
+    extractor = EXTRACTORS[kind]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = extractor(parse_page(html, kind, mode))
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    extractor(parse_page(html, kind, mode))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return output, elapsed, peak
+
+
+def bench_page(path, kind, repeat=5):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        html = f.read()
+    full_out, full_t, full_peak = measure(html, kind, "full", repeat)
+    tgt_out, tgt_t, tgt_peak = measure(html, kind, "targeted", repeat)
+    return {
+        "page": os.path.basename(path),
+        "kind": kind,
+        "bytes": len(html.encode("utf-8")),
+        "outputs_match": full_out == tgt_out,
+        "full_ms": round(full_t * 1000, 2),
+        "targeted_ms": round(tgt_t * 1000, 2),
+        "full_peak_kb": round(full_peak / 1024, 1),
+        "targeted_peak_kb": round(tgt_peak / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=sorted(EXTRACTORS))
+    parser.add_argument("pages", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = [bench_page(p, args.kind, args.repeat) for p in args.pages]
+    print(json.dumps(rows, indent=2))
+    if not all(r["outputs_match"] for r in rows):
+        sys.exit(1)
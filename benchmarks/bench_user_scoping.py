@@ -0,0 +1,81 @@
+# benchmarks/bench_user_scoping.py
+"""
+Retrieval latency of user-scoped preference queries as the number of users grows.
+
+Builds a throwaway Chroma collection with random unit vectors (no embedding
+model needed), PREFS_PER_USER preferences per user, and measures p50/p99
+latency of k-NN queries filtered to one user with the `where` clause pushed
+down into Chroma, next to unfiltered queries over the whole collection.
+
+Usage:
+    python benchmarks/bench_user_scoping.py --users 10 100 1000 --prefs-per-user 20 --queries 200
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _unit(n, rng):
+    v = rng.standard_normal((n, DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def bench(users, prefs_per_user, queries, k=3, seed=7):
+    rng = np.random.default_rng(seed)
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="bench_users_"))
+    collection = client.create_collection("bench_user_preferences")
+
+    batch = 5000
+    total = users * prefs_per_user
+    for start in range(0, total, batch):
+        n = min(batch, total - start)
+        ids = [f"p{i}" for i in range(start, start + n)]
+        collection.add(
+            ids=ids,
+            embeddings=_unit(n, rng).tolist(),
+            documents=[f"preference {i}" for i in range(start, start + n)],
+            metadatas=[{"user_id": f"user{i // prefs_per_user}"} for i in range(start, start + n)],
+        )
+
+    pick = random.Random(seed)
+    query_vecs = _unit(queries, rng).tolist()
+    scoped, unscoped = [], []
+    for q in query_vecs:
+        user = f"user{pick.randrange(users)}"
+        t = time.perf_counter()
+        collection.query(query_embeddings=[q], n_results=k, where={"user_id": user})
+        scoped.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        collection.query(query_embeddings=[q], n_results=k)
+        unscoped.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "users": users,
+        "documents": total,
+        "scoped_p50_ms": round(statistics.median(scoped), 3),
+        "scoped_p99_ms": round(_percentile(scoped, 99), 3),
+        "unscoped_p50_ms": round(statistics.median(unscoped), 3),
+        "unscoped_p99_ms": round(_percentile(unscoped, 99), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--prefs-per-user", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps([bench(u, args.prefs_per_user, args.queries) for u in args.users], indent=2))
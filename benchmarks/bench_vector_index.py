@@ -0,0 +1,96 @@
+# benchmarks/bench_vector_index.py
+"""
+Recall and latency of the preference index backends (numpy, hnsw, chroma).
+
+Loads random unit vectors into a throwaway Chroma collection, builds each
+backend from it through vector_index.PreferenceIndex and compares recall@k
+against exact brute-force ground truth, plus p50/p99 latency of
+PreferenceIndex.query (what retrieval pays, sync check and Document building
+included) next to the p50 of the bare backend query.
+
+Usage:
+    python benchmarks/bench_vector_index.py --sizes 1000 20000 --queries 200 --k 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import vector_index  # noqa: E402
+
+DIM = 384
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench(size, queries, k, users=50, seed=11):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    user_of = [f"user{i % users}" for i in range(size)]
+
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="bench_index_"))
+    collection = client.create_collection("bench_index", metadata={"hnsw:space": "cosine"})
+    for start in range(0, size, 5000):
+        end = min(size, start + 5000)
+        collection.add(ids=[f"d{i}" for i in range(start, end)], embeddings=vectors[start:end].tolist(),
+                       documents=[f"doc {i}" for i in range(start, end)],
+                       metadatas=[{"user_id": user_of[i]} for i in range(start, end)])
+
+    query_vecs = rng.standard_normal((queries, DIM)).astype(np.float32)
+    query_vecs /= np.linalg.norm(query_vecs, axis=1, keepdims=True)
+    user_mask = {u: np.array([x == u for x in user_of]) for u in set(user_of)}
+
+    rows = []
+    backends = ["numpy", "chroma"] + (["hnsw"] if vector_index.hnswlib is not None else [])
+    for backend in backends:
+        vector_index.BACKEND = backend
+        started = time.perf_counter()
+        index = vector_index.PreferenceIndex(collection)
+        build_s = time.perf_counter() - started
+        for scoped in (False, True):
+            latencies, backend_latencies, recalls = [], [], []
+            for qi, q in enumerate(query_vecs):
+                user = f"user{qi % users}" if scoped else None
+                where = {"user_id": user} if user else None
+                scores = vectors @ q
+                if user:
+                    scores = np.where(user_mask[user], scores, -np.inf)
+                truth = {f"doc {i}" for i in np.argsort(-scores)[:k]}
+                t = time.perf_counter()
+                docs = index.query(q, k, where)
+                latencies.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                index.backend.query(q, k, where)
+                backend_latencies.append((time.perf_counter() - t) * 1000)
+                recalls.append(len({d.page_content for d in docs} & truth) / k)
+            rows.append({
+                "backend": backend, "rows": size, "filtered": scoped, "k": k,
+                "build_s": round(build_s, 3),
+                "recall": round(statistics.mean(recalls), 4),
+                "p50_ms": round(statistics.median(latencies), 3),
+                "p99_ms": round(_percentile(latencies, 99), 3),
+                "backend_p50_ms": round(statistics.median(backend_latencies), 3),
+            })
+    vector_index.BACKEND = "auto"
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps([row for size in args.sizes for row in bench(size, args.queries, args.k)], indent=2))
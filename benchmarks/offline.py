@@ -0,0 +1,206 @@
+# benchmarks/offline.py
+"""
+Offline stand-ins for every network dependency, used by bench_offline.py.
+
+  FixtureAdapter     requests transport adapter serving benchmarks/fixtures/*.html
+                     for Amazon, Flipkart and any other host, with added latency
+  FakeGoogleSearch   replaces serpapi's GoogleSearch; returns fixture product links
+  FakeChatModel      deterministic chat model returning a fixed Pros/Cons JSON
+  FakeAgentModel     deterministic ReAct script: search -> review synthesis ->
+                     product comparison -> final answer
+  HashEmbedder       SentenceTransformer replacement (hashed bag of words)
+
+`install(workdir, ...)` patches them into the application modules. All on-disk
+state (Chroma, caches, traces) goes to `workdir`.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+import types
+
+import numpy as np
+import requests
+from requests.adapters import BaseAdapter
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PRODUCT_URLS = [
+    "https://www.amazon.in/Sony-WH-1000XM5-Cancelling-Headphones/dp/B09XS7JWHH/",
+    "https://www.flipkart.com/boat-rockerz-551anc/p/itm5a9d7c4b2f3e1",
+    "https://shop.example.com/jbl-tune-770nc",
+]
+
+SYNTHESIS_REPLY = json.dumps({
+    "Pros": ["Excellent noise cancellation", "Long battery life", "Premium build"],
+    "Cons": ["Buggy companion app", "Average call quality outdoors"],
+})
+
+
+def _fixture_for(url: str) -> str:
+    host = requests.utils.urlparse(url).netloc
+    if "amazon" in host:
+        return "amazon_product.html"
+    if "flipkart" in host:
+        return "flipkart_product.html"
+    return "generic_product.html"
+
+
+class FixtureAdapter(BaseAdapter):
+    """Answers every request with the fixture page for its host after `latency` seconds."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self._pages = {}
+        for name in os.listdir(FIXTURE_DIR):
+            with open(os.path.join(FIXTURE_DIR, name), "rb") as f:
+                self._pages[name] = f.read()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.latency:
+            time.sleep(self.latency)
+        body = self._pages[_fixture_for(request.url)]
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers["Content-Type"] = "text/html; charset=utf-8"
+        resp.encoding = "utf-8"
+        resp.raw = io.BytesIO(body)
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+class FakeGoogleSearch:
+    """serpapi.GoogleSearch stand-in: every query returns the fixture product links."""
+
+    latency = 0.0
+
+    def __init__(self, params):
+        self.params = params
+
+    def get_dict(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return {"organic_results": [
+            {"position": i + 1, "title": f"Result {i + 1} for {self.params.get('q')}", "link": url}
+            for i, url in enumerate(PRODUCT_URLS[: self.params.get("num", 3)])
+        ]}
+
+
+class FakeChatModel(BaseChatModel):
+    """Returns `reply` after `latency` seconds, for every prompt."""
+
+    reply: str = SYNTHESIS_REPLY
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+class FakeAgentModel(FakeChatModel):
+    """Scripted ReAct turns, picked by how many tool observations the prompt already holds."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-agent"
+
+    def _turn(self, prompt: str) -> str:
+        # Only count observations in the scratchpad, not the format instructions above "Begin!"
+        steps = len(re.findall(r"^Observation:", prompt.rsplit("Begin!", 1)[-1], re.MULTILINE))
+        if steps == 0:
+            return "Thought: I should look up candidate products.\nAction: web_search_tool\nAction Input: best noise cancelling headphones"
+        if steps == 1:
+            reviews = ["Great noise cancellation.", "Battery lasts all week.", "App is buggy."]
+            return f"Thought: Summarize the reviews.\nAction: review_synthesis_tool\nAction Input: {json.dumps(reviews)}"
+        if steps == 2:
+            rows = [{"product_name": f"Product {i}", "price": 100.0 + i, "battery_life": "30 hours",
+                     "pros_summary": ["Excellent noise cancellation"], "cons_summary": ["Buggy app"]} for i in range(3)]
+            return f"Thought: Build the comparison.\nAction: product_comparison_tool\nAction Input: {json.dumps(rows)}"
+        return "Thought: I now know the final answer.\nFinal Answer: " + prompt.rsplit("Observation:", 1)[-1].split("\n")[0].strip()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = "\n".join(str(m.content) for m in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._turn(prompt)))])
+
+
+class HashEmbedder:
+    """SentenceTransformer stand-in: 384-d hashed bag-of-words vectors, `latency` seconds per text."""
+
+    dim = 384
+    latency = 0.0
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _vector(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", str(text).lower()):
+            h = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+            vec[h % self.dim] += 1.0 if h & 1 << 31 else -1.0
+        return vec
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, convert_to_numpy=True,
+               convert_to_tensor=False, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.latency:
+            time.sleep(self.latency * len(texts))
+        vectors = np.stack([self._vector(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors[0] if single else vectors
+
+
+def install(workdir: str, fetch_latency=0.0, search_latency=0.0, llm_latency=0.0, embed_latency=0.0):
+    """
+    Point the application at the offline stand-ins. Must run before the app modules
+    build any lazy resource. Returns the FakeAgentModel to hand to build_agent-style code.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # every store in the app uses a ./relative path
+    os.environ.setdefault("LLM_CACHE_ENABLED", "0")  # measure the calls, not cache hits
+
+    HashEmbedder.latency = embed_latency
+    sys.modules["sentence_transformers"] = types.SimpleNamespace(SentenceTransformer=HashEmbedder)
+    FakeGoogleSearch.latency = search_latency
+
+    import http_session
+    import shared_resources
+    import web_search
+    import review_synthesis_tool
+
+    adapter = FixtureAdapter(fetch_latency)
+    session = http_session.get_session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    web_search.GoogleSearch = FakeGoogleSearch
+
+    review_synthesis_tool.model = FakeChatModel(latency=llm_latency)
+    review_synthesis_tool.ChatOpenAI = lambda **kwargs: FakeChatModel(latency=llm_latency)
+
+    agent_model = FakeAgentModel(latency=llm_latency)
+    shared_resources.get_llm = lambda: agent_model
+    return agent_model
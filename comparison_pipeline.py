@@ -0,0 +1,162 @@
+# comparison_pipeline.py
+"""
+Parallel "compare N products" pipeline.
+
+The ReAct agent calls one tool per LLM round trip, so comparing three products
+costs a dozen sequential steps. This pipeline makes one planning call to pick
+the products, then runs search -> scrape -> review synthesis -> comparison for
+every product at the same time. End-to-end latency is the planning call plus
+the slowest product.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List
+import contextvars
+import json
+import os
+import re
+import time
+
+from web_search import web_search_tool
+from product_scraper import domain_kind, scrape_products
+from review_synthesis_tool import safe_synthesize_reviews, _parse_pros_cons
+from product_tool import create_product_comparison, specs_to_comparison_fields
+from product_schema import ProductComparison
+from memory_manager import retrieve_preferences
+from request_context import DEFAULT_USER_ID, request_scope
+from shared_resources import get_llm
+
+PIPELINE_CONCURRENCY = int(os.getenv("COMPARISON_PIPELINE_CONCURRENCY", "5"))
+PIPELINE_DEADLINE = float(os.getenv("COMPARISON_PIPELINE_DEADLINE", "90"))
+# Search results tried per product before giving up on it.
+MAX_LINKS_PER_PRODUCT = 2
+
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_CONCURRENCY, thread_name_prefix="compare")
+
+PLAN_PROMPT = """You are planning a product comparison.
+Request: {query}
+{preferences}
+Pick exactly {n} specific, currently sold products that best answer the request.
+Return only a JSON array with one object per product:
+[{{"name": "<full product name>", "search_query": "<web search that finds its Amazon or Flipkart page>"}}]"""
+
+
+# --- Planning --- #
+def plan_products(query: str, n: int) -> list:
+    """One LLM call: the products to compare, as [{"name", "search_query"}]."""
+    try:
+        docs = retrieve_preferences(query, k=3)
+        prefs = "\n".join(f"- {d.page_content[:200]}" for d in docs)
+    except Exception as e:
+        print(f"Preference lookup failed, planning without it: {e}")
+        prefs = ""
+    preferences = f"User preferences:\n{prefs}\n" if prefs else ""
+
+    reply = get_llm().invoke(PLAN_PROMPT.format(query=query, n=n, preferences=preferences))
+    text = getattr(reply, "content", reply)
+    match = re.search(r"\[.*\]", str(text), re.DOTALL)
+    try:
+        items = json.loads(match.group(0)) if match else []
+    except json.JSONDecodeError:
+        items = []
+
+    plan = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"name": item}
+        if not isinstance(item, dict) or not item.get("name"):
+            continue
+        name = str(item["name"]).strip()
+        plan.append({"name": name, "search_query": str(item.get("search_query") or f"{name} buy online")})
+    return plan[:n]
+
+
+# --- Per-product branch --- #
+def _search_links(search_query: str) -> list:
+    """Links from web_search_tool, Amazon/Flipkart pages first."""
+    output = web_search_tool.invoke(search_query) or ""
+    links = []
+    for line in str(output).splitlines():
+        link = line.rsplit(" — ", 1)[-1].strip()
+        if link.startswith("http"):
+            links.append(link)
+    return sorted(links, key=lambda link: domain_kind(link) == "generic")
+
+
+def _pros_cons(synthesis: str) -> dict:
+    """Pros/Cons lists from a review_synthesis_tool reply (JSON, or 'Pros:'/'Cons:' headed text)."""
+    parsed = _parse_pros_cons(synthesis)
+    if parsed["Pros"] or parsed["Cons"]:
+        return parsed
+    sections, current = {"Pros": [], "Cons": []}, None
+    for line in (synthesis or "").splitlines():
+        stripped = line.strip().strip("*#").strip()
+        heading = stripped.rstrip(":").strip().lower()
+        if heading in ("pros", "cons"):
+            current = heading.capitalize()
+        elif current and stripped:
+            sections[current].append(stripped.lstrip("-•0123456789. ").strip())
+    return sections
+
+
+def _compare_one(item: dict, deadline_at: float) -> ProductComparison:
+    links = _search_links(item["search_query"])
+    if not links:
+        raise ValueError(f"No search results for {item['name']!r}")
+
+    result = None
+    for link in links[:MAX_LINKS_PER_PRODUCT]:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+        result = scrape_products([link], deadline=remaining)[0]
+        if result.get("status") == "ok":
+            break
+    if not result or result.get("status") != "ok":
+        raise ValueError(f"Scraping failed for {item['name']!r}: {(result or {}).get('error', 'deadline exceeded')}")
+
+    reviews = [r for r in result.get("reviews") or [] if r != "No reviews found."]
+    pros_cons = _pros_cons(safe_synthesize_reviews(reviews)) if reviews else {"Pros": [], "Cons": []}
+
+    fields = specs_to_comparison_fields(result.get("specs"), result.get("url"))
+    if fields["product_name"] in ("", "N/A"):
+        fields["product_name"] = item["name"]
+    return create_product_comparison(
+        pros_summary=pros_cons["Pros"],
+        cons_summary=pros_cons["Cons"],
+        **fields,
+    )
+
+
+# --- Entry point --- #
+def compare_products(query: str, n: int = 3, deadline: float = PIPELINE_DEADLINE,
+                     user_id: str = DEFAULT_USER_ID) -> List[ProductComparison]:
+    """
+    Plan `n` products for `query` and build their comparisons in parallel.
+
+    Returns ProductComparison objects in planned order. Products whose branch
+    fails or misses the `deadline` (seconds) are left out and reported on stdout.
+    """
+    with request_scope(user_id):
+        plan = plan_products(query, n)
+        if not plan:
+            print("Comparison planning returned no products.")
+            return []
+        print("Comparison plan:", [item["name"] for item in plan])
+
+        deadline_at = time.monotonic() + deadline
+        # Each branch runs in a copy of this context: same user scope, and its spans nest under the caller's
+        futures = [_executor.submit(contextvars.copy_context().run, _compare_one, item, deadline_at)
+                   for item in plan]
+    wait(futures, timeout=deadline)
+
+    comparisons = []
+    for item, fut in zip(plan, futures):
+        if not fut.done():
+            fut.cancel()
+            print(f"Comparison for {item['name']!r} timed out after {deadline}s")
+            continue
+        try:
+            comparisons.append(fut.result())
+        except Exception as e:
+            print(f"Comparison for {item['name']!r} failed: {e}")
+    return comparisons
@@ -0,0 +1,206 @@
+# context_builder.py
+"""
+Token budgets for what goes into the agent's prompts.
+
+Retrieved preferences are packed into PREFERENCE_CONTEXT_TOKENS, and
+product_scraper observations (which the ReAct loop re-sends to the LLM on every
+later step) are projected down to a compact schema of title, the spec fields
+most relevant to the user's question, and the first reviews, within
+SCRAPER_OBSERVATION_TOKENS. The full review lists stay in the request state,
+keyed by product URL, so review_synthesis_tool can summarize every harvested
+review when the agent passes it that URL. Every cut is recorded for the current request, and
+PromptBudgetCallback reports the prompt tokens per agent step with and without
+the budgeting, plus what review deduplication saved in synthesis prompts.
+"""
+import json
+import re
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import get_buffer_string
+
+from request_context import request_state
+from token_counter import count_tokens, truncate_to_tokens
+
+PREFERENCE_CONTEXT_TOKENS = 400
+# Shared by all results of one product_scraper call.
+SCRAPER_OBSERVATION_TOKENS = 1500
+# Fraction of a product's share spent on specs; the rest goes to reviews.
+SPEC_SHARE = 0.4
+# Spec fields that matter to most comparisons even when the question does not mention them.
+PRIORITY_SPEC_TERMS = ("price", "battery", "brand", "model", "weight")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"the", "and", "for", "with", "that", "this", "are", "you", "your", "top", "best",
+              "compare", "comparison", "which", "what", "about", "from", "their", "summarize"}
+
+
+def _terms(text: str) -> set:
+    return {w.rstrip("s") for w in _WORD_RE.findall(str(text).lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+def _record_cut(kind: str, raw_tokens: int, kept_tokens: int):
+    cuts = request_state().setdefault("context_cuts", [])
+    cuts.append((kind, raw_tokens, kept_tokens))
+
+
+def record_review_dedup(stats: dict):
+    """Note a review_dedup pass of this request (reported by PromptBudgetCallback.report)."""
+    request_state().setdefault("review_dedup", []).append(stats)
+
+
+def tokens_saved() -> int:
+    """Tokens removed so far in this request by the budgets above."""
+    return sum(raw - kept for _, raw, kept in request_state().get("context_cuts", []))
+
+
+# --- Retrieved preferences --- #
+def _format_doc(doc, text: str) -> str:
+    src = doc.metadata.get("source") if isinstance(getattr(doc, "metadata", None), dict) else None
+    return f"Source: {src}\n{text}" if src else text
+
+
+def build_preference_context(docs, budget: int = PREFERENCE_CONTEXT_TOKENS) -> str:
+    """Join retrieved docs (best first) into at most `budget` tokens, giving each an equal share."""
+    if not docs:
+        return ""
+    share = max(budget // len(docs), 32)
+    items, used = [], 0
+    for doc in docs:
+        text = doc.page_content
+        if count_tokens(text) > share:
+            text = truncate_to_tokens(text, share).rstrip() + "..."
+        item = _format_doc(doc, text)
+        size = count_tokens(item)
+        if items and used + size > budget:
+            break
+        items.append(item)
+        used += size
+    context = "\n\n".join(items)
+    raw = "\n\n".join(_format_doc(d, d.page_content) for d in docs)
+    _record_cut("preferences", count_tokens(raw), count_tokens(context))
+    return context
+
+
+# --- Scraper observations --- #
+def rank_spec_fields(specs: dict, query: str) -> list:
+    """
+    Spec (key, value) pairs ordered by relevance to `query`.
+
+    List values such as "Key Features" are split into separate bullets so the
+    relevant ones can be kept without the rest. Ties keep page order.
+    """
+    query_terms = _terms(query)
+    scored = []
+    for key, value in (specs or {}).items():
+        if key == "Product Title":
+            continue
+        for item in (value if isinstance(value, list) else [value]):
+            terms = _terms(f"{key} {item}")
+            score = len(query_terms & terms)
+            if any(t in str(key).lower() for t in PRIORITY_SPEC_TERMS):
+                score += 0.5
+            scored.append((-score, len(scored), key, item))
+    scored.sort()
+    return [(key, item) for _, _, key, item in scored]
+
+
+def stash_reviews(url: str, reviews: list):
+    """Keep a product's full review list for this request, keyed by its URL."""
+    request_state().setdefault("scraped_reviews", {})[url] = list(reviews)
+
+
+def scraped_reviews(url: str):
+    """Full review list stashed for `url` in this request, or None."""
+    return request_state().get("scraped_reviews", {}).get(str(url).strip())
+
+
+def project_scraper_result(result: dict, query: str, budget: int) -> dict:
+    """
+    Compact {url, status, title, specs, reviews} view of one scraper result within `budget` tokens.
+
+    When reviews are cut, `reviews_total` gives the harvested count; the full list is
+    stashed (see `stash_reviews`) for review_synthesis_tool to pick up by URL.
+    """
+    if result.get("status") != "ok":
+        return result
+    specs = result.get("specs") or {}
+    compact = {"url": result.get("url"), "status": "ok", "title": specs.get("Product Title", "N/A"),
+               "specs": {}, "reviews": []}
+
+    spec_budget = int(budget * SPEC_SHARE)
+    used = 0
+    for key, item in rank_spec_fields(specs, query):
+        size = count_tokens(f"{key}: {item}")
+        if used + size > spec_budget:
+            continue
+        used += size
+        if isinstance(specs.get(key), list):
+            compact["specs"].setdefault(key, []).append(item)
+        else:
+            compact["specs"][key] = item
+
+    review_budget = budget - used
+    for review in result.get("reviews") or []:
+        review = truncate_to_tokens(str(review), max(review_budget // 3, 48))
+        size = count_tokens(review)
+        if compact["reviews"] and size > review_budget:
+            break
+        compact["reviews"].append(review)
+        review_budget -= size
+    reviews = result.get("reviews") or []
+    if reviews:
+        stash_reviews(result.get("url"), reviews)
+        if len(compact["reviews"]) < len(reviews):
+            compact["reviews_total"] = len(reviews)
+    if result.get("truncated"):
+        compact["truncated"] = True
+
+    _record_cut("scraper", count_tokens(json.dumps(result, ensure_ascii=False)),
+                count_tokens(json.dumps(compact, ensure_ascii=False)))
+    return compact
+
+
+def project_scraper_results(results: list, query: str, budget: int = SCRAPER_OBSERVATION_TOKENS) -> list:
+    """Project a product_scraper batch, splitting `budget` evenly across successful results."""
+    ok = sum(1 for r in results if r.get("status") == "ok")
+    share = budget // max(ok, 1)
+    return [project_scraper_result(r, query, share) for r in results]
+
+
+# --- Per-step prompt report --- #
+class PromptBudgetCallback(BaseCallbackHandler):
+    """Counts prompt tokens for every LLM call of an agent run, and what they would be unbudgeted."""
+
+    def __init__(self):
+        self.state = request_state()
+        self.steps = []
+
+    def _record(self, text: str):
+        after = count_tokens(text)
+        saved = sum(raw - kept for _, raw, kept in self.state.get("context_cuts", []))
+        self.steps.append({"step": len(self.steps) + 1, "prompt_tokens": after, "unbudgeted_tokens": after + saved})
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        for prompt in prompts:
+            self._record(prompt)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        for batch in messages:
+            self._record(get_buffer_string(batch))
+
+    def report(self) -> str:
+        if not self.steps:
+            return "No LLM calls recorded."
+        lines = ["step  prompt_tokens  unbudgeted"]
+        for s in self.steps:
+            lines.append(f"{s['step']:>4}  {s['prompt_tokens']:>13}  {s['unbudgeted_tokens']:>10}")
+        after = sum(s["prompt_tokens"] for s in self.steps)
+        before = sum(s["unbudgeted_tokens"] for s in self.steps)
+        lines.append(f"total {after:>12}  {before:>10}")
+        dedup = self.state.get("review_dedup", [])
+        if dedup:
+            lines.append(
+                f"review dedup: {sum(d['reviews_in'] for d in dedup)} -> {sum(d['reviews_out'] for d in dedup)} "
+                f"reviews, {sum(d['tokens_saved'] for d in dedup)} synthesis tokens saved"
+            )
+        return "\n".join(lines)
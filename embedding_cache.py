@@ -0,0 +1,229 @@
+# embedding_cache.py
+"""
+Content-addressed cache of sentence embeddings.
+
+Vectors are stored per (model, normalization) namespace in a memory-mapped
+float32 matrix (`<namespace>.f32`) with an append-only index file
+(`<namespace>.idx`) holding one 16-byte content hash per row. Opening the
+cache maps the matrix without copying it, and only texts never seen before
+reach the model.
+
+Several processes (the app and the ingestion CLI, say) can share one cache
+directory: appends hold an exclusive flock on the index file and take their
+row numbers from the index file's size, not from in-process state. Rows other
+processes appended are picked up on the next miss or write.
+
+CachedEmbedder is a drop-in for SentenceTransformer.encode; CachedEmbeddings
+adapts it to LangChain's Embeddings interface for Chroma.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, keep one writer per cache directory
+    fcntl = None
+
+CACHE_DIR = "./embedding_cache"
+CACHE_ENABLED = True
+_DIGEST_SIZE = 16
+_INITIAL_CAPACITY = 1024
+
+
+def content_hash(namespace: str, text: str) -> bytes:
+    return hashlib.blake2b(f"{namespace}\0{text}".encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+
+class EmbeddingStore:
+    """Append-only memory-mapped matrix of vectors addressed by content hash."""
+
+    def __init__(self, directory: str, namespace: str):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, re.sub(r"[^\w.-]+", "_", namespace))
+        self.namespace = namespace
+        self._matrix_path = base + ".f32"
+        self._index_path = base + ".idx"
+        self._meta_path = base + ".json"
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._indexed = 0  # index entries read so far (row numbers are positions in the index)
+        self._matrix = None
+        self.dim = None
+        self.capacity = 0
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _load_meta(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        if meta["capacity"] != self.capacity or self._matrix is None:
+            self.dim, self.capacity = meta["dim"], meta["capacity"]
+            self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+
+    def _refresh(self):
+        """Index rows appended since the last read, including by other processes. Caller holds _lock."""
+        try:
+            entries = os.path.getsize(self._index_path) // _DIGEST_SIZE
+        except FileNotFoundError:
+            return
+        if entries <= self._indexed:
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._indexed * _DIGEST_SIZE)
+            raw = f.read((entries - self._indexed) * _DIGEST_SIZE)
+        for i in range(len(raw) // _DIGEST_SIZE):
+            self._rows.setdefault(raw[i * _DIGEST_SIZE:(i + 1) * _DIGEST_SIZE], self._indexed + i)
+        self._indexed += len(raw) // _DIGEST_SIZE
+        if self._indexed > self.capacity:
+            self._load_meta()
+
+    def get_many(self, digests):
+        """Return a list of vectors (views into the mapped matrix) or None per digest."""
+        with self._lock:
+            if any(d not in self._rows for d in digests):
+                self._refresh()
+            return [self._matrix[self._rows[d]] if d in self._rows else None for d in digests]
+
+    def _grow(self, needed):
+        capacity = max(_INITIAL_CAPACITY, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        with open(self._matrix_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        with open(self._meta_path, "w") as f:
+            json.dump({"dim": self.dim, "capacity": capacity, "namespace": self.namespace}, f)
+
+    def add_many(self, digests, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, open(self._index_path, "ab") as index:
+            if fcntl is not None:
+                fcntl.flock(index, fcntl.LOCK_EX)  # released when the file is closed
+            # Another process may have appended rows (and grown the matrix) since we last looked
+            self._refresh()
+            self._load_meta()
+            index.truncate(self._indexed * _DIGEST_SIZE)  # drop a torn entry left by a crashed writer
+            fresh = {}
+            for d, v in zip(digests, vectors):
+                if d not in self._rows:
+                    fresh.setdefault(d, v)
+            if not fresh:
+                return
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            start = self._indexed
+            if start + len(fresh) > self.capacity:
+                self._grow(start + len(fresh))
+            for offset, vector in enumerate(fresh.values()):
+                self._matrix[start + offset] = vector
+            self._matrix.flush()
+            # Vectors are on disk before their index entries, so a crash never indexes a missing row
+            index.write(b"".join(fresh))
+            index.flush()
+            for offset, digest in enumerate(fresh):
+                self._rows[digest] = start + offset
+            self._indexed = start + len(fresh)
+
+
+class CachedEmbedder:
+    """Wraps a SentenceTransformer so `encode` only runs the model on uncached texts."""
+
+    def __init__(self, model, model_name: str, cache_dir: str = CACHE_DIR):
+        self.model = model
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self._stores = {}
+        self._stores_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+    def __getattr__(self, name):
+        # Everything else (get_sentence_embedding_dimension, device, ...) comes from the model
+        return getattr(self.model, name)
+
+    def _store(self, normalized: bool) -> EmbeddingStore:
+        namespace = f"{self.model_name}{'-normalized' if normalized else ''}"
+        with self._stores_lock:
+            if namespace not in self._stores:
+                self._stores[namespace] = EmbeddingStore(self.cache_dir, namespace)
+            return self._stores[namespace]
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_tensor: bool = False, **kwargs):
+        if convert_to_tensor or not CACHE_ENABLED:
+            return self.model.encode(sentences, batch_size=batch_size, normalize_embeddings=normalize_embeddings,
+                                     convert_to_tensor=convert_to_tensor, **kwargs)
+        kwargs.pop("convert_to_numpy", None)
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        store = self._store(normalize_embeddings)
+        digests = [content_hash(store.namespace, t) for t in texts]
+        vectors = store.get_many(digests)
+
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(digests[i], texts[i])
+        if missing:
+            started = time.perf_counter()
+            encoded = self.model.encode(list(missing.values()), batch_size=batch_size,
+                                        normalize_embeddings=normalize_embeddings, convert_to_numpy=True, **kwargs)
+            elapsed = time.perf_counter() - started
+            store.add_many(list(missing), encoded)
+            by_digest = dict(zip(missing, encoded))
+            vectors = [v if v is not None else by_digest[d] for v, d in zip(vectors, digests)]
+            with self._stats_lock:
+                self.encode_seconds += elapsed
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        out = np.array(vectors, dtype=np.float32)
+        return out[0] if single else out
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            per_text = self.encode_seconds / self.misses if self.misses else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "encode_seconds": round(self.encode_seconds, 4),
+                "encode_seconds_saved": round(self.hits * per_text, 4),
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings over a CachedEmbedder, matching SentenceTransformerEmbeddings' output."""
+
+    def __init__(self, embedder: CachedEmbedder):
+        self.embedder = embedder
+
+    def embed_documents(self, texts):
+        texts = [t.replace("\n", " ") for t in texts]
+        return self.embedder.encode(texts).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -0,0 +1,291 @@
+# http_session.py
+"""
+Process-wide HTTP session shared by the scraper.
+
+One `requests.Session` with a pooled, keep-alive adapter is reused for every
+fetch. Responses that carry an ETag or Last-Modified header are remembered so
+that the next fetch of the same URL is sent as a conditional request; a 304
+reply is served from the remembered body instead of re-downloading the page.
+
+Bodies are streamed: a fetch can be capped at a byte budget and can stop as
+soon as a set of stop patterns has been seen, so a huge page never has to be
+held in memory in full.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import re
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Pool settings --- #
+POOL_CONNECTIONS = 10   # number of per-host pools kept alive
+POOL_MAXSIZE = 8        # connections kept per host
+# Revalidation store: bounded by entries and total bytes (LRU).
+VALIDATOR_MAX_ENTRIES = 64
+VALIDATOR_MAX_BYTES = 64 * 1024 * 1024
+# Streaming settings.
+STREAM_CHUNK_SIZE = 64 * 1024
+# Bytes still read after the last stop pattern appears; reading also continues until
+# the element opened by the last matching tag has closed.
+STREAM_TAIL_BYTES = 64 * 1024
+_PATTERN_OVERLAP = 512  # re-scan this much of the previous chunk for split matches
+
+try:
+    import brotli  # noqa: F401  -- urllib3 decodes "br" only when brotli is installed
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/114.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Encoding": _ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+
+@dataclass
+class FetchedPage:
+    url: str
+    status_code: int
+    text: str
+    revalidated: bool = False  # True when served from a 304 Not Modified
+    truncated: bool = False    # True when the body was cut off by the byte budget or stop patterns
+    bytes_read: int = 0        # Body bytes downloaded for this request (0 when revalidated)
+
+
+class _ValidatorStore:
+    """LRU map of url -> (etag, last_modified, body, encoding, truncated)."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url, etag, last_modified, body, encoding, truncated=False):
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self._bytes -= len(old[2])
+            if len(body) > self.max_bytes:
+                return
+            self._entries[url] = (etag, last_modified, body, encoding, truncated)
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2])
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_session = None
+_session_lock = threading.Lock()
+_validators = _ValidatorStore(VALIDATOR_MAX_ENTRIES, VALIDATOR_MAX_BYTES)
+_stats = {"requests": 0, "revalidation_hits": 0, "misses": 0, "bytes_downloaded": 0, "bytes_saved": 0}
+_stats_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+# Script/style bodies and comments are blanked before stop patterns are searched,
+# so tag-like text inside inline JS cannot end a read early.
+_NON_CONTENT_OPEN_RE = re.compile(rb"<script\b|<style\b|<!--", re.IGNORECASE)
+_NON_CONTENT_CLOSE_RE = {
+    b"<script": re.compile(rb"</script\s*>", re.IGNORECASE),
+    b"<style": re.compile(rb"</style\s*>", re.IGNORECASE),
+    b"<!--": re.compile(rb"-->"),
+}
+
+
+class _ContentMask:
+    """Mirror of a growing body with script/style bodies and comments replaced by spaces."""
+
+    def __init__(self):
+        self.masked = bytearray()
+        self._pos = 0        # where the next opener/closer search starts
+        self._block = None   # (start, closer regex) of a block still open at the end of the body
+
+    def extend(self, buf):
+        self.masked.extend(buf[len(self.masked):])
+        while True:
+            if self._block is not None:
+                start, closer = self._block
+                m = closer.search(buf, self._pos)
+                end = m.end() if m else len(buf)
+                self.masked[start:end] = b" " * (end - start)
+                if not m:
+                    self._pos = max(self._pos, len(buf) - 16)  # a closer may be split across chunks
+                    return
+                self._block, self._pos = None, end
+            m = _NON_CONTENT_OPEN_RE.search(buf, self._pos)
+            if not m:
+                self._pos = max(self._pos, len(buf) - 8)  # an opener may be split across chunks
+                return
+            self._block = (m.start(), _NON_CONTENT_CLOSE_RE[m.group(0).lower()])
+            self._pos = m.end()
+
+
+def _element_end(masked, tag, start):
+    """Index just past the tag closing the element opened before `start`, or None if still open."""
+    depth = 1
+    token_re = re.compile(rb"<(/?)" + re.escape(tag) + rb"\b[^>]*>", re.IGNORECASE)
+    for m in token_re.finditer(masked, start):
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return m.end()
+        elif not m.group(0).endswith(b"/>"):
+            depth += 1
+    return None
+
+
+def _last_region_end(masked, patterns):
+    """
+    End of the element opened by the last stop-pattern match in `masked`, or None
+    while it is still open. Patterns without a tag-name group count as closed at once.
+    """
+    last = None
+    for p in patterns:
+        for m in p.finditer(masked):
+            if last is None or m.start() > last.start():
+                last = m
+    if last is None or not last.re.groups:
+        return 0
+    return _element_end(masked, last.group(1), last.end())
+
+
+def _read_body(resp, max_bytes=None, stop_patterns=None):
+    """
+    Stream `resp` into memory. Returns (body, truncated).
+
+    Reading stops once `max_bytes` decoded bytes have arrived, or once every compiled
+    bytes pattern in `stop_patterns` has matched outside script/style blocks and
+    comments, at least STREAM_TAIL_BYTES have followed, and the element opened by the
+    last match (group 1 is its tag name) has closed.
+    """
+    buf = bytearray()
+    patterns = list(stop_patterns or [])
+    pending = list(patterns)
+    mask = _ContentMask() if patterns else None
+    stop_at = None
+    truncated = False
+    try:
+        for chunk in resp.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if not chunk:
+                continue
+            scan_from = max(0, len(buf) - _PATTERN_OVERLAP)
+            buf.extend(chunk)
+            if mask is not None:
+                mask.extend(buf)
+            if pending:
+                pending = [p for p in pending if not p.search(mask.masked, scan_from)]
+                if not pending:
+                    stop_at = len(buf) + STREAM_TAIL_BYTES
+            limit = max_bytes
+            if stop_at is not None and len(buf) >= stop_at:
+                region_end = _last_region_end(mask.masked, patterns)
+                if region_end is not None:
+                    limit = min(x for x in (max_bytes, max(stop_at, region_end)) if x)
+            if limit is not None and len(buf) >= limit:
+                del buf[limit:]
+                truncated = True
+                break
+    finally:
+        resp.close()  # also on read errors, so the pooled connection is released
+    return bytes(buf), truncated
+
+
+def fetch_page(url: str, timeout: float = 15, max_bytes: int = None, stop_patterns=None) -> FetchedPage:
+    """
+    GET `url` through the shared session, revalidating against a remembered copy.
+
+    The body is streamed and cut at `max_bytes` or shortly after all `stop_patterns`
+    have been seen (see `_read_body`). Non-200/304 statuses are returned as-is with
+    empty text; network errors propagate.
+    """
+    session = get_session()
+    cached = _validators.get(url)
+    headers = {}
+    if cached is not None:
+        etag, last_modified = cached[0], cached[1]
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    resp = session.get(url, headers=headers, timeout=timeout, stream=True)
+    _count(requests=1)
+
+    if resp.status_code == 304 and cached is not None:
+        resp.close()
+        _, _, body, encoding, truncated = cached
+        _count(revalidation_hits=1, bytes_saved=len(body))
+        text = body.decode(encoding or "utf-8", errors="replace")
+        return FetchedPage(url, 200, text, revalidated=True, truncated=truncated)
+
+    if resp.status_code != 200:
+        resp.close()
+        return FetchedPage(url, resp.status_code, "")
+
+    body, truncated = _read_body(resp, max_bytes, stop_patterns)
+    _count(misses=1, bytes_downloaded=len(body))
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        _validators.put(url, etag, last_modified, body, resp.encoding, truncated)
+    text = body.decode(resp.encoding or "utf-8", errors="replace")
+    return FetchedPage(url, 200, text, truncated=truncated, bytes_read=len(body))
+
+
+def session_stats() -> dict:
+    """Pool configuration, open host pools, revalidation hit/miss counts and bytes saved."""
+    open_pools = 0
+    if _session is not None:
+        adapter = _session.get_adapter("https://")
+        try:
+            open_pools = len(adapter.poolmanager.pools)
+        except Exception:
+            open_pools = 0
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "pool_connections": POOL_CONNECTIONS,
+        "pool_maxsize": POOL_MAXSIZE,
+        "open_host_pools": open_pools,
+        "validator_entries": len(_validators),
+    })
+    return stats
@@ -0,0 +1,141 @@
+# llm_cache.py
+"""
+Persistent exact-match cache for LLM calls.
+
+Installed as LangChain's global LLM cache, so it sits under every chat model
+in the process (the Gemini agent and the OpenAI review synthesis calls).
+Entries are keyed by a hash of the model's llm_string (model name, parameters
+and stop words) and the serialized prompt messages. Completions are stored
+zlib-compressed in SQLite, and the store is kept under a byte budget by
+evicting least-recently-used rows. Calls with a non-zero (or unknown)
+temperature are never cached, since their output is meant to vary.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+from tracing import record_cache
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+MAX_CACHE_BYTES = 20 * 1024 * 1024
+
+_TEMPERATURE_RE = re.compile(r"""['"]temperature['"]\s*[:,]\s*([-+0-9.eE]+|None|null)""")
+
+
+def llm_temperature(llm_string: str):
+    """Temperature encoded in a LangChain llm_string, or None if it is missing."""
+    m = _TEMPERATURE_RE.search(llm_string)
+    if not m or m.group(1) in ("None", "null"):
+        return None
+    try:
+        return float(m.group(1))
+    except ValueError:
+        return None
+
+
+def is_deterministic(llm_string: str) -> bool:
+    return llm_temperature(llm_string) == 0.0
+
+
+class SQLiteLLMCache(BaseCache):
+    """SQLite prompt-hash -> generations store with LRU eviction by size."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+        if not is_deterministic(llm_string):
+            self.bypassed += 1
+            return None
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                record_cache("llm", False)
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        record_cache("llm", True)
+        try:
+            return loads(zlib.decompress(row[0]).decode("utf-8"))
+        except Exception as e:
+            print(f"LLM cache entry unreadable, ignoring: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        if not is_deterministic(llm_string):
+            return
+        payload = zlib.compress(dumps(list(return_val)).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, accessed_at) VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), payload, len(payload), now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        return {"entries": entries, "bytes": total, "hits": self.hits, "misses": self.misses,
+                "bypassed": self.bypassed}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def install_llm_cache():
+    """Register the SQLite cache as LangChain's global LLM cache (once). Returns it, or None if disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from langchain_core.globals import set_llm_cache
+
+                _cache = SQLiteLLMCache()
+                set_llm_cache(_cache)
+    return _cache
@@ -1,41 +1,201 @@
-
-from langchain.vectorstores import Chroma
-from langchain.embeddings import SentenceTransformerEmbeddings
+import atexit
+import os
+import threading
 import uuid
 from langchain_core.tools import tool
+from shared_resources import get_embeddings, get_vectorstore
+from request_context import DEFAULT_USER_ID, current_user_id, request_state
+from vector_index import get_preference_index, mmr_select
+
+# Write-behind settings: pending memories are embedded and inserted in one batch
+# once MEMORY_BATCH_SIZE are waiting or MEMORY_FLUSH_INTERVAL seconds have passed.
+MEMORY_BATCH_SIZE = 32
+MEMORY_FLUSH_INTERVAL = 2.0
+
+# Per-request retrieval: candidates fetched once per request, optionally re-ranked
+# with maximal marginal relevance so the top k are not near-duplicates.
+RETRIEVAL_FETCH_K = 20
+RETRIEVAL_MMR = os.getenv("PREFERENCE_MMR", "0") == "1"
+MMR_LAMBDA = 0.5
+
+
+# The embedding model and ChromaDB collection are shared with agent.py and
+# built lazily on first use (see shared_resources).
+def __getattr__(name):
+    # Backwards compatibility for code that used the old import-time globals
+    if name == "embedding_model":
+        return get_embeddings()
+    if name == "vectorstore":
+        return get_vectorstore()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class MemoryWriteBuffer:
+    """
+    Batches new memories: one vectorized embed call, one bulk insert and one
+    persist per flush instead of per memory.
+    """
+
+    def __init__(self, batch_size=MEMORY_BATCH_SIZE, flush_interval=MEMORY_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []  # (memory_id, text, user_id)
+        self._lock = threading.Lock()        # guards _pending and _timer
+        self._flush_lock = threading.Lock()  # serializes flushes so readers can wait on them
+        self._timer = None
+
+    def add(self, text: str, user_id: str = DEFAULT_USER_ID) -> str:
+        memory_id = f"mem_{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            self._pending.append((memory_id, text, user_id))
+            full = len(self._pending) >= self.batch_size
+            if not full:
+                self._arm_timer()
+        if full:
+            self.flush()
+        return memory_id
+
+    def _arm_timer(self):
+        """Schedule a flush in flush_interval seconds unless one is already scheduled. Caller holds _lock."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write every pending memory to ChromaDB. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batch:
+                return 0
+
+            ids = [memory_id for memory_id, _, _ in batch]
+            texts = [text for _, text, _ in batch]
+            metadatas = [{"user_id": user_id} for _, _, user_id in batch]
+            try:
+                embeddings = get_embeddings().embed_documents(texts)
+                vectorstore = get_vectorstore()
+                vectorstore._collection.add(ids=ids, documents=texts, embeddings=embeddings, metadatas=metadatas)
+                vectorstore.persist()
+                if get_preference_index.is_built():
+                    get_preference_index().add(ids, embeddings, texts, metadatas)
+            except Exception:
+                # Put the batch back and schedule a retry, so it does not wait for the next write
+                with self._lock:
+                    self._pending = batch + self._pending
+                    self._arm_timer()
+                raise
+            print(f"Flushed {len(batch)} new memories to ChromaDB.")
+            return len(batch)
+
+
+_buffer = MemoryWriteBuffer()
+atexit.register(_buffer.flush)
 
 
-# Initialize embedding model
-embedding_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+def flush_pending_memories() -> int:
+    """Write buffered memories now. Called before every preference retrieval."""
+    return _buffer.flush()
+
+
+def retrieve_preferences(query: str, k: int = 3, user_id: str = None):
+    """
+    Top-k stored preferences of `user_id` (default: the current request's user) for `query`.
+
+    The user filter is pushed down into the vector search (see vector_index for the
+    backend in use), and buffered writes are flushed first so results are never stale.
+    """
+    flush_pending_memories()
+    user_id = user_id or current_user_id.get()
+    embedding = get_embeddings().embed_query(query)
+    return get_preference_index().query(embedding, k=k, where={"user_id": user_id})
+
+
+def request_preferences(query: str, k: int = None, mmr: bool = None):
+    """
+    Preferences for the current request, retrieved at most once per request.
+
+    The first call over-fetches max(k, RETRIEVAL_FETCH_K) candidates (re-ranked by MMR
+    when `mmr`, default RETRIEVAL_MMR) and memoizes them in the request state. Later
+    calls in the same request, such as PreferenceRetriever tool calls, reuse that
+    ranking; `k` defaults to the k of the first call.
+    """
+    state = request_state()
+    memo = state.get("preferences")
+    if memo is None or (k is not None and k > len(memo["docs"]) and not memo["exhausted"]):
+        fetch_k = max(k or 3, RETRIEVAL_FETCH_K)
+        docs = retrieve_preferences(query, k=fetch_k)
+        if (RETRIEVAL_MMR if mmr is None else mmr) and len(docs) > 1:
+            embeddings = get_embeddings()
+            order = mmr_select(embeddings.embed_query(query),
+                               embeddings.embed_documents([d.page_content for d in docs]),
+                               len(docs), MMR_LAMBDA)
+            docs = [docs[i] for i in order]
+        memo = state["preferences"] = {
+            "docs": docs,
+            "k": k or (memo or {}).get("k") or 3,
+            "exhausted": len(docs) < fetch_k,
+        }
+    return memo["docs"][:k or memo["k"]]
+
+
+def migrate_unscoped_preferences(user_id: str = DEFAULT_USER_ID, batch_size: int = 500) -> int:
+    """
+    Assign `user_id` to stored preferences that predate per-user scoping. Returns the number updated.
+
+    The built-in samples stored by the original ingestion script (pref_0..pref_N) are
+    not tagged but replaced by the content-addressed sample chunks for `user_id`.
+    """
+    from user_preference import ingest, remove_legacy_chunks, sample_records
+
+    flush_pending_memories()
+    collection = get_vectorstore()._collection
+    if remove_legacy_chunks(collection):
+        ingest(sample_records(), user_id=user_id)
+    updated, offset = 0, 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            if updated and get_preference_index.is_built():
+                # The in-process mirror keeps its own copy of the metadata the user filter reads
+                get_preference_index().sync(force=True)
+            return updated
+        ids, metadatas = [], []
+        for doc_id, meta in zip(page["ids"], page["metadatas"]):
+            if not (meta or {}).get("user_id"):
+                ids.append(doc_id)
+                metadatas.append(dict(meta or {}, user_id=user_id))
+        if ids:
+            collection.update(ids=ids, metadatas=metadatas)
+            updated += len(ids)
+        offset += len(page["ids"])
 
-# Connect to existing ChromaDB collection
-vectorstore = Chroma(
-    collection_name="user_preferences",
-    embedding_function=embedding_model,
-    persist_directory="./chroma_db"
-)
 
 @tool
-def add_new_memory(text: str):
+def add_new_memory(text: str, user_id: str = DEFAULT_USER_ID):
     """
-    Adds a new user preference or feedback to the existing ChromaDB memory.
+    Adds a new user preference or feedback to the existing ChromaDB memory of `user_id`.
     """
     if not text.strip():
         print("Empty input, nothing to add.")
         return
     
-    memory_id = f"mem_{uuid.uuid4().hex[:8]}"
-    vectorstore.add_texts(
-        texts=[text],
-        ids=[memory_id]
-    )
-    vectorstore.persist()
+    memory_id = _buffer.add(text, user_id)
     print(f"Added new memory: '{text}' (ID: {memory_id})")
 
 
-def get_all_memories():
+def get_all_memories(user_id: str = None):
     """
-    Returns all stored memories for debugging or verification.
+    Returns all stored memories (optionally only those of `user_id`) for debugging or verification.
     """
-    results = vectorstore._collection.get()
+    flush_pending_memories()
+    results = get_vectorstore()._collection.get(where={"user_id": user_id} if user_id else None)
     return results['documents']
@@ -1,10 +1,11 @@
 # product_schema.py
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 class ProductComparison(BaseModel):
     product_name: str = Field(..., description="Name of the product")
-    price: float = Field(..., description="Price of the product in USD")
+    price: Optional[float] = Field(..., description="Price of the product in `currency`, or null if unknown")
+    currency: Optional[str] = Field(None, description="ISO 4217 code of the price, e.g. 'USD' or 'INR'; null if unknown")
     battery_life: str = Field(..., description="Battery life description, e.g., '10 hours'")
     pros_summary: List[str] = Field(..., description="List of summarized positive points")
     cons_summary: List[str] = Field(..., description="List of summarized negative points")
\ No newline at end of file
@@ -1,23 +1,262 @@
 from langchain.tools import tool
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
-import requests
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import lru_cache
+import os
+import re
+import threading
+import time
 import json
+from http_session import fetch_page
+from scrape_cache import cached_scrape
+from context_builder import project_scraper_results
+from request_context import current_query
+from tracing import span
+import contextvars
 
-@tool("product_scraper", return_direct=True)
-def product_scraper_tool(url_list: list | str):
+# --- Concurrency settings --- #
+# Global cap on in-flight page fetches across every caller in the process.
+MAX_CONCURRENT_FETCHES = 8
+# Per-domain caps so a comparison never hammers a single storefront.
+DOMAIN_CONCURRENCY = {"amazon": 2, "flipkart": 2, "generic": 4}
+# Overall deadline (seconds) for one product_scraper_tool batch.
+BATCH_DEADLINE = 40
+REQUEST_TIMEOUT = 15
+# Opt-in: number of review listing pages to harvest per Amazon/Flipkart product (0 = off).
+REVIEW_PAGES = int(os.getenv("SCRAPER_REVIEW_PAGES", "0"))
+MAX_HARVESTED_REVIEWS = 100
+# Per-domain cap on decoded bytes read from a single page.
+BYTE_BUDGETS = {"amazon": 3 * 1024 * 1024, "flipkart": 2 * 1024 * 1024, "generic": 1536 * 1024}
+
+# --- Parsing settings --- #
+# "targeted" parses only the page regions the extractor reads; "full" parses the whole page.
+EXTRACTION_MODE = os.getenv("SCRAPER_EXTRACTION_MODE", "targeted")
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES, thread_name_prefix="scraper")
+_domain_slots = {kind: threading.BoundedSemaphore(n) for kind, n in DOMAIN_CONCURRENCY.items()}
+
+# --- Helper functions for known domains --- #
+def scrape_amazon(soup):
+    specs, reviews = {}, []
+    title = soup.find("span", {"id": "productTitle"})
+    specs["Product Title"] = title.get_text(strip=True) if title else "N/A"
+
+    # Product detail table
+    detail_table = soup.find("table", {"id": "productDetails_techSpec_section_1"})
+    if detail_table:
+        for row in detail_table.find_all("tr"):
+            th = row.find("th")
+            td = row.find("td")
+            if th and td:
+                specs[th.get_text(strip=True)] = td.get_text(strip=True)
+
+    # Additional feature bullets
+    bullet_points = soup.select("#feature-bullets ul li span")
+    if bullet_points:
+        specs["Key Features"] = [b.get_text(strip=True) for b in bullet_points if b.get_text(strip=True)]
+
+    # Customer reviews
+    for r in soup.select(".review-text-content span"):
+        text = r.get_text(strip=True)
+        if text:
+            reviews.append(text)
+    return specs, reviews[:5]
+
+
+def scrape_flipkart(soup):
+    specs, reviews = {}, []
+    title = soup.find("span", {"class": "B_NuCI"})
+    specs["Product Title"] = title.get_text(strip=True) if title else "N/A"
+
+    # Product Specs table
+    for row in soup.select("table._14cfVK tr"):
+        tds = row.find_all("td")
+        if len(tds) == 2:
+            specs[tds[0].get_text(strip=True)] = tds[1].get_text(strip=True)
+
+    # Feature list
+    feature_list = soup.select("div._2418kt ul li")
+    if feature_list:
+        specs["Key Features"] = [li.get_text(strip=True) for li in feature_list if li.get_text(strip=True)]
+
+    # Reviews
+    for r in soup.select("div.t-ZTKy div"):
+        txt = r.get_text(strip=True)
+        if txt and len(reviews) < 5:
+            reviews.append(txt)
+    return specs, reviews
+
+
+def scrape_generic(soup):
+    specs, reviews = {}, []
+    title = soup.find(["h1", "h2"])
+    specs["Product Title"] = title.get_text(strip=True) if title else "N/A"
+
+    # Generic spec extraction
+    for li in soup.find_all("li")[:10]:
+        text = li.get_text(" ", strip=True)
+        if ":" in text:
+            k, v = text.split(":", 1)
+            specs[k.strip()] = v.strip()
+
+    # Extract paragraphs with 'review' or 'comment'
+    for r in soup.find_all(class_=lambda c: c and "review" in c.lower()):
+        txt = r.get_text(strip=True)
+        if txt and len(reviews) < 5:
+            reviews.append(txt)
+    return specs, reviews
+
+
+EXTRACTORS = {"amazon": scrape_amazon, "flipkart": scrape_flipkart, "generic": scrape_generic}
+
+# --- Targeted extraction --- #
+# Regions each extractor reads, as (tag or None for any tag, attribute, value).
+# Generic pages have no fixed layout, so they are always parsed in full.
+REGION_SPECS = {
+    "amazon": [
+        ("span", "id", "productTitle"),
+        ("table", "id", "productDetails_techSpec_section_1"),
+        (None, "id", "feature-bullets"),
+        (None, "class", "review-text-content"),
+    ],
+    "flipkart": [
+        ("span", "class", "B_NuCI"),
+        ("table", "class", "_14cfVK"),
+        ("div", "class", "_2418kt"),
+        ("div", "class", "t-ZTKy"),
+    ],
+    # Dedicated review listing pages (see review_harvester.py).
+    "amazon_reviews": [
+        (None, "data-hook", "review-body"),
+        (None, "class", "review-text-content"),
+    ],
+    "flipkart_reviews": [
+        ("div", "class", "t-ZTKy"),
+    ],
+}
+
+
+def _open_tag_regex(tag, attr, value):
+    name = re.escape(tag) if tag else r"[a-zA-Z][\w:-]*"
+    v = re.escape(value)
+    if attr == "class":
+        val = rf"""["']?[^"'>]*?(?<![\w-]){v}(?![\w-])[^"'>]*["']?"""
+    else:
+        val = rf"""(?:"{v}"|'{v}'|{v}(?=[\s/>]))"""
+    return rf"<({name})\b[^>]*?\s{attr}\s*=\s*{val}[^>]*>"
+
+
+# Compiled once at import time: str patterns slice regions, bytes patterns end streaming early.
+_REGION_PATTERNS = {
+    kind: [re.compile(_open_tag_regex(*spec), re.IGNORECASE) for spec in specs]
+    for kind, specs in REGION_SPECS.items()
+}
+_STOP_PATTERNS = {
+    kind: [re.compile(_open_tag_regex(*spec).encode(), re.IGNORECASE) for spec in specs]
+    for kind, specs in REGION_SPECS.items()
+}
+
+
+# Script/style bodies and comments can contain tag-like text; get_text() ignores them anyway.
+_NON_CONTENT_RE = re.compile(r"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->", re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def _tag_token_re(tag):
+    return re.compile(rf"<(/?){re.escape(tag)}\b[^>]*>", re.IGNORECASE)
+
+
+def _region_end(html, tag, start):
+    """Index just past the tag closing the element opened before `start` (or end of document)."""
+    depth = 1
+    for m in _tag_token_re(tag.lower()).finditer(html, start):
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return m.end()
+        elif not m.group(0).endswith("/>"):
+            depth += 1
+    return len(html)
+
+
+def extract_regions(html: str, kind: str) -> str:
+    """Return only the HTML regions the `kind` extractor reads, in document order."""
+    html = _NON_CONTENT_RE.sub("", html)
+    spans = []
+    for pattern in _REGION_PATTERNS[kind]:
+        for m in pattern.finditer(html):
+            spans.append((m.start(), _region_end(html, m.group(1), m.end())))
+    spans.sort()
+
+    parts, last_end = [], -1
+    for start, end in spans:
+        if start < last_end:  # nested inside a region we already kept
+            continue
+        parts.append(html[start:end])
+        last_end = end
+    return "\n".join(parts)
+
+
+def parse_page(html: str, kind: str, mode: str = None):
+    """Parse `html` for the `kind` extractor, in targeted or full mode."""
+    mode = mode or EXTRACTION_MODE
+    if mode == "targeted" and kind in _REGION_PATTERNS:
+        html = extract_regions(html, kind)
+    return BeautifulSoup(html, PARSER)
+
+
+def domain_kind(url: str) -> str:
+    """Classify a URL as 'amazon', 'flipkart' or 'generic'."""
+    domain = urlparse(url).netloc.lower()
+    if "amazon" in domain:
+        return "amazon"
+    if "flipkart" in domain:
+        return "flipkart"
+    return "generic"
+
+
+def _is_specs_empty(s):
+    """Detect empty or unhelpful specs (e.g., only N/A title and no other specs)."""
+    if not s:
+        return True
+    # If the only key is Product Title and it's N/A or empty, consider empty
+    keys = list(s.keys())
+    if len(keys) == 1 and keys[0] == "Product Title":
+        val = s.get("Product Title")
+        if not val or str(val).strip().upper() == "N/A":
+            return True
+    # Otherwise consider non-empty
+    return False
+
+
+@contextmanager
+def domain_slot(kind: str, deadline_at: float = None):
     """
-    Takes a list of product URLs and scrapes real-time product specifications and reviews.
-    Works with Amazon, Flipkart, and generic e-commerce pages.
-    Accepts either a Python list, a JSON list string, or a single URL string.
+    Hold one of the DOMAIN_CONCURRENCY slots for `kind` while fetching.
 
-    Example inputs:
-      - ["https://www.amazon.in/dp/B0C7S2FL8K/"]
-      - "[\"https://www.flipkart.com/poco-x6-pro-5g/p/itm2c4f2561da8a0\"]"
-      - "https://example.com/product1"
+    Every request to a storefront (product pages and harvested review pages)
+    goes through these slots. Raises TimeoutError if no slot frees up before
+    `deadline_at` (a time.monotonic() value; None waits at most REQUEST_TIMEOUT).
     """
+    slot = _domain_slots[kind]
+    remaining = REQUEST_TIMEOUT if deadline_at is None else deadline_at - time.monotonic()
+    if remaining <= 0 or not slot.acquire(timeout=remaining):
+        raise TimeoutError(f"No {kind} fetch slot free before the deadline.")
+    try:
+        yield
+    finally:
+        slot.release()
 
-    # --- Normalize input --- #
+
+def _normalize_url_list(url_list):
+    """Accept a Python list, a JSON list string, or a single URL string."""
     if isinstance(url_list, str):
         try:
             parsed = json.loads(url_list)
@@ -30,138 +269,149 @@ def product_scraper_tool(url_list: list | str):
 
     if not isinstance(url_list, list):
         url_list = [url_list]
+    return url_list
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/114.0.0.0 Safari/537.36"
-        )
-    }
-
-    # --- Helper functions for known domains --- #
-    def scrape_amazon(soup):
-        specs, reviews = {}, []
-        title = soup.find("span", {"id": "productTitle"})
-        specs["Product Title"] = title.get_text(strip=True) if title else "N/A"
-
-        # Product detail table
-        detail_table = soup.find("table", {"id": "productDetails_techSpec_section_1"})
-        if detail_table:
-            for row in detail_table.find_all("tr"):
-                th = row.find("th")
-                td = row.find("td")
-                if th and td:
-                    specs[th.get_text(strip=True)] = td.get_text(strip=True)
-
-        # Additional feature bullets
-        bullet_points = soup.select("#feature-bullets ul li span")
-        if bullet_points:
-            specs["Key Features"] = [b.get_text(strip=True) for b in bullet_points if b.get_text(strip=True)]
-
-        # Customer reviews
-        for r in soup.select(".review-text-content span"):
-            text = r.get_text(strip=True)
-            if text:
-                reviews.append(text)
-        return specs, reviews[:5]
-
-    def scrape_flipkart(soup):
-        specs, reviews = {}, []
-        title = soup.find("span", {"class": "B_NuCI"})
-        specs["Product Title"] = title.get_text(strip=True) if title else "N/A"
-
-        # Product Specs table
-        for row in soup.select("table._14cfVK tr"):
-            tds = row.find_all("td")
-            if len(tds) == 2:
-                specs[tds[0].get_text(strip=True)] = tds[1].get_text(strip=True)
-
-        # Feature list
-        feature_list = soup.select("div._2418kt ul li")
-        if feature_list:
-            specs["Key Features"] = [li.get_text(strip=True) for li in feature_list if li.get_text(strip=True)]
-
-        # Reviews
-        for r in soup.select("div.t-ZTKy div"):
-            txt = r.get_text(strip=True)
-            if txt and len(reviews) < 5:
-                reviews.append(txt)
-        return specs, reviews
-
-    def scrape_generic(soup):
-        specs, reviews = {}, []
-        title = soup.find(["h1", "h2"])
-        specs["Product Title"] = title.get_text(strip=True) if title else "N/A"
-
-        # Generic spec extraction
-        for li in soup.find_all("li")[:10]:
-            text = li.get_text(" ", strip=True)
-            if ":" in text:
-                k, v = text.split(":", 1)
-                specs[k.strip()] = v.strip()
-
-        # Extract paragraphs with 'review' or 'comment'
-        for r in soup.find_all(class_=lambda c: c and "review" in c.lower()):
-            txt = r.get_text(strip=True)
-            if txt and len(reviews) < 5:
-                reviews.append(txt)
-        return specs, reviews
-
-    # --- Main scraping logic --- #
-    results = []
-    for url in url_list:
-        domain = urlparse(url).netloc.lower()
-        try:
-            resp = requests.get(url, headers=headers, timeout=15)
-            if resp.status_code != 200:
-                results.append({"url": url, "error": f"HTTP {resp.status_code}", "status": "error"})
-                continue
 
-            soup = BeautifulSoup(resp.text, "html.parser")
+def _scrape_one(url, deadline_at, review_pages=0, max_reviews=MAX_HARVESTED_REVIEWS):
+    """Fetch and extract a single URL, honouring its domain slot and the batch deadline."""
+    with span("scrape", "fetch", url=url, domain=domain_kind(url)) as s:
+        result = _scrape_one_untraced(url, deadline_at, review_pages, max_reviews, s)
+        if result.get("status") != "ok":
+            s.status = "error"
+            s.attrs["error"] = result.get("error")
+        return result
 
-            if "amazon" in domain:
-                specs, reviews = scrape_amazon(soup)
-            elif "flipkart" in domain:
-                specs, reviews = scrape_flipkart(soup)
-            else:
-                specs, reviews = scrape_generic(soup)
-
-            # Normalize reviews
-            normalized_reviews = reviews if reviews else ["No reviews found."]
-
-            # Detect empty or unhelpful specs (e.g., only N/A title and no other specs)
-            def _is_specs_empty(s):
-                if not s:
-                    return True
-                # If the only key is Product Title and it's N/A or empty, consider empty
-                keys = list(s.keys())
-                if len(keys) == 1 and keys[0] == "Product Title":
-                    val = s.get("Product Title")
-                    if not val or str(val).strip().upper() == "N/A":
-                        return True
-                # Otherwise consider non-empty
-                return False
-
-            if _is_specs_empty(specs) and (not normalized_reviews or normalized_reviews == ["No reviews found."]):
-                results.append({
-                    "url": url,
-                    "status": "error",
-                    "error": "No product details or reviews could be extracted from the page."
-                })
-            else:
-                results.append({
-                    "url": url,
-                    "status": "ok",
-                    "specs": specs,
-                    "reviews": normalized_reviews
-                })
-
-        except Exception as e:
+
+def _scrape_one_untraced(url, deadline_at, review_pages, max_reviews, trace_span):
+    kind = domain_kind(url)
+    try:
+        # The domain slot covers the product page fetch only; review pages take their own slots
+        with domain_slot(kind, deadline_at):
+            timeout = max(1.0, min(REQUEST_TIMEOUT, deadline_at - time.monotonic()))
+            page = fetch_page(
+                url,
+                timeout=timeout,
+                max_bytes=BYTE_BUDGETS[kind],
+                stop_patterns=_STOP_PATTERNS.get(kind),
+            )
+    except TimeoutError:
+        return {"url": url, "status": "error", "error": "Batch deadline exceeded before fetch started."}
+    except Exception as e:
+        return {"url": url, "status": "error", "error": str(e)}
+
+    try:
+        trace_span.attrs.update(status_code=page.status_code, bytes=page.bytes_read,
+                                revalidated=page.revalidated, truncated=page.truncated)
+        if page.status_code != 200:
+            return {"url": url, "error": f"HTTP {page.status_code}", "status": "error"}
+
+        soup = parse_page(page.text, kind)
+        specs, reviews = EXTRACTORS[kind](soup)
+
+        if review_pages and kind in ("amazon", "flipkart"):
+            from review_harvester import harvest_reviews
+
+            # Collected here: the result is cached and serialized whole, so only the
+            # concurrent page fetches and the early stop at max_reviews apply
+            reviews = list(reviews)
+            reviews.extend(harvest_reviews(
+                url,
+                max_pages=review_pages,
+                max_reviews=max(0, max_reviews - len(reviews)),
+                seen=reviews,
+                deadline_at=deadline_at,
+            ))
+
+        # Normalize reviews
+        normalized_reviews = reviews if reviews else ["No reviews found."]
+
+        if _is_specs_empty(specs) and (not normalized_reviews or normalized_reviews == ["No reviews found."]):
+            return {
+                "url": url,
+                "status": "error",
+                "error": "No product details or reviews could be extracted from the page."
+            }
+        return {
+            "url": url,
+            "status": "ok",
+            "specs": specs,
+            "reviews": normalized_reviews,
+            "truncated": page.truncated
+        }
+
+    except Exception as e:
+        return {
+            "url": url,
+            "status": "error",
+            "error": str(e)
+        }
+
+
+def _scrape_cached(url, deadline_at, review_pages=0, max_reviews=MAX_HARVESTED_REVIEWS):
+    """Serve `url` from the scrape cache, fetching at most once per canonical product."""
+    return cached_scrape(
+        url,
+        domain_kind(url),
+        lambda: _scrape_one(url, deadline_at, review_pages, max_reviews),
+        wait_timeout=deadline_at - time.monotonic(),
+        variant=f"reviews{review_pages}x{max_reviews}" if review_pages else "",
+    )
+
+
+def scrape_products(url_list, deadline: float = BATCH_DEADLINE, review_pages: int = REVIEW_PAGES,
+                    max_reviews: int = MAX_HARVESTED_REVIEWS) -> list:
+    """
+    Scrape a batch of product URLs concurrently.
+
+    Fetches run on a shared bounded thread pool (MAX_CONCURRENT_FETCHES) with a
+    per-domain cap (DOMAIN_CONCURRENCY). URLs still running when `deadline`
+    seconds have elapsed are reported as errors. Results are returned in the
+    same order as `url_list`.
+
+    With `review_pages` > 0, Amazon and Flipkart results also include up to
+    `max_reviews` reviews harvested from that many review listing pages.
+    """
+    url_list = _normalize_url_list(url_list)
+    if not url_list:
+        return []
+
+    deadline_at = time.monotonic() + deadline
+    # Each fetch runs in a copy of the caller's context so its span nests under the caller's
+    futures = [_executor.submit(contextvars.copy_context().run, _scrape_cached, str(url), deadline_at,
+                                review_pages, max_reviews) for url in url_list]
+    wait(futures, timeout=deadline)
+
+    results = []
+    for url, fut in zip(url_list, futures):
+        if fut.done():
+            results.append(fut.result())
+        else:
+            fut.cancel()
             results.append({
                 "url": url,
                 "status": "error",
-                "error": str(e)
+                "error": f"Timed out: batch deadline of {deadline}s exceeded."
             })
-
     return results
+
+
+# Not return_direct: the agent goes on to synthesize reviews and pass these results to product_comparison_tool
+@tool("product_scraper")
+def product_scraper_tool(url_list: list | str):
+    """
+    Takes a list of product URLs and scrapes real-time product specifications and reviews.
+    Works with Amazon, Flipkart, and generic e-commerce pages.
+    Accepts either a Python list, a JSON list string, or a single URL string.
+
+    Example inputs:
+      - ["https://www.amazon.in/dp/B0C7S2FL8K/"]
+      - "[\"https://www.flipkart.com/poco-x6-pro-5g/p/itm2c4f2561da8a0\"]"
+      - "https://example.com/product1"
+
+    Returns a JSON array that can be passed as-is to product_comparison_tool.
+    Only a few reviews are shown per product ("reviews_total" gives the full count);
+    pass the product URL to review_synthesis_tool to summarize all of them.
+    """
+    # Trimmed to the fields relevant to the user's question; the agent re-sends this on every step
+    results = project_scraper_results(scrape_products(url_list), current_query.get())
+    return json.dumps(results, ensure_ascii=False)
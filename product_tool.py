@@ -1,34 +1,109 @@
 # product_tool.py
 import json
+import re
+from urllib.parse import urlparse
 from langchain.tools import StructuredTool, Tool
 from pydantic import BaseModel, Field
 from product_schema import ProductComparison
-from typing import List
+from typing import List, Optional
 
 # Input model for the tool
 class ProductInput(BaseModel):
     product_name: str
-    price: float
+    price: Optional[float]
     battery_life: str
     pros_summary: List[str]
     cons_summary: List[str]
+    currency: Optional[str] = None
 
 # Function to create structured product data
 def create_product_comparison(
     product_name: str,
-    price: float,
+    price: Optional[float],
     battery_life: str,
     pros_summary: List[str],
-    cons_summary: List[str]
+    cons_summary: List[str],
+    currency: Optional[str] = None
 ) -> ProductComparison:
     return ProductComparison(
         product_name=product_name,
         price=price,
+        currency=currency,
         battery_life=battery_life,
         pros_summary=pros_summary,
         cons_summary=cons_summary
     )
 
+# --- Mapping scraped specs onto comparison fields --- #
+_PRICE_RE = re.compile(r"(₹|\$|\b(?:rs\.?|inr|usd)(?![a-z]))\s*([0-9][0-9,]*(?:\.[0-9]+)?)", re.IGNORECASE)
+_CURRENCY_CODES = {"₹": "INR", "rs": "INR", "rs.": "INR", "inr": "INR", "$": "USD", "usd": "USD"}
+_HOURS_RE = re.compile(r"([0-9]+(?:\.[0-9]+)?)\s*(?:-|\s)?(?:hours|hour|hrs|hr|h)\b", re.IGNORECASE)
+
+
+def _spec_texts(specs: dict):
+    for key, value in specs.items():
+        values = value if isinstance(value, list) else [value]
+        for v in values:
+            yield str(key), str(v)
+
+
+def _price_match(m) -> tuple:
+    return float(m.group(2).replace(",", "")), _CURRENCY_CODES.get(m.group(1).lower())
+
+
+def _site_currency(url: str):
+    """Currency a storefront lists prices in when a price row carries no symbol, if known."""
+    host = urlparse(url or "").netloc.lower()
+    if "flipkart." in host or host.endswith(".in"):
+        return "INR"
+    return None
+
+
+def specs_to_comparison_fields(specs: dict, url: str = None, title: str = None) -> dict:
+    """
+    Best-effort product_name / price / currency / battery_life from a scraper `specs` dict.
+
+    Price comes from a price-like spec row, else the first currency amount in any
+    spec; its currency from the symbol next to it, else from the storefront in
+    `url`; battery life from a battery spec row, else the first "N hours"
+    mentioned next to "battery". The name is the "Product Title" spec, else
+    `title` (product_scraper's projected results carry it there). A missing
+    price and currency are None, a missing name or battery life "N/A".
+    """
+    specs = specs or {}
+    price, currency, battery = None, None, None
+
+    for key, text in _spec_texts(specs):
+        lowered = key.lower()
+        if price is None and ("price" in lowered or "mrp" in lowered):
+            m = _PRICE_RE.search(text)
+            if m:
+                price, currency = _price_match(m)
+            else:
+                m = re.search(r"([0-9][0-9,]*(?:\.[0-9]+)?)", text)
+                if m:
+                    price = float(m.group(1).replace(",", ""))
+        if battery is None and "battery" in lowered and "N/A" not in text:
+            battery = text
+    for _, text in _spec_texts(specs):
+        if price is None:
+            m = _PRICE_RE.search(text)
+            if m:
+                price, currency = _price_match(m)
+        if battery is None and "battery" in text.lower():
+            m = _HOURS_RE.search(text)
+            if m:
+                battery = f"{m.group(1)} hours"
+
+    if price is not None and currency is None:
+        currency = _site_currency(url)
+    return {
+        "product_name": str(specs.get("Product Title") or title or "N/A"),
+        "price": price,
+        "currency": currency,
+        "battery_life": battery or "N/A",
+    }
+
 # Wrap as a LangChain StructuredTool
 # Keep a programmatic function for direct calls
 product_comparison_tool = create_product_comparison
@@ -41,40 +116,94 @@ structured_product_comparison_tool = StructuredTool.from_function(
     args_schema=ProductInput,
 )
 
-# Agent-compatible wrapper: ZeroShotAgent requires single-string input tools.
-def _agent_wrapper(input_str: str) -> str:
-    """Accept a JSON string describing the product fields, create the ProductComparison,
-    and return a JSON string. This keeps the tool single-input and agent-friendly.
-    """
-    try:
-        data = json.loads(input_str)
-    except Exception:
-        return json.dumps({"error": "Invalid input. Provide a JSON string with keys: product_name, price, battery_life, pros_summary, cons_summary"})
+_REQUIRED_KEYS = {"product_name", "price", "battery_life", "pros_summary", "cons_summary"}
+
+
+def _is_scraper_result(data: dict) -> bool:
+    return "specs" in data and "product_name" not in data
+
+
+def _comparison_from_item(data) -> dict:
+    """Validate one product (comparison fields or a scraper result) into a ProductComparison dict or {"error": ...}."""
+    if not isinstance(data, dict):
+        return {"error": "Each product must be a JSON object."}
 
     # If the input is a scraper result, it may contain error/status fields — propagate those clearly
-    if isinstance(data, dict) and (data.get("status") == "error" or data.get("error")):
+    if data.get("status") == "error" or data.get("error"):
         err = data.get("error") or "Scraper returned an error or empty result."
-        return json.dumps({"error": f"Source scraping error: {err}"})
+        return {"error": f"Source scraping error: {err}"}
+
+    # Raw scraper results carry specs, not comparison fields; map them (pros/cons may be merged in by the caller)
+    if _is_scraper_result(data):
+        fields = specs_to_comparison_fields(data.get("specs"), data.get("url"), data.get("title"))
+        fields["pros_summary"] = data.get("pros_summary") or data.get("pros") or []
+        fields["cons_summary"] = data.get("cons_summary") or data.get("cons") or []
+        data = fields
 
     # Basic validation before attempting to create the ProductComparison
-    required_keys = {"product_name", "price", "battery_life", "pros_summary", "cons_summary"}
-    if not required_keys.issubset(set(data.keys())):
-        missing = required_keys - set(data.keys())
-        return json.dumps({"error": f"Missing required fields: {', '.join(sorted(missing))}"})
+    if not _REQUIRED_KEYS.issubset(set(data.keys())):
+        missing = _REQUIRED_KEYS - set(data.keys())
+        return {"error": f"Missing required fields: {', '.join(sorted(missing))}"}
 
     # Handle obvious empty/placeholder values
     if not data.get("product_name") or str(data.get("product_name")).strip().upper() == "N/A":
-        return json.dumps({"error": "Invalid product_name: no product title available from scraper."})
+        return {"error": "Invalid product_name: no product title available from scraper."}
 
     try:
-        pc = create_product_comparison(**data)
-        return pc.json()
+        pc = create_product_comparison(currency=data.get("currency"), **{k: data[k] for k in _REQUIRED_KEYS})
+        return json.loads(pc.json())
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return {"error": str(e)}
+
+
+def compare_product_batch(items: list) -> list:
+    """
+    Validate many products in one pass.
+
+    Returns one entry per input, in order: the ProductComparison dict, or an
+    {"error", "index"} dict (with product_name/url when known) for items that failed.
+    """
+    results = []
+    for i, item in enumerate(items):
+        result = _comparison_from_item(item)
+        if "error" in result:
+            result["index"] = i
+            if isinstance(item, dict):
+                label = (item.get("product_name") or (item.get("specs") or {}).get("Product Title")
+                         or item.get("title") or item.get("url"))
+                if label:
+                    result["product_name"] = label
+        results.append(result)
+    return results
+
+
+# Agent-compatible wrapper: ZeroShotAgent requires single-string input tools.
+def _agent_wrapper(input_str: str) -> str:
+    """Accept a JSON string describing the product fields, create the ProductComparison,
+    and return a JSON string. This keeps the tool single-input and agent-friendly.
+
+    A JSON array (of product objects or raw product_scraper results) is handled in
+    one call and returns a JSON array with a result or error per item.
+    """
+    if isinstance(input_str, (list, dict)):
+        data = input_str
+    else:
+        try:
+            data = json.loads(input_str)
+        except Exception:
+            return json.dumps({"error": "Invalid input. Provide a JSON string with keys: product_name, price, battery_life, pros_summary, cons_summary, or a JSON array of such objects"})
+
+    if isinstance(data, list):
+        return json.dumps(compare_product_batch(data))
+    return json.dumps(_comparison_from_item(data))
 
 # Tool instance suitable for ZeroShotAgent (single string input)
 product_comparison_agent_tool = Tool(
     name="product_comparison_tool",
     func=_agent_wrapper,
-    description="Create a product comparison from a JSON string input and return JSON."
+    description=(
+        "Create product comparisons from JSON. Input is one product object, or a JSON array of "
+        "product objects / product_scraper results to build the whole comparison table in one call. "
+        "Returns a JSON object, or a JSON array with one result or error per product."
+    )
 )
@@ -0,0 +1,39 @@
+# request_context.py
+"""
+Per-request state visible to tools while the agent handles one request.
+
+Tools such as PreferenceRetriever only receive the agent's query string, so
+request-level values (the user being served, ...) travel in context
+variables set by `request_scope` around the agent run. `request_state()`
+is a scratch dict that lives exactly as long as the request.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_USER_ID = "default"
+
+current_user_id: ContextVar[str] = ContextVar("current_user_id", default=DEFAULT_USER_ID)
+# The user's question, for tools that shape their output by relevance (see context_builder).
+current_query: ContextVar[str] = ContextVar("current_query", default="")
+_request_state: ContextVar = ContextVar("request_state", default=None)
+
+
+def request_state() -> dict:
+    """Per-request scratch dict; outside a request_scope this is a fresh throwaway dict."""
+    state = _request_state.get()
+    return state if state is not None else {}
+
+
+@contextmanager
+def request_scope(user_id: str = DEFAULT_USER_ID, query: str = ""):
+    """Set the request-level context for the duration of the block."""
+    tokens = (
+        (current_user_id, current_user_id.set(user_id or DEFAULT_USER_ID)),
+        (current_query, current_query.set(query or "")),
+        (_request_state, _request_state.set({})),
+    )
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
@@ -0,0 +1,97 @@
+# response_cache.py
+"""
+Semantic cache of final agent answers.
+
+Queries are embedded with the shared MiniLM model. A new query reuses a
+cached answer when an earlier query with the same user context (user id and
+retrieved preferences) is at least SIMILARITY_THRESHOLD cosine-similar and
+the entry is younger than RESPONSE_TTL seconds. The cache holds at most
+MAX_ENTRIES answers and evicts the least recently used first.
+"""
+from collections import OrderedDict
+import hashlib
+import itertools
+import threading
+import time
+
+import numpy as np
+
+from shared_resources import get_embedder
+from tracing import record_cache
+
+SIMILARITY_THRESHOLD = 0.92
+RESPONSE_TTL = 6 * 3600
+MAX_ENTRIES = 512
+
+
+def context_key(user_id: str, context: str) -> str:
+    """Answers are only shared between requests with the same user and retrieved context."""
+    return hashlib.sha1(f"{user_id}\0{context}".encode("utf-8")).hexdigest()
+
+
+class SemanticResponseCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl=RESPONSE_TTL, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # entry id -> (context key, vector, query, answer, created)
+        self._by_context = {}          # context key -> [entry ids]
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def embed(query: str) -> np.ndarray:
+        return np.asarray(get_embedder().encode(query.strip().lower(), normalize_embeddings=True), dtype=np.float32)
+
+    def _drop(self, entry_id):
+        ctx = self._entries.pop(entry_id)[0]
+        ids = self._by_context.get(ctx, [])
+        if entry_id in ids:
+            ids.remove(entry_id)
+        if not ids:
+            self._by_context.pop(ctx, None)
+
+    def lookup(self, vector: np.ndarray, ctx: str):
+        """Return (answer, similarity, cached query) for the best live match, or None."""
+        now = time.time()
+        with self._lock:
+            best, best_sim = None, -1.0
+            for entry_id in list(self._by_context.get(ctx, ())):
+                _, vec, _, _, created = self._entries[entry_id]
+                if now - created > self.ttl:
+                    self._drop(entry_id)
+                    self.metrics["expired"] += 1
+                    continue
+                sim = float(vec @ vector)
+                if sim > best_sim:
+                    best, best_sim = entry_id, sim
+            if best is None or best_sim < self.threshold:
+                self.metrics["misses"] += 1
+                hit = None
+            else:
+                self._entries.move_to_end(best)
+                self.metrics["hits"] += 1
+                _, _, query, answer, _ = self._entries[best]
+                hit = answer, best_sim, query
+        record_cache("response", hit is not None)
+        return hit
+
+    def store(self, query: str, vector: np.ndarray, ctx: str, answer: str):
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (ctx, vector, query, answer, time.time())
+            self._by_context.setdefault(ctx, []).append(entry_id)
+            self.metrics["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.metrics["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.metrics["hits"] + self.metrics["misses"]
+            return dict(self.metrics, entries=len(self._entries),
+                        hit_rate=self.metrics["hits"] / lookups if lookups else 0.0)
+
+
+response_cache = SemanticResponseCache()
@@ -0,0 +1,227 @@
+# review_aspects.py
+"""
+LLM-free Pros/Cons extraction from reviews.
+
+Review sentences are embedded in batches with the shared all-MiniLM-L6-v2 model, assigned to
+the closest product aspect (battery, sound, comfort, ...), scored for polarity
+and summarized into the same {"Pros": [...], "Cons": [...]} shape the LLM
+synthesis returns. Each point is the most central sentence of its
+aspect/polarity group.
+
+ASPECTS is a fixed taxonomy tuned for electronics (headphones, phones, laptops).
+For other categories most sentences fall below ASPECT_MIN_SIMILARITY; when more
+than CLUSTER_FALLBACK_SHARE of them would land in "Overall", those sentences are
+clustered with k-means over their embeddings instead and each cluster is named
+after its most frequent terms.
+"""
+import json
+import re
+import threading
+
+import numpy as np
+
+from shared_resources import get_embedder
+
+ENCODE_BATCH_SIZE = 64
+ASPECT_MIN_SIMILARITY = 0.3
+POLARITY_MARGIN = 0.03
+MAX_POINTS = 5
+MAX_POINT_CHARS = 160
+
+# Aspect name -> description embedded as the aspect's anchor.
+ASPECTS = {
+    "Battery life": "battery life, charging time, lasts hours on a single charge",
+    "Sound quality": "sound quality, audio, bass, treble, clarity, volume",
+    "Noise cancellation": "noise cancellation, ANC, blocks outside noise",
+    "Comfort": "comfort and fit, ear cushions, weight, wearing for long hours",
+    "Build quality": "build quality, durability, materials, broke after a few weeks",
+    "Connectivity": "bluetooth connection, pairing, range, disconnects, latency",
+    "Microphone": "microphone and call quality",
+    "Display": "screen, display brightness and resolution",
+    "Performance": "speed, performance, lag, heating",
+    "Camera": "camera, photos and video quality",
+    "Value for money": "price, value for money, worth it, too expensive",
+    "Delivery & service": "delivery, packaging, seller, customer service, returns",
+}
+GENERAL_ASPECT = "Overall"
+# Cluster the unmatched sentences when more than this share of them would be "Overall".
+CLUSTER_FALLBACK_SHARE = 0.5
+MAX_CLUSTERS = 6
+KMEANS_ITERATIONS = 10
+
+_POSITIVE_ANCHOR = "This is great, excellent quality, I love it and highly recommend it."
+_NEGATIVE_ANCHOR = "This is terrible, poor quality, I hate it and regret buying it."
+_POSITIVE_WORDS = {
+    "good", "great", "excellent", "amazing", "awesome", "love", "loved", "perfect", "best", "nice",
+    "comfortable", "clear", "crisp", "solid", "fast", "worth", "recommend", "superb", "fantastic", "happy",
+}
+_NEGATIVE_WORDS = {
+    "bad", "poor", "terrible", "awful", "worst", "hate", "broke", "broken", "disappointed", "disappointing",
+    "uncomfortable", "muddy", "slow", "expensive", "issue", "issues", "problem", "problems", "defective",
+    "hurts", "cheap", "waste", "return", "returned", "lag", "drops",
+}
+_NEGATORS = {"not", "no", "never", "isn't", "doesn't", "don't", "wasn't", "didn't", "hardly", "barely"}
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WEIGHT_PREFIX = re.compile(r"^\(x(\d+)\)\s*")
+_WORD = re.compile(r"[a-z']+")
+_LABEL_STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "was", "are", "its", "it's", "has", "have", "had", "but",
+    "very", "really", "too", "after", "just", "all", "one", "they", "them", "than", "even", "also", "from",
+    "product", "bought", "buy", "quality", "item", "use", "used", "using", "would", "will", "can", "could",
+}
+
+_anchors = None
+_anchors_lock = threading.Lock()
+
+
+def _encode(texts):
+    return np.asarray(
+        get_embedder().encode(texts, batch_size=ENCODE_BATCH_SIZE, normalize_embeddings=True, show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+
+def _get_anchors():
+    """Embeddings of the aspect descriptions and the two polarity anchors (computed once)."""
+    global _anchors
+    if _anchors is None:
+        with _anchors_lock:
+            if _anchors is None:
+                vectors = _encode(list(ASPECTS.values()) + [_POSITIVE_ANCHOR, _NEGATIVE_ANCHOR])
+                _anchors = (vectors[:len(ASPECTS)], vectors[-2], vectors[-1])
+    return _anchors
+
+
+def split_sentences(reviews):
+    """Return (sentences, weights), honouring '(xN) ' weight prefixes from review_dedup."""
+    sentences, weights = [], []
+    for review in reviews:
+        text = str(review).strip()
+        weight = 1
+        m = _WEIGHT_PREFIX.match(text)
+        if m:
+            weight = int(m.group(1))
+            text = text[m.end():]
+        for sentence in _SENTENCE_SPLIT.split(text):
+            sentence = sentence.strip()
+            if len(sentence) >= 3:
+                sentences.append(sentence)
+                weights.append(weight)
+    return sentences, weights
+
+
+def _lexicon_polarity(sentence: str) -> int:
+    score, negate = 0, 0
+    for word in _WORD.findall(sentence.lower()):
+        if word in _NEGATORS:
+            negate = 3
+            continue
+        sign = 1 if word in _POSITIVE_WORDS else -1 if word in _NEGATIVE_WORDS else 0
+        score += -sign if negate else sign
+        negate = max(0, negate - 1)
+    return score
+
+
+def _shorten(text: str) -> str:
+    return text if len(text) <= MAX_POINT_CHARS else text[:MAX_POINT_CHARS - 3].rstrip() + "..."
+
+
+def _kmeans(vectors, k: int):
+    """Cluster labels for unit `vectors`: cosine k-means seeded by farthest-point selection."""
+    centers = [0]
+    closest = vectors @ vectors[0]
+    while len(centers) < k:
+        nxt = int(closest.argmin())
+        centers.append(nxt)
+        closest = np.maximum(closest, vectors @ vectors[nxt])
+    centroids = vectors[centers]
+    labels = np.zeros(len(vectors), dtype=int)
+    for _ in range(KMEANS_ITERATIONS):
+        labels = (vectors @ centroids.T).argmax(axis=1)
+        for c in range(k):
+            members = vectors[labels == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return labels
+
+
+def _cluster_label(sentences) -> str:
+    """Name a cluster after its two most frequent content words (first seen wins ties)."""
+    counts = {}
+    for sentence in sentences:
+        for word in set(_WORD.findall(sentence.lower())):
+            if len(word) > 2 and word not in _LABEL_STOPWORDS and word not in _NEGATORS \
+                    and word not in _POSITIVE_WORDS and word not in _NEGATIVE_WORDS:
+                counts[word] = counts.get(word, 0) + 1
+    top = sorted(counts, key=lambda w: -counts[w])[:2]
+    return ", ".join(top).capitalize() if top else GENERAL_ASPECT
+
+
+def _cluster_general(sentences, vectors, aspects):
+    """Relabel the "Overall" sentences by clustering them, if they are most of the reviews."""
+    idx = [i for i, aspect in enumerate(aspects) if aspect == GENERAL_ASPECT]
+    if len(idx) < 4 or len(idx) <= CLUSTER_FALLBACK_SHARE * len(aspects):
+        return aspects
+    k = min(MAX_CLUSTERS, max(2, round((len(idx) / 2) ** 0.5)))
+    labels = _kmeans(vectors[idx], k)
+    names = {c: _cluster_label([sentences[i] for i, l in zip(idx, labels) if l == c]) for c in set(labels)}
+    aspects = list(aspects)
+    for i, label in zip(idx, labels):
+        aspects[i] = names[label]
+    return aspects
+
+
+def extract_pros_cons(reviews) -> dict:
+    """Return {"Pros": [...], "Cons": [...]} for `reviews` without calling an LLM."""
+    sentences, weights = split_sentences(reviews)
+    if not sentences:
+        return {"Pros": [], "Cons": []}
+
+    aspect_vecs, pos_anchor, neg_anchor = _get_anchors()
+    vectors = _encode(sentences)
+    weights = np.asarray(weights, dtype=np.float32)
+
+    aspect_sims = vectors @ aspect_vecs.T
+    best = aspect_sims.argmax(axis=1)
+    best_sim = aspect_sims[np.arange(len(sentences)), best]
+    names = list(ASPECTS)
+    aspects = [names[b] if s >= ASPECT_MIN_SIMILARITY else GENERAL_ASPECT for b, s in zip(best, best_sim)]
+    # Categories outside the taxonomy: group by what the reviews talk about instead
+    aspects = _cluster_general(sentences, vectors, aspects)
+
+    anchor_margin = vectors @ pos_anchor - vectors @ neg_anchor
+    polarity = []
+    for sentence, margin in zip(sentences, anchor_margin):
+        lex = _lexicon_polarity(sentence)
+        if lex:
+            polarity.append(1 if lex > 0 else -1)
+        elif abs(margin) >= POLARITY_MARGIN:
+            polarity.append(1 if margin > 0 else -1)
+        else:
+            polarity.append(0)
+
+    # Group sentence indices by (aspect, polarity) and rank groups by total weight
+    groups = {}
+    for i, (aspect, pol) in enumerate(zip(aspects, polarity)):
+        if pol:
+            groups.setdefault((aspect, pol), []).append(i)
+
+    points = {1: [], -1: []}
+    for (aspect, pol), idx in groups.items():
+        members = vectors[idx]
+        member_weights = weights[idx]
+        centroid = (members * member_weights[:, None]).sum(axis=0)
+        representative = sentences[idx[int((members @ centroid).argmax())]]
+        points[pol].append((float(member_weights.sum()), aspect, representative))
+
+    def _render(items):
+        items.sort(key=lambda t: (t[1] == GENERAL_ASPECT, -t[0]))
+        return [_shorten(f"{aspect}: {text}") for _, aspect, text in items[:MAX_POINTS]]
+
+    return {"Pros": _render(points[1]), "Cons": _render(points[-1])}
+
+
+def synthesize_reviews_local(reviews) -> str:
+    """JSON-string wrapper matching the review_synthesis_tool output."""
+    return json.dumps(extract_pros_cons(reviews))
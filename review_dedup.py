@@ -0,0 +1,119 @@
+# review_dedup.py
+"""
+Collapse exact and near-duplicate reviews before they are sent to an LLM.
+
+Reviews are normalized (case, punctuation, whitespace) for exact matching and
+compared with MinHash signatures over word shingles, bucketed by LSH bands,
+for near matches. Each surviving review keeps a weight equal to the number of
+reviews it stands for, so frequency can still inform the summary.
+"""
+from dataclasses import dataclass
+import hashlib
+import random
+import re
+
+from token_counter import count_tokens
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs with Jaccard >= ~0.5 become candidates
+NEAR_DUP_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)  # fixed seed: signatures are stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+@dataclass
+class ReviewCluster:
+    text: str    # representative review (first one seen)
+    weight: int  # number of reviews collapsed into this one
+
+
+def normalize_review(text: str) -> str:
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", str(text).lower())).strip()
+
+
+def _shingles(normalized: str) -> set:
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingles: set) -> tuple:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _estimated_jaccard(sig_a, sig_b) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def dedupe_reviews(reviews, threshold: float = NEAR_DUP_THRESHOLD) -> list:
+    """Return ReviewClusters for `reviews`, in first-seen order."""
+    clusters = []
+    by_normalized = {}
+    signatures = []  # cluster index -> signature
+    buckets = {}     # (band, band hash) -> [cluster index]
+    rows = NUM_PERM // LSH_BANDS
+
+    for review in reviews:
+        text = str(review).strip()
+        norm = normalize_review(text)
+        if not norm:
+            continue
+        if norm in by_normalized:
+            clusters[by_normalized[norm]].weight += 1
+            continue
+
+        sig = minhash_signature(_shingles(norm))
+        bands = [(b, sig[b * rows:(b + 1) * rows]) for b in range(LSH_BANDS)]
+        match = None
+        for band in bands:
+            for idx in buckets.get(band, ()):
+                if _estimated_jaccard(sig, signatures[idx]) >= threshold:
+                    match = idx
+                    break
+            if match is not None:
+                break
+
+        if match is not None:
+            clusters[match].weight += 1
+            by_normalized[norm] = match
+            continue
+
+        idx = len(clusters)
+        clusters.append(ReviewCluster(text=text, weight=1))
+        signatures.append(sig)
+        by_normalized[norm] = idx
+        for band in bands:
+            buckets.setdefault(band, []).append(idx)
+    return clusters
+
+
+def weighted_reviews(clusters) -> list:
+    """Render clusters as review strings, prefixing repeated ones with (xN)."""
+    return [c.text if c.weight == 1 else f"(x{c.weight}) {c.text}" for c in clusters]
+
+
+def prune_reviews(reviews) -> tuple:
+    """
+    Dedupe `reviews` and return (weighted review strings, stats).
+
+    stats has input/output review counts and the prompt tokens before and after.
+    """
+    reviews = [str(r) for r in reviews]
+    pruned = weighted_reviews(dedupe_reviews(reviews))
+    tokens_before = count_tokens("\n".join(reviews))
+    tokens_after = count_tokens("\n".join(pruned))
+    stats = {
+        "reviews_in": len(reviews),
+        "reviews_out": len(pruned),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+    }
+    return pruned, stats
@@ -0,0 +1,141 @@
+# review_harvester.py
+"""
+Opt-in harvester for the dedicated review listing pages of Amazon and Flipkart.
+
+The product pages only carry a handful of reviews. For a product URL this
+module derives the paginated review listing URLs, fetches several pages
+concurrently through the shared HTTP session and yields reviews as each page
+arrives, stopping once the review budget is met. Each page fetch holds one of
+product_scraper's per-domain slots, so harvesting never exceeds
+DOMAIN_CONCURRENCY for a storefront.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+import contextvars
+import time
+
+from http_session import fetch_page
+from product_scraper import domain_kind, domain_slot, parse_page, BYTE_BUDGETS, REQUEST_TIMEOUT
+from scrape_cache import amazon_asin, flipkart_item_id
+from tracing import span
+
+# Review listing pages fetched at once for a single product.
+REVIEW_PAGE_CONCURRENCY = 3
+DEFAULT_MAX_PAGES = 5
+DEFAULT_MAX_REVIEWS = 100
+
+_executor = ThreadPoolExecutor(max_workers=REVIEW_PAGE_CONCURRENCY * 2, thread_name_prefix="reviews")
+
+
+def review_page_urls(url: str, max_pages: int = DEFAULT_MAX_PAGES) -> list:
+    """Return the review listing URLs (pages 1..max_pages) for a product URL, or [] if unknown."""
+    parsed = urlparse(url)
+    kind = domain_kind(url)
+
+    if kind == "amazon":
+        asin = amazon_asin(url)
+        if not asin:
+            return []
+        base = f"{parsed.scheme or 'https'}://{parsed.netloc}/product-reviews/{asin}/"
+        return [f"{base}?reviewerType=all_reviews&pageNumber={n}" for n in range(1, max_pages + 1)]
+
+    if kind == "flipkart":
+        itm = flipkart_item_id(url)
+        if not itm:
+            return []
+        slug = parsed.path.split("/p/")[0] if "/p/" in parsed.path else ""
+        path = f"{slug}/product-reviews/{itm}"
+        pid = [(k, v) for k, v in parse_qsl(parsed.query) if k == "pid"]
+        return [
+            urlunparse((parsed.scheme or "https", parsed.netloc, path, "", urlencode(pid + [("page", n)]), ""))
+            for n in range(1, max_pages + 1)
+        ]
+
+    return []
+
+
+def _extract_page_reviews(html: str, kind: str) -> list:
+    soup = parse_page(html, f"{kind}_reviews")
+    if kind == "amazon":
+        nodes = soup.select('[data-hook="review-body"] span') or soup.select(".review-text-content span")
+    else:
+        nodes = soup.select("div.t-ZTKy div")
+    reviews = []
+    for node in nodes:
+        text = node.get_text(strip=True)
+        if text:
+            reviews.append(text)
+    return reviews
+
+
+def _fetch_page_reviews(page_url: str, kind: str, deadline_at: float = None) -> list:
+    """Reviews on one listing page; a failed page is recorded on its span and yields []."""
+    with span("review_page", "fetch", url=page_url, domain=kind) as s:
+        try:
+            with domain_slot(kind, deadline_at):
+                timeout = REQUEST_TIMEOUT
+                if deadline_at is not None:
+                    timeout = max(1.0, min(REQUEST_TIMEOUT, deadline_at - time.monotonic()))
+                page = fetch_page(page_url, timeout=timeout, max_bytes=BYTE_BUDGETS[kind])
+            s.attrs.update(status_code=page.status_code, bytes=page.bytes_read, revalidated=page.revalidated)
+            if page.status_code != 200:
+                s.status = "error"
+                s.attrs["error"] = f"HTTP {page.status_code}"
+                return []
+            return _extract_page_reviews(page.text, kind)
+        except Exception as e:
+            s.status = "error"
+            s.attrs["error"] = str(e)[:500]
+            return []
+
+
+def harvest_reviews(url: str, max_pages: int = DEFAULT_MAX_PAGES, max_reviews: int = DEFAULT_MAX_REVIEWS,
+                    seen=None, deadline_at: float = None):
+    """
+    Yield unique review texts for `url` as review pages arrive.
+
+    Pages are fetched concurrently (REVIEW_PAGE_CONCURRENCY at a time) and reviews
+    are yielded in page-completion order until `max_reviews` have been produced or
+    `deadline_at` (a time.monotonic() value) passes. Reviews already in `seen` are
+    skipped. Unsupported sites yield nothing.
+    """
+    kind = domain_kind(url)
+    page_urls = review_page_urls(url, max_pages)
+    if not page_urls or max_reviews <= 0:
+        return
+
+    seen = set(seen or ())
+    produced = 0
+    pending = list(page_urls)
+    running = {}
+
+    def _submit_next():
+        page_url = pending.pop(0)
+        # Run in a copy of the caller's context so the page span nests under the scrape span
+        running[_executor.submit(contextvars.copy_context().run, _fetch_page_reviews, page_url, kind,
+                                 deadline_at)] = page_url
+
+    while pending and len(running) < REVIEW_PAGE_CONCURRENCY:
+        _submit_next()
+
+    try:
+        while running:
+            timeout = None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+            try:
+                fut = next(as_completed(list(running), timeout=timeout))
+            except FuturesTimeout:
+                return
+            del running[fut]
+            if pending:
+                _submit_next()
+            for review in fut.result():
+                if review in seen:
+                    continue
+                seen.add(review)
+                yield review
+                produced += 1
+                if produced >= max_reviews:
+                    return
+    finally:
+        for fut in running:
+            fut.cancel()
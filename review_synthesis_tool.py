@@ -2,13 +2,27 @@ from langchain.tools import StructuredTool
 from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
-from typing import List
+from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
+import os
+import re
+from token_counter import count_tokens, truncate_to_tokens
+from review_dedup import prune_reviews
+from context_builder import record_review_dedup, scraped_reviews
+from llm_cache import install_llm_cache
+from tracing import span
 
 # Step 1: Define input model
 class MultiReviewInput(BaseModel):
     # Use typing.List for broader compatibility with pydantic/langchain parsing
-    reviews: List[str] = Field(..., description="A list of unstructured review texts to analyze")
+    # The ReAct agent passes tool input as one string (usually a JSON list); safe_synthesize_reviews parses it
+    reviews: Union[List[str], str] = Field(..., description=(
+        "A list of unstructured review texts to analyze, or the URL of a product already "
+        "scraped with product_scraper to analyze all of its harvested reviews"))
+    # No `mode` field: ZeroShotAgent only accepts single-input tools, so the agent
+    # always gets REVIEW_SYNTHESIS_MODE; direct callers pass mode= to safe_synthesize_reviews.
 
 # Step 2: Define the system prompt
 multi_review_prompt = """
@@ -23,6 +37,7 @@ that reflect the overall sentiment of the reviewers.
 3. Identify the **most common negative points** (Cons).
 4. Merge similar ideas (e.g., "great sound" and "excellent audio" → "Good sound quality").
 5. Ignore neutral or irrelevant comments.
+   A review prefixed with (xN) was posted N times; weigh it accordingly.
 6. Return your response in this **exact JSON format**:
 
 {
@@ -45,27 +60,157 @@ that reflect the overall sentiment of the reviewers.
 """
 
 # Step 3: Define model and prompt chain
+# Temperature-0 calls through `model` are served from the on-disk LLM cache, which
+# each synthesis entry point installs on first use (importing this module creates no files)
 model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 # ---- Define the synthesis function ----
 def synthesize_reviews(reviews: list[str]) -> str:
+    install_llm_cache()
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
     joined_reviews = "\n".join(reviews)
     prompt = PromptTemplate(
         input_variables=["reviews"],
         template=(
-            "Analyze the following product reviews and summarize them into key Pros and Cons:\n\n{reviews}"
+            "Analyze the following product reviews and summarize them into key Pros and Cons. "
+            "A review prefixed with (xN) was posted N times; weigh it accordingly:\n\n{reviews}"
         ),
     )
     chain = prompt | llm
     response = chain.invoke({"reviews": joined_reviews})
     return response.content
 
+# ---- Map-reduce synthesis for large review sets ----
+# Reviews above this many tokens are summarized chunk-by-chunk instead of in one prompt.
+SINGLE_PASS_TOKEN_LIMIT = 6000
+MAP_CHUNK_TOKENS = 3000
+MAP_CONCURRENCY = 4
+# Hard cap on review tokens sent to the map step; reviews past it are dropped.
+MAX_TOTAL_REVIEW_TOKENS = 60000
+
+# multi_review_prompt contains a literal JSON example, so escape its braces for templating.
+_system_prompt = multi_review_prompt.replace("{", "{{").replace("}", "}}")
+
+map_prompt = ChatPromptTemplate.from_messages([
+    ("system", _system_prompt),
+    ("human", "Reviews:\n{reviews}"),
+])
+
+reduce_prompt = ChatPromptTemplate.from_messages([
+    ("system", _system_prompt),
+    ("human", (
+        "The reviews were analyzed in batches. Below are the Pros/Cons extracted from each batch, "
+        "one JSON object per line. Merge them into a single list of the most common Pros and Cons, "
+        "combining duplicates.\n\n{partials}"
+    )),
+])
+
+
+def chunk_reviews(reviews, chunk_tokens: int = MAP_CHUNK_TOKENS, max_total_tokens: int = MAX_TOTAL_REVIEW_TOKENS):
+    """
+    Group reviews into chunks of at most `chunk_tokens` tokens each.
+
+    `reviews` may be any iterable; chunks are yielded as they fill. Stops once
+    `max_total_tokens` have been emitted.
+    """
+    chunk, chunk_size, total = [], 0, 0
+    for review in reviews:
+        review = str(review).strip()
+        if not review:
+            continue
+        review = truncate_to_tokens(review, chunk_tokens)
+        size = count_tokens(review)
+        if total + size > max_total_tokens:
+            break
+        if chunk and chunk_size + size > chunk_tokens:
+            yield chunk
+            chunk, chunk_size = [], 0
+        chunk.append(review)
+        chunk_size += size
+        total += size
+    if chunk:
+        yield chunk
+
+
+def _parse_pros_cons(text: str) -> dict:
+    """Pull the {"Pros": [...], "Cons": [...]} object out of a model reply."""
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except json.JSONDecodeError:
+        data = {}
+    return {
+        "Pros": [str(p) for p in data.get("Pros") or []],
+        "Cons": [str(c) for c in data.get("Cons") or []],
+    }
+
+
+def _map_chunk(chunk: list) -> dict:
+    response = (map_prompt | model).invoke({"reviews": "\n".join(f"- {r}" for r in chunk)})
+    return _parse_pros_cons(response.content)
+
+
+def synthesize_reviews_map_reduce(reviews, concurrency: int = MAP_CONCURRENCY,
+                                  chunk_tokens: int = MAP_CHUNK_TOKENS,
+                                  max_total_tokens: int = MAX_TOTAL_REVIEW_TOKENS) -> str:
+    """
+    Summarize a large review set into the {"Pros": [...], "Cons": [...]} JSON.
+
+    Map: reviews are split into token-bounded chunks and each chunk is summarized
+    by a parallel LLM call (at most `concurrency` at once). Reduce: the partial
+    lists are merged by one final call.
+    """
+    install_llm_cache()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _map_chunk, chunk)
+                   for chunk in chunk_reviews(reviews, chunk_tokens, max_total_tokens)]
+        partials = [f.result() for f in futures]
+
+    if not partials:
+        return json.dumps({"Pros": [], "Cons": []})
+    if len(partials) == 1:
+        return json.dumps(partials[0])
+
+    response = (reduce_prompt | model).invoke({"partials": "\n".join(json.dumps(p) for p in partials)})
+    return json.dumps(_parse_pros_cons(response.content))
+
+
+# ---- Local (LLM-free) and refine modes ----
+SYNTHESIS_MODES = ("llm", "local", "local-then-llm-refine")
+DEFAULT_SYNTHESIS_MODE = os.getenv("REVIEW_SYNTHESIS_MODE", "llm")
+
+refine_prompt = ChatPromptTemplate.from_messages([
+    ("system", _system_prompt),
+    ("human", (
+        "An automatic aspect extractor produced this draft from {count} reviews. Each point is "
+        "'Aspect: representative review sentence'. Rewrite every point as one concise statement, "
+        "merge overlapping points and drop any that are not real pros or cons.\n\n{draft}"
+    )),
+])
+
+
+def synthesize_reviews_refined(reviews: list) -> str:
+    """Draft Pros/Cons locally, then have the LLM polish the short draft instead of reading every review."""
+    from review_aspects import extract_pros_cons
+
+    draft = extract_pros_cons(reviews)
+    if not draft["Pros"] and not draft["Cons"]:
+        return json.dumps(draft)
+    install_llm_cache()
+    response = (refine_prompt | model).invoke({"count": len(reviews), "draft": json.dumps(draft, indent=2)})
+    return json.dumps(_parse_pros_cons(response.content))
+
+
 # ---- Add auto-handling for stringified lists ----
-def safe_synthesize_reviews(reviews):
+def safe_synthesize_reviews(reviews, mode: Optional[str] = None):
     """Accepts the keyword argument `reviews` (list or string). If a string is provided,
     attempt to JSON-decode it into a list; otherwise treat it as a single review.
+    Entries that are the URL of a product scraped in this request are replaced by
+    that product's full harvested review list (the scraper observation only shows a few).
     This matches the MultiReviewInput args schema so StructuredTool can call the
     function with the `reviews=` keyword.
+
+    `mode` picks the synthesis path (see SYNTHESIS_MODES); it defaults to the
+    REVIEW_SYNTHESIS_MODE environment variable, then 'llm'.
     """
     # If passed as stringified list, safely parse it
     if isinstance(reviews, str):
@@ -83,12 +228,44 @@ def safe_synthesize_reviews(reviews):
     if not isinstance(reviews, list):
         reviews = [str(reviews)]
 
+    # Scraped product URLs stand for every review harvested for that product in this request
+    expanded = []
+    for review in reviews:
+        stashed = scraped_reviews(review) if isinstance(review, str) else None
+        expanded.extend(stashed if stashed is not None else [review])
+    reviews = expanded
+
+    mode = mode or DEFAULT_SYNTHESIS_MODE
+    with span("review_synthesis", "synthesis", mode=mode) as s:
+        # Collapse exact/near-duplicate reviews so repeats are not paid for in tokens
+        reviews, dedup_stats = prune_reviews(reviews)
+        s.attrs.update({k: dedup_stats[k] for k in ("reviews_in", "reviews_out", "tokens_saved")})
+        record_review_dedup(dedup_stats)
+        return _synthesize(reviews, mode, dedup_stats["tokens_after"])
+
+
+def _synthesize(reviews: list, mode: str, review_tokens: int):
+    if mode not in SYNTHESIS_MODES:
+        return json.dumps({"error": f"Unknown synthesis mode '{mode}'. Use one of: {', '.join(SYNTHESIS_MODES)}"})
+    if mode == "local":
+        from review_aspects import synthesize_reviews_local
+        return synthesize_reviews_local(reviews)
+    if mode == "local-then-llm-refine":
+        return synthesize_reviews_refined(reviews)
+
+    # Large review sets would overflow a single prompt; summarize them map-reduce style
+    if review_tokens > SINGLE_PASS_TOKEN_LIMIT:
+        return synthesize_reviews_map_reduce(reviews)
     return synthesize_reviews(reviews)
 
 # ---- Create the Tool ----
 review_synthesis_tool = StructuredTool.from_function(
     name="review_synthesis_tool",
-    description="Summarize multiple product reviews into clear Pros and Cons.",
+    description=(
+        "Summarize multiple product reviews into clear Pros and Cons. Input is a JSON list of "
+        "review texts, or the URL of a product already scraped with product_scraper to "
+        "summarize all of its harvested reviews."
+    ),
     func=safe_synthesize_reviews,
     args_schema=MultiReviewInput,
 )
\ No newline at end of file
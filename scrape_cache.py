@@ -0,0 +1,215 @@
+# scrape_cache.py
+"""
+Disk-backed cache for scraper results, keyed by canonical product identity.
+
+Amazon pages are keyed by marketplace + ASIN, Flipkart pages by their `itm`
+id, and everything else by a normalized URL with tracking parameters removed.
+Entries expire after a per-domain TTL and the store is kept under a byte
+budget by evicting least-recently-used rows. Concurrent requests for the same
+key share a single fetch.
+"""
+from urllib.parse import urlparse, parse_qsl, urlencode
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from tracing import record_cache
+
+CACHE_PATH = "./scrape_cache.db"
+CACHE_ENABLED = True
+# Seconds a scraped result stays fresh, per domain kind.
+DOMAIN_TTLS = {"amazon": 6 * 3600, "flipkart": 6 * 3600, "generic": 24 * 3600}
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+_ASIN_RE = re.compile(r"/(?:dp|gp/product|gp/aw/d|product-reviews)/([A-Z0-9]{10})(?:[/?]|$)", re.IGNORECASE)
+_FLIPKART_ITM_RE = re.compile(r"/(?:p|product-reviews)/(itm[0-9a-z]+)", re.IGNORECASE)
+_TRACKING_PARAMS = {"ref", "ref_", "tag", "gclid", "fbclid", "psc", "th", "smid", "spm", "srsltid",
+                    "qid", "sr", "keywords", "crid", "sprefix", "lid", "marketplace", "store", "srno", "otracker"}
+
+
+def _bare_host(netloc: str) -> str:
+    host = netloc.lower().split(":")[0]
+    return host[4:] if host.startswith("www.") else host
+
+
+def amazon_asin(url: str):
+    """Return the ASIN in an Amazon product or review URL, or None."""
+    m = _ASIN_RE.search(urlparse(url).path)
+    return m.group(1).upper() if m else None
+
+
+def flipkart_item_id(url: str):
+    """Return the `itm...` id in a Flipkart product or review URL, or None."""
+    m = _FLIPKART_ITM_RE.search(urlparse(url).path)
+    return m.group(1).lower() if m else None
+
+
+def canonical_product_key(url: str) -> str:
+    """
+    Map a product URL to a stable cache key.
+
+      https://www.amazon.in/Sony-WH/dp/B0C7S2FL8K/?ref=x  -> "amazon.in:B0C7S2FL8K"
+      https://www.flipkart.com/poco/p/itm2c4f2561da8a0   -> "flipkart:itm2c4f2561da8a0"
+      anything else                                       -> normalized URL
+    """
+    parsed = urlparse(url.strip())
+    host = _bare_host(parsed.netloc)
+
+    if "amazon" in host:
+        asin = amazon_asin(url)
+        if asin:
+            return f"{host}:{asin}"
+    if "flipkart" in host:
+        itm = flipkart_item_id(url)
+        if itm:
+            return f"flipkart:{itm}"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=False)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    path = parsed.path.rstrip("/") or "/"
+    normalized = f"{(parsed.scheme or 'https').lower()}://{host}{path}"
+    if query:
+        normalized += "?" + urlencode(sorted(query))
+    return normalized
+
+
+class ScrapeCache:
+    """SQLite store of scrape results with per-entry TTL and LRU eviction by size."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scrape_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scrape_cache_accessed ON scrape_cache (accessed_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, count=True):
+        """The stored value, or None if missing or expired. `count=False` leaves hit/miss stats untouched."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM scrape_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM scrape_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                if count:
+                    self.misses += 1
+                    record_cache("scrape", False)
+                return None
+            self._conn.execute("UPDATE scrape_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            if count:
+                self.hits += 1
+        if count:
+            record_cache("scrape", True)
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl):
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scrape_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now + ttl, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        # Expired rows first, then least recently used until under the byte budget.
+        self._conn.execute("DELETE FROM scrape_cache WHERE expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM scrape_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM scrape_cache ORDER BY accessed_at ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM scrape_cache WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scrape_cache").fetchone()
+        return {"entries": entries, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get_cache() -> ScrapeCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScrapeCache()
+    return _cache
+
+
+def cached_scrape(url: str, kind: str, compute, wait_timeout: float, variant: str = ""):
+    """
+    Return the scrape result for `url`, using the cache and single-flight de-duplication.
+
+    `compute()` must return a scraper result dict; only results with status "ok" are
+    stored. Callers that find an identical request already in flight wait up to
+    `wait_timeout` seconds for it instead of fetching again. `variant` separates
+    results of the same product scraped with different options.
+    """
+    if not CACHE_ENABLED:
+        return compute()
+
+    key = canonical_product_key(url)
+    if variant:
+        key = f"{key}#{variant}"
+    cache = get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        return dict(hit, url=url)
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(timeout=max(0.0, wait_timeout)) or flight.result is None:
+            return {"url": url, "status": "error", "error": "Timed out waiting for an identical in-flight fetch."}
+        return dict(flight.result, url=url)
+
+    try:
+        # An earlier leader may have finished between our cache miss and taking the lead.
+        # This re-check is part of the same lookup, so it is not counted again.
+        hit = cache.get(key, count=False)
+        if hit is not None:
+            flight.result = dict(hit, url=url)
+            return flight.result
+        result = compute()
+        flight.result = result
+        if result.get("status") == "ok":
+            stored = {k: v for k, v in result.items() if k != "url"}
+            cache.put(key, stored, DOMAIN_TTLS.get(kind, DOMAIN_TTLS["generic"]))
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
@@ -0,0 +1,108 @@
+# shared_resources.py
+"""
+Lazy, process-wide factories for the expensive objects the agent needs.
+
+Nothing is built at import time. The first call to a factory constructs the
+object, records how long that took in STARTUP_TIMINGS, and every later call
+returns the same instance. The embedding model and the Chroma client are
+shared by agent.py, memory_manager.py and everything else in the process.
+"""
+from functools import wraps
+import os
+import threading
+import time
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+CHROMA_PATH = "./chroma_db"
+COLLECTION_NAME = "user_preferences"
+LLM_MODEL_NAME = "gemini-pro-latest"
+
+# component name -> seconds spent building it (first call only)
+STARTUP_TIMINGS = {}
+
+
+def lazy_resource(name):
+    """Decorator: build the resource once (thread-safe) and record its build time under `name`."""
+    def decorator(factory):
+        lock = threading.Lock()
+        instance = []
+
+        @wraps(factory)
+        def wrapper():
+            if not instance:
+                with lock:
+                    if not instance:
+                        started = time.perf_counter()
+                        instance.append(factory())
+                        STARTUP_TIMINGS[name] = time.perf_counter() - started
+            return instance[0]
+
+        wrapper.is_built = lambda: bool(instance)
+        return wrapper
+    return decorator
+
+
+@lazy_resource("llm")
+def get_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from llm_cache import install_llm_cache
+
+    install_llm_cache()
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL_NAME,
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+        temperature=0
+    )
+
+
+@lazy_resource("embedder")
+def get_embedder():
+    """The shared SentenceTransformer, behind the content-addressed embedding cache."""
+    from sentence_transformers import SentenceTransformer
+    from embedding_cache import CachedEmbedder
+
+    return CachedEmbedder(SentenceTransformer(EMBEDDING_MODEL_NAME), EMBEDDING_MODEL_NAME)
+
+
+@lazy_resource("embeddings")
+def get_embeddings():
+    """LangChain embedding wrapper around get_embedder() (same vectors as SentenceTransformerEmbeddings)."""
+    from embedding_cache import CachedEmbeddings
+
+    return CachedEmbeddings(get_embedder())
+
+
+@lazy_resource("chroma_client")
+def get_chroma_client():
+    import chromadb
+
+    return chromadb.PersistentClient(path=CHROMA_PATH)
+
+
+@lazy_resource("vectorstore")
+def get_vectorstore():
+    from langchain.vectorstores import Chroma
+
+    return Chroma(
+        client=get_chroma_client(),
+        collection_name=COLLECTION_NAME,
+        embedding_function=get_embeddings(),
+        persist_directory=CHROMA_PATH
+    )
+
+
+def preference_count() -> int:
+    """Number of stored preference documents, without loading the collection."""
+    return get_vectorstore()._collection.count()
+
+
+def startup_report() -> str:
+    """Format STARTUP_TIMINGS as a small table, slowest component first."""
+    if not STARTUP_TIMINGS:
+        return "No components initialized yet."
+    width = max(len(name) for name in STARTUP_TIMINGS)
+    lines = [f"{'component'.ljust(width)}  seconds"]
+    for name, seconds in sorted(STARTUP_TIMINGS.items(), key=lambda kv: -kv[1]):
+        lines.append(f"{name.ljust(width)}  {seconds:7.3f}")
+    lines.append(f"{'total'.ljust(width)}  {sum(STARTUP_TIMINGS.values()):7.3f}")
+    return "\n".join(lines)
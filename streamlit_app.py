@@ -12,33 +12,120 @@ st.markdown(
     "Enter a shopping-related question and the app will run the RAG retriever + multi-step agent to answer."
 )
 
+@st.cache_resource(show_spinner=False)
+def _agent_pool():
+    """Process-wide warm pool of agent executors shared by every session."""
+    from agent_pool import get_pool
+    return get_pool()
+
+_agent_pool()
+
 with st.sidebar:
     st.header("Settings")
+    user_id = st.text_input("User ID", value="default", help="Preferences are retrieved for this user only.")
     k = st.number_input("Retriever k (top docs)", min_value=1, max_value=10, value=3, step=1)
     run_button_label = st.button("Run Agent")
+    pool_stats = _agent_pool().stats()
+    st.caption(f"Agent pool: {pool_stats['busy']}/{pool_stats['workers']} busy, {pool_stats['queued']} queued")
+    with st.expander("Performance"):
+        import tracing
+        trace_rows = tracing.summary()
+        if trace_rows:
+            st.dataframe(pd.DataFrame(trace_rows), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No requests traced yet.")
+        caches = tracing.cache_summary()
+        if caches:
+            st.caption(" · ".join(f"{name} cache: {c['hit']}/{c['hit'] + c['miss']} hits" for name, c in caches.items()))
+        st.caption(f"Spans: {tracing.TRACE_JSONL_PATH} · Metrics: {tracing.PROMETHEUS_PATH}")
 
 query = st.text_area("Question", height=140, placeholder="e.g. Compare top noise-cancelling headphones and summarize user reviews...")
 
 if 'last_response' not in st.session_state:
     st.session_state['last_response'] = None
 
-def _run_agent(question: str, k: int) -> str:
+_CURRENCY_SYMBOLS = {"USD": "$", "INR": "₹", "EUR": "€", "GBP": "£"}
+
+def _format_price(p, currency=None):
+    """Price with its currency's symbol (or ISO code); a bare number when the currency is unknown."""
+    try:
+        if p is None or (isinstance(p, float) and pd.isna(p)):
+            return "N/A"
+        if not isinstance(p, (int, float, Decimal)):
+            # handle strings like "$199" or "₹2,999"
+            p = float(str(p).strip().lstrip("$₹€£").replace(",", ""))
+        symbol = _CURRENCY_SYMBOLS.get(currency, f"{currency} " if currency else "")
+        return f"{symbol}{p:,.2f}"
+    except Exception:
+        return str(p)
+
+def _partial_table(rows):
+    """Comparison rows received so far, one line per product."""
+    return pd.DataFrame([{
+        "product_name": r.get("product_name"),
+        "price": _format_price(r.get("price"), r.get("currency")),
+        "battery_life": r.get("battery_life"),
+        "pros_summary": "; ".join(r.get("pros_summary") or []),
+        "cons_summary": "; ".join(r.get("cons_summary") or []),
+    } for r in rows])
+
+def _run_agent(question: str, k: int, user_id: str) -> str:
+    """Queue the question on the shared agent pool and render its progress as it streams in."""
+    from agent_pool import PoolBusyError
+
     try:
-        # Import here to avoid costly imports when the UI is just idle
-        from agent import run_rag_agent
+        ticket = _agent_pool().submit(question, k=k, user_id=user_id.strip() or None, stream=True)
+    except PoolBusyError as e:
+        return f"Error running agent: {e} Please try again shortly."
+    except Exception as e:
+        return f"Error running agent: {e}"
 
-        resp = run_rag_agent(question, k=k)
-        return resp
+    status = st.empty()
+    with st.expander("Agent progress", expanded=True):
+        steps_area = st.container()
+        tokens_area = st.empty()
+    rows_area = st.empty()
+    tokens, rows = "", []
+    try:
+        for event in ticket.events.events(poll_interval=0.5):
+            if event is None:
+                position = ticket.position()
+                if position:
+                    status.info(f"Queued — position {position} in line...")
+                else:
+                    status.info("Running agent — this may take a few seconds...")
+                continue
+            kind = event["type"]
+            if kind == "token":
+                tokens += event["text"]
+                tokens_area.code(tokens[-1500:], language=None)
+            elif kind == "tool_start":
+                status.info(f"Running {event['tool']}...")
+                steps_area.markdown(f"**→ {event['tool']}** `{event['input'][:200]}`")
+            elif kind == "tool_end":
+                steps_area.caption(f"✓ {event['tool']}: {event['output'][:300]}")
+            elif kind == "tool_error":
+                steps_area.warning(f"{event['tool']} failed: {event['error']}")
+            elif kind == "comparison":
+                # Show products as soon as each comparison is built, before the agent finishes
+                rows.extend(event["rows"])
+                rows_area.dataframe(_partial_table(rows), use_container_width=True)
+            elif kind == "final":
+                if event.get("error"):
+                    return f"Error running agent: {event['error']}"
+                return event.get("output")
+        return ticket.result()
     except Exception as e:
         return f"Error running agent: {e}"
+    finally:
+        status.empty()
 
 if st.button("Submit") or run_button_label:
     if not query or not query.strip():
         st.warning("Please enter a question before submitting.")
     else:
-        with st.spinner("Running agent — this may take a few seconds..."):
-            response = _run_agent(query.strip(), k)
-            st.session_state['last_response'] = response
+        response = _run_agent(query.strip(), k, user_id)
+        st.session_state['last_response'] = response
 
 def _display_product_comparison_obj(obj):
     """Display a single ProductComparison-like dict in a clean layout."""
@@ -53,24 +140,8 @@ def _display_product_comparison_obj(obj):
 
     # Show key metrics
     mcol1, mcol2, mcol3 = st.columns(3)
-    # Format price if numeric
-    def _format_price(p):
-        try:
-            # handle strings like "$199" or numbers
-            if p is None:
-                return "N/A"
-            if isinstance(p, (int, float, Decimal)):
-                return f"${p:,.2f}"
-            # try parseable numeric string
-            s = str(p).strip()
-            s2 = s.replace("$", "").replace(",", "")
-            v = float(s2)
-            return f"${v:,.2f}"
-        except Exception:
-            return str(p)
-
     with mcol1:
-        st.metric("Price", _format_price(price))
+        st.metric("Price", _format_price(price, obj.get("currency")))
     with mcol2:
         st.metric("Battery life", battery or "N/A")
     with mcol3:
@@ -116,35 +187,24 @@ if st.session_state.get('last_response'):
             _display_product_comparison_obj(parsed)
         # If it's a list of product dicts, show a table summary and expanders
         elif isinstance(parsed, list) and parsed and all(isinstance(p, dict) for p in parsed):
+            # Batch comparisons report failed items inline; list them apart from the table
+            for p in parsed:
+                if "error" in p:
+                    st.warning(f"{p.get('product_name') or 'Item ' + str(p.get('index', '?'))}: {p['error']}")
+            parsed = [p for p in parsed if "error" not in p]
             # Build table rows
             rows = []
             for p in parsed:
                 rows.append({
                     "product_name": p.get("product_name") or p.get("title"),
-                    "price": p.get("price"),
+                    "price": _format_price(p.get("price"), p.get("currency")),
                     "battery_life": p.get("battery_life"),
                     "pros_summary": "; ".join(p.get("pros_summary") or p.get("pros") or []),
                     "cons_summary": "; ".join(p.get("cons_summary") or p.get("cons") or [])
                 })
             st.subheader("Comparison table")
             # Build DataFrame for nicer formatting
-            df = pd.DataFrame(rows)
-
-            # Format price if possible
-            def _fmt_price_col(x):
-                try:
-                    if x is None:
-                        return "N/A"
-                    if isinstance(x, (int, float, Decimal)):
-                        return f"${x:,.2f}"
-                    s = str(x).strip().replace("$", "").replace(",", "")
-                    v = float(s)
-                    return f"${v:,.2f}"
-                except Exception:
-                    return str(x)
-
-            if "price" in df.columns:
-                df["price"] = df["price"].apply(_fmt_price_col)
+            df = pd.DataFrame(rows, columns=["product_name", "price", "battery_life", "pros_summary", "cons_summary"])
 
             # Shorten pros/cons columns for table view
             df["pros_summary"] = df["pros_summary"].apply(lambda s: (s[:140] + "...") if isinstance(s, str) and len(s) > 140 else s)
@@ -0,0 +1,20 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, ROOT)
+
+# Clients are constructed at import time in some modules; no test talks to the real APIs.
+for _key in ("OPENAI_API_KEY", "GOOGLE_API_KEY", "SERPAPI_API_KEY"):
+    os.environ.setdefault(_key, "test")
+
+# Stores default to ./relative paths (caches, Chroma, traces); keep them out of the checkout.
+os.chdir(tempfile.mkdtemp(prefix="shopper_tests_"))
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,34 @@
+# tests/test_agent.py
+import agent
+from context_builder import PromptBudgetCallback
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, inputs, callbacks=None):
+        self.calls.append((inputs, callbacks))
+        return "done"
+
+
+def test_retriever_failure_keeps_the_callbacks(monkeypatch):
+    def failing_preferences(query, k=3):
+        raise RuntimeError("chroma down")
+
+    monkeypatch.setattr(agent, "request_preferences", failing_preferences)
+    executor, events = RecordingAgent(), object()
+    assert agent.run_rag_agent("headphones", agent_executor=executor, use_cache=False, events=events) == "done"
+    [(inputs, callbacks)] = executor.calls
+    assert inputs == {"input": "headphones"}
+    assert events in callbacks
+    assert any(isinstance(c, PromptBudgetCallback) for c in callbacks)
+
+
+def test_preferences_fetched_once_with_requested_k(monkeypatch):
+    requested = []
+    monkeypatch.setattr(agent, "request_preferences", lambda query, k=3: requested.append(k) or [])
+    executor = RecordingAgent()
+    agent.run_rag_agent("headphones", k=7, agent_executor=executor, use_cache=False)
+    assert requested == [7]
+    assert not hasattr(agent, "get_retriever")
@@ -0,0 +1,61 @@
+# tests/test_agent_pool.py
+import threading
+
+import pytest
+
+import agent
+from agent_pool import AgentPool, PoolBusyError
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def run_rag_agent(question, k=3, agent_executor=None, user_id=None, events=None):
+        calls.append(("run", question))
+        release.wait(5)
+        return f"answer to {question}"
+
+    monkeypatch.setattr(agent, "warm_up", lambda: calls.append(("warm_up", None)))
+    monkeypatch.setattr(agent, "build_agent", lambda: calls.append(("build", None)) or object())
+    monkeypatch.setattr(agent, "run_rag_agent", run_rag_agent)
+    return calls, release
+
+
+def test_workers_warm_shared_resources_before_serving(fake_agent):
+    calls, _ = fake_agent
+    pool = AgentPool(workers=1, max_pending=4)
+    try:
+        assert pool.submit("best earbuds").result(timeout=5) == "answer to best earbuds"
+    finally:
+        pool.shutdown()
+    assert [name for name, _ in calls] == ["warm_up", "build", "run"]
+
+
+def test_full_queue_pushes_back(fake_agent):
+    _, release = fake_agent
+    release.clear()
+    pool = AgentPool(workers=1, max_pending=1)
+    try:
+        first = pool.submit("q1")
+        while first.position():  # wait for the worker to pick it up
+            threading.Event().wait(0.01)
+        queued = pool.submit("q2")
+        assert queued.position() == 1
+        with pytest.raises(PoolBusyError):
+            pool.submit("q3")
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_streaming_ticket_ends_with_final_event(fake_agent):
+    pool = AgentPool(workers=1, max_pending=4)
+    try:
+        ticket = pool.submit("q", stream=True)
+        events = list(ticket.events.events())
+    finally:
+        pool.shutdown()
+    assert events[-1] == {"type": "final", "output": "answer to q"}
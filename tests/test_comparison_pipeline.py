@@ -0,0 +1,22 @@
+# tests/test_comparison_pipeline.py
+import comparison_pipeline
+from request_context import current_user_id
+
+
+def test_branches_run_in_the_callers_request_scope(monkeypatch):
+    seen = []
+
+    def search_links(search_query):
+        seen.append(current_user_id.get())
+        return ["https://www.flipkart.com/buds/p/itm1"]
+
+    monkeypatch.setattr(comparison_pipeline, "plan_products",
+                        lambda query, n: [{"name": f"Buds {i}", "search_query": f"buds {i}"} for i in range(n)])
+    monkeypatch.setattr(comparison_pipeline, "_search_links", search_links)
+    monkeypatch.setattr(comparison_pipeline, "scrape_products", lambda urls, deadline: [{
+        "url": urls[0], "status": "ok", "specs": {"Product Title": "Buds", "Price": "2,999"}, "reviews": [],
+    }])
+
+    comparisons = comparison_pipeline.compare_products("earbuds", n=3, user_id="alice")
+    assert seen == ["alice"] * 3
+    assert [(c.price, c.currency) for c in comparisons] == [(2999.0, "INR")] * 3
@@ -0,0 +1,67 @@
+# tests/test_embedding_cache.py
+import threading
+
+import numpy as np
+
+from embedding_cache import CachedEmbedder, EmbeddingStore, content_hash
+
+
+def _digest(key):
+    return content_hash("test", key)
+
+
+def test_two_stores_on_one_directory_keep_each_others_rows(tmp_path):
+    a = EmbeddingStore(str(tmp_path), "test")
+    b = EmbeddingStore(str(tmp_path), "test")
+    a.add_many([_digest("A")], [[1, 1, 1, 1]])
+    b.add_many([_digest("B")], [[2, 2, 2, 2]])
+
+    for store in (a, b, EmbeddingStore(str(tmp_path), "test")):
+        vec_a, vec_b = store.get_many([_digest("A"), _digest("B")])
+        assert vec_a.tolist() == [1, 1, 1, 1]
+        assert vec_b.tolist() == [2, 2, 2, 2]
+
+
+def test_concurrent_writers_with_growth(tmp_path):
+    # Separate store objects only share the files, like separate processes
+    stores = [EmbeddingStore(str(tmp_path), "test") for _ in range(4)]
+
+    def write(w):
+        for batch in range(30):
+            keys = [f"{w}-{batch}-{i}" for i in range(20)]
+            stores[w].add_many([_digest(k) for k in keys], [[w, batch, i, 0] for i in range(20)])
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    reader = EmbeddingStore(str(tmp_path), "test")
+    assert len(reader) == 4 * 30 * 20
+    assert reader.capacity > 1024  # grew while other writers were appending
+    for w in range(4):
+        vectors = reader.get_many([_digest(f"{w}-29-{i}") for i in range(20)])
+        assert [v.tolist() for v in vectors] == [[w, 29, i, 0] for i in range(20)]
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[len(t), 0, 1] for t in texts], dtype=np.float32)
+
+
+def test_cached_embedder_only_encodes_new_texts(tmp_path):
+    model = CountingModel()
+    embedder = CachedEmbedder(model, "counting", cache_dir=str(tmp_path))
+    first = embedder.encode(["red shoes", "blue hat"])
+    second = embedder.encode(["blue hat", "green scarf", "green scarf"])
+    assert model.encoded == ["red shoes", "blue hat", "green scarf"]
+    assert second[0].tolist() == first[1].tolist()
+    assert embedder.stats()["misses"] == 3
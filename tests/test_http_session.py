@@ -0,0 +1,116 @@
+# tests/test_http_session.py
+import io
+import re
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import http_session
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Serves `body` with an ETag and answers matching If-None-Match with 304."""
+
+    def __init__(self, body=b"<html>page</html>", etag='"v1"'):
+        super().__init__()
+        self.body = body
+        self.etag = etag
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request)
+        resp = requests.Response()
+        resp.request = request
+        resp.url = request.url
+        resp.encoding = "utf-8"
+        if request.headers.get("If-None-Match") == self.etag:
+            resp.status_code = 304
+            resp.raw = io.BytesIO(b"")
+        else:
+            resp.status_code = 200
+            resp.headers["ETag"] = self.etag
+            resp.raw = io.BytesIO(self.body)
+        return resp
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    adapter = ScriptedAdapter()
+    session = requests.Session()
+    session.mount("http://", adapter)
+    monkeypatch.setattr(http_session, "_session", session)
+    monkeypatch.setattr(http_session, "_validators", http_session._ValidatorStore(8, 1024 * 1024))
+    return adapter
+
+
+def test_second_fetch_revalidates_with_etag(adapter):
+    first = http_session.fetch_page("http://shop.test/p/1")
+    second = http_session.fetch_page("http://shop.test/p/1")
+    assert not first.revalidated and first.bytes_read == len(adapter.body)
+    assert second.revalidated and second.text == first.text
+    assert adapter.sent[1].headers["If-None-Match"] == '"v1"'
+
+
+def test_byte_budget_and_stop_patterns_truncate(adapter):
+    adapter.body = b"x" * 5000
+    page = http_session.fetch_page("http://shop.test/big", max_bytes=1000)
+    assert page.truncated and len(page.text) == 1000
+
+    adapter.body = b"head <div id='reviews'>" + b"y" * (http_session.STREAM_TAIL_BYTES * 2)
+    page = http_session.fetch_page("http://shop.test/stop", stop_patterns=[re.compile(rb"id='reviews'")])
+    assert page.truncated and len(page.text) < len(adapter.body)
+
+
+class FailingBody:
+    closed = False
+
+    def iter_content(self, chunk_size=1):
+        yield b"partial"
+        raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+    def close(self):
+        self.closed = True
+
+
+def test_read_error_still_closes_response():
+    resp = FailingBody()
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        http_session._read_body(resp)
+    assert resp.closed
+
+
+class ChunkedBody:
+    """Yields `body` in fixed-size chunks, like a streamed response."""
+
+    def __init__(self, body, size=1024):
+        self.body = body
+        self.size = size
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), self.size):
+            yield self.body[i:i + self.size]
+
+    def close(self):
+        pass
+
+
+REVIEWS_OPEN = re.compile(rb"""<(div)\b[^>]*?\sid\s*=\s*(?:"reviews"|'reviews')[^>]*>""", re.IGNORECASE)
+
+
+def test_stop_pattern_inside_script_is_ignored():
+    region = b"<div id='reviews'>" + b"<p>great</p>" * 500 + b"</div>"
+    body = (b"<html><script>var tpl = \"<div id='reviews'>\";" + b" " * 200_000 + b"</script>"
+            + b"<!-- <div id='reviews'> -->" + region + b"<footer>" + b"z" * 200_000 + b"</footer>")
+    data, truncated = http_session._read_body(ChunkedBody(body), stop_patterns=[REVIEWS_OPEN])
+    assert truncated and region in data
+
+
+def test_read_continues_until_the_last_region_closes():
+    region = b"<div id='reviews'>" + b"<div>ok</div>" * (http_session.STREAM_TAIL_BYTES // 8) + b"</div>"
+    body = b"<html>" + region + b"<footer>" + b"z" * 200_000 + b"</footer>"
+    data, truncated = http_session._read_body(ChunkedBody(body, 4096), stop_patterns=[REVIEWS_OPEN])
+    assert truncated and region in data and len(data) < len(body)
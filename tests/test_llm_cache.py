@@ -0,0 +1,38 @@
+# tests/test_llm_cache.py
+from langchain_core.outputs import Generation
+
+from llm_cache import SQLiteLLMCache, llm_temperature
+
+DETERMINISTIC = "{'model_name': 'gpt-4o-mini', 'temperature': 0.0}"
+
+
+def test_llm_temperature():
+    assert llm_temperature(DETERMINISTIC) == 0.0
+    assert llm_temperature('{"temperature": 0.3}') == 0.3
+    assert llm_temperature('{"temperature": null}') is None
+    assert llm_temperature("{'model_name': 'x'}") is None
+
+
+def test_round_trip_for_deterministic_calls(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "llm.db"))
+    assert cache.lookup("prompt", DETERMINISTIC) is None
+    cache.update("prompt", DETERMINISTIC, [Generation(text="cached reply")])
+    assert [g.text for g in cache.lookup("prompt", DETERMINISTIC)] == ["cached reply"]
+    assert cache.lookup("other prompt", DETERMINISTIC) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_sampled_calls_are_never_cached(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "llm.db"))
+    sampled = "{'model_name': 'gpt-4o-mini', 'temperature': 0.3}"
+    cache.update("prompt", sampled, [Generation(text="varies")])
+    assert cache.lookup("prompt", sampled) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SQLiteLLMCache(str(tmp_path / "llm.db"), max_bytes=1)
+    cache.update("first", DETERMINISTIC, [Generation(text="a")])
+    cache.update("second", DETERMINISTIC, [Generation(text="b")])
+    assert cache.lookup("first", DETERMINISTIC) is None
+    assert cache.stats()["entries"] <= 1
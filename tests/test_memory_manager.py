@@ -0,0 +1,46 @@
+# tests/test_memory_manager.py
+import threading
+
+import memory_manager
+from memory_manager import MemoryWriteBuffer
+
+
+class FlakyEmbeddings:
+    """Fails the first call, then embeds."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("embedder not ready")
+        return [[1.0, 0.0] for _ in texts]
+
+
+class RecordingStore:
+    def __init__(self):
+        self.added = []
+        self.written = threading.Event()
+        self._collection = self
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.added.extend(documents)
+        self.written.set()
+
+    def persist(self):
+        pass
+
+
+def test_failed_timer_flush_is_retried_without_new_writes(monkeypatch):
+    store = RecordingStore()
+    monkeypatch.setattr(memory_manager, "get_embeddings", lambda: FlakyEmbeddings.instance)
+    FlakyEmbeddings.instance = FlakyEmbeddings()
+    monkeypatch.setattr(memory_manager, "get_vectorstore", lambda: store)
+    monkeypatch.setattr(threading, "excepthook", lambda args: None)  # the failed timer flush raises
+
+    buffer = MemoryWriteBuffer(batch_size=10, flush_interval=0.05)
+    buffer.add("likes leather", "alice")
+    assert store.written.wait(2)
+    assert store.added == ["likes leather"]
+    assert buffer.pending_count() == 0
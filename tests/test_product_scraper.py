@@ -0,0 +1,46 @@
+# tests/test_product_scraper.py
+import pytest
+from bs4 import BeautifulSoup
+
+import product_scraper
+from conftest import read_fixture
+from product_scraper import EXTRACTORS, extract_regions, parse_page
+
+
+# --- Targeted extraction --- #
+@pytest.mark.parametrize("parser", ["lxml", "html.parser"])
+@pytest.mark.parametrize("kind", ["amazon", "flipkart"])
+def test_targeted_matches_baseline_parse(kind, parser, monkeypatch):
+    if parser == "lxml":
+        pytest.importorskip("lxml")
+    monkeypatch.setattr(product_scraper, "PARSER", parser)
+    html = read_fixture(f"{kind}_product.html")
+    extractor = EXTRACTORS[kind]
+    # What the scraper extracted before targeted parsing: the whole page through html.parser
+    baseline = extractor(BeautifulSoup(html, "html.parser"))
+    targeted = extractor(parse_page(html, kind, "targeted"))
+    assert targeted == baseline
+    specs, reviews = targeted
+    assert specs.get("Product Title")
+    assert reviews
+
+
+def test_tag_like_text_in_script_is_not_a_region():
+    html = (
+        "<html><head><script>var tpl = '<span id=\"productTitle\">template';</script></head>"
+        "<body><span id=\"productTitle\"> Real Title </span></body></html>"
+    )
+    regions = extract_regions(html, "amazon")
+    assert "template" not in regions
+    specs, _ = EXTRACTORS["amazon"](parse_page(html, "amazon", "targeted"))
+    assert specs["Product Title"] == "Real Title"
+
+
+def test_nested_regions_are_kept_once():
+    html = (
+        "<div id=\"feature-bullets\"><ul><li><div class=\"review-text-content\">inner</div></li></ul></div>"
+        "<div class=\"review-text-content\"><span>outer review</span></div>"
+    )
+    regions = extract_regions(html, "amazon")
+    assert regions.count("inner") == 1
+    assert "outer review" in regions
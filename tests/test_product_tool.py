@@ -0,0 +1,62 @@
+# tests/test_product_tool.py
+import json
+
+from product_tool import _agent_wrapper, specs_to_comparison_fields
+
+
+def test_price_currency_comes_from_its_symbol():
+    fields = specs_to_comparison_fields({"Product Title": "Buds", "Price": "₹2,999", "Battery": "30 hours"})
+    assert fields == {"product_name": "Buds", "price": 2999.0, "currency": "INR", "battery_life": "30 hours"}
+    assert specs_to_comparison_fields({"Key Features": ["Now $49.99 with case"]})["currency"] == "USD"
+
+
+def test_missing_price_is_none_not_zero():
+    fields = specs_to_comparison_fields({"Product Title": "Buds", "Battery": "Hours 30"})
+    assert fields["price"] is None
+    assert fields["currency"] is None
+
+
+def test_bare_price_takes_the_storefront_currency():
+    specs = {"Product Title": "Buds", "MRP": "2,999"}
+    assert specs_to_comparison_fields(specs, "https://www.flipkart.com/buds/p/itm1")["currency"] == "INR"
+    assert specs_to_comparison_fields(specs, "https://example.com/buds")["currency"] is None
+
+
+def test_unknown_price_passes_validation():
+    item = {"url": "https://example.com/buds", "status": "ok", "specs": {"Product Title": "Buds"}}
+    [result] = json.loads(_agent_wrapper(json.dumps([item])))
+    assert result["product_name"] == "Buds"
+    assert result["price"] is None and result["currency"] is None
+
+
+def test_scraper_tool_output_feeds_the_batch_tool(monkeypatch):
+    import product_scraper
+    import scrape_cache
+    from conftest import read_fixture
+    from http_session import FetchedPage
+    from product_tool import product_comparison_agent_tool
+    from request_context import request_scope
+
+    pages = {
+        "https://www.amazon.in/dp/B0TEST0001": read_fixture("amazon_product.html"),
+        "https://www.flipkart.com/rockerz/p/itmtest0001": read_fixture("flipkart_product.html"),
+    }
+    monkeypatch.setattr(scrape_cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(product_scraper, "fetch_page", lambda url, **kwargs: FetchedPage(
+        url=url, status_code=200, text=pages[url], bytes_read=len(pages[url])))
+
+    # Observations are projected for the agent's question, as in a real run
+    with request_scope("alice", "compare noise cancelling headphones battery"):
+        observation = product_scraper.product_scraper_tool.invoke({"url_list": list(pages)})
+        results = json.loads(product_comparison_agent_tool.run(observation))
+
+    assert [r.get("error") for r in results] == [None, None]
+    assert results[0]["product_name"].startswith("Sony WH-1000XM5")
+    assert results[1]["product_name"].startswith("boAt Rockerz 551ANC")
+    assert [r["battery_life"] for r in results] == ["30 Hours", "100 hr"]
+
+
+def test_scraper_tool_does_not_end_the_agent_run():
+    import product_scraper
+
+    assert not product_scraper.product_scraper_tool.return_direct
@@ -0,0 +1,42 @@
+# tests/test_response_cache.py
+import numpy as np
+
+from response_cache import SemanticResponseCache, context_key
+
+
+def _unit(*values):
+    v = np.array(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_similar_query_with_same_context_hits():
+    cache = SemanticResponseCache(threshold=0.9)
+    ctx = context_key("alice", "likes leather")
+    cache.store("best headphones", _unit(1, 0, 0), ctx, "Sony")
+    answer, similarity, cached_query = cache.lookup(_unit(1, 0.1, 0), ctx)
+    assert (answer, cached_query) == ("Sony", "best headphones")
+    assert similarity > 0.9
+    assert cache.lookup(_unit(0, 1, 0), ctx) is None
+
+
+def test_answers_are_not_shared_across_users_or_contexts():
+    cache = SemanticResponseCache(threshold=0.9)
+    cache.store("best headphones", _unit(1, 0, 0), context_key("alice", "likes leather"), "Sony")
+    assert cache.lookup(_unit(1, 0, 0), context_key("bob", "likes leather")) is None
+    assert cache.lookup(_unit(1, 0, 0), context_key("alice", "likes neon")) is None
+
+
+def test_expired_and_evicted_entries_miss():
+    ctx = context_key("alice", "")
+    expired = SemanticResponseCache(ttl=-1)
+    expired.store("q", _unit(1, 0), ctx, "a")
+    assert expired.lookup(_unit(1, 0), ctx) is None
+    assert expired.stats()["expired"] == 1
+
+    small = SemanticResponseCache(max_entries=2)
+    small.store("q1", _unit(1, 0, 0), ctx, "a1")
+    small.store("q2", _unit(0, 1, 0), ctx, "a2")
+    small.lookup(_unit(1, 0, 0), ctx)  # q2 is now the least recently used
+    small.store("q3", _unit(0, 0, 1), ctx, "a3")
+    assert small.lookup(_unit(0, 1, 0), ctx) is None
+    assert small.lookup(_unit(1, 0, 0), ctx)[0] == "a1"
@@ -0,0 +1,41 @@
+# tests/test_review_aspects.py
+import re
+import zlib
+
+import numpy as np
+import pytest
+
+import review_aspects
+
+
+def fake_encode(texts):
+    """Bag-of-words vectors hashed into 256 dims, unit length."""
+    vectors = np.zeros((len(texts), 256), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[a-z]+", text.lower()):
+            vectors[row, zlib.crc32(word.encode()) % 256] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    monkeypatch.setattr(review_aspects, "_encode", fake_encode)
+    monkeypatch.setattr(review_aspects, "_anchors", None)
+
+
+def test_taxonomy_aspects_are_kept(encoder):
+    reviews = ["Great battery life, lasts hours on a single charge.", "Bass and treble clarity is excellent."]
+    result = review_aspects.extract_pros_cons(reviews)
+    assert {p.split(":")[0] for p in result["Pros"]} == {"Battery life", "Sound quality"}
+
+
+def test_other_categories_are_clustered_instead_of_overall(encoder):
+    reviews = [
+        "The zipper broke in a week.", "Zipper teeth broke on the zipper pull.", "Main zipper is terrible.",
+        "Straps are comfortable on my shoulders.", "Padded shoulder straps are great.",
+        "Love the straps on long hikes.",
+    ]
+    result = review_aspects.extract_pros_cons(reviews)
+    assert result["Cons"] and all(p.startswith("Zipper") for p in result["Cons"])
+    assert result["Pros"] and all(p.startswith("Straps") for p in result["Pros"])
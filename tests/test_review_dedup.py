@@ -0,0 +1,18 @@
+# tests/test_review_dedup.py
+from review_dedup import dedupe_reviews, prune_reviews
+
+BASE = "The noise cancellation on these headphones is excellent and the battery easily lasts a full week of commuting"
+
+
+def test_exact_and_near_duplicates_collapse_with_weights():
+    reviews = [BASE, BASE.upper() + "!!", BASE + " honestly", "Ear cups get warm after an hour."]
+    clusters = dedupe_reviews(reviews)
+    assert [c.weight for c in clusters] == [3, 1]
+    assert clusters[0].text == BASE
+
+
+def test_prune_reviews_reports_stats():
+    pruned, stats = prune_reviews([BASE, BASE, "Ear cups get warm after an hour."])
+    assert pruned == [f"(x2) {BASE}", "Ear cups get warm after an hour."]
+    assert stats["reviews_in"] == 3 and stats["reviews_out"] == 2
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"] > 0
@@ -0,0 +1,99 @@
+# tests/test_review_harvester.py
+import threading
+import time
+
+import pytest
+
+import product_scraper
+import review_harvester
+import scrape_cache
+import tracing
+from conftest import read_fixture
+from http_session import FetchedPage
+
+AMAZON_URLS = [
+    "https://www.amazon.in/Sony-WH-1000XM5/dp/B09XS7JWHH/",
+    "https://www.amazon.in/Bose-QC45/dp/B098FKXT8L/",
+]
+
+
+class FakeStorefront:
+    """fetch_page stand-in that records the peak number of concurrent requests."""
+
+    def __init__(self, latency=0.02):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url, timeout=15, max_bytes=None, stop_patterns=None):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if "/product-reviews/" in url:
+                page = url.rsplit("=", 1)[-1]
+                html = "".join(f'<div data-hook="review-body"><span>{url[:40]} review {i} on page {page}</span></div>'
+                               for i in range(3))
+            else:
+                html = read_fixture("amazon_product.html")
+            return FetchedPage(url, 200, html, bytes_read=len(html))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class ListRecorder(tracing.TraceRecorder):
+    def __init__(self):
+        super().__init__(jsonl_path=None, prometheus_path=None)
+        self.spans = []
+
+    def record(self, span):
+        super().record(span)
+        self.spans.append(span)
+
+
+@pytest.fixture
+def storefront(monkeypatch):
+    fake = FakeStorefront()
+    monkeypatch.setattr(product_scraper, "fetch_page", fake)
+    monkeypatch.setattr(review_harvester, "fetch_page", fake)
+    monkeypatch.setattr(scrape_cache, "CACHE_ENABLED", False)
+    return fake
+
+
+def test_harvest_respects_domain_concurrency(storefront):
+    results = product_scraper.scrape_products(AMAZON_URLS, deadline=30, review_pages=5, max_reviews=50)
+    assert all(r["status"] == "ok" for r in results)
+    assert all(any("on page" in review for review in r["reviews"]) for r in results)
+    assert storefront.peak <= product_scraper.DOMAIN_CONCURRENCY["amazon"]
+
+
+def test_zero_review_budget_yields_nothing(storefront):
+    assert list(review_harvester.harvest_reviews(AMAZON_URLS[0], max_pages=2, max_reviews=0)) == []
+
+
+def test_review_page_spans_nest_under_scrape_span(storefront, monkeypatch):
+    recorder = ListRecorder()
+    monkeypatch.setattr(tracing, "recorder", recorder)
+    product_scraper.scrape_products(AMAZON_URLS[:1], deadline=30, review_pages=2, max_reviews=50)
+    scrape = next(s for s in recorder.spans if s.name == "scrape")
+    pages = [s for s in recorder.spans if s.name == "review_page"]
+    assert len(pages) == 2
+    assert all(s.parent_id == scrape.span_id for s in pages)
+
+
+def test_failed_review_page_is_recorded_on_its_span(storefront, monkeypatch):
+    def flaky(url, **kwargs):
+        if url.endswith("pageNumber=2"):
+            raise ConnectionError("connection reset")
+        return storefront(url, **kwargs)
+
+    recorder = ListRecorder()
+    monkeypatch.setattr(tracing, "recorder", recorder)
+    monkeypatch.setattr(review_harvester, "fetch_page", flaky)
+    reviews = list(review_harvester.harvest_reviews(AMAZON_URLS[0], max_pages=3, max_reviews=50))
+    assert len(reviews) == 6
+    failed = [s for s in recorder.spans if s.name == "review_page" and s.status == "error"]
+    assert [(s.attrs["url"][-12:], s.attrs["error"]) for s in failed] == [("pageNumber=2", "connection reset")]
@@ -0,0 +1,100 @@
+# tests/test_review_synthesis_tool.py
+import json
+
+from langchain.agents import ZeroShotAgent
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import review_synthesis_tool
+from review_synthesis_tool import review_synthesis_tool as tool, safe_synthesize_reviews
+
+
+def test_tool_is_single_input_for_react_agent():
+    assert tool.is_single_input
+    ZeroShotAgent._validate_tools([tool])
+
+
+def test_unknown_mode_is_reported():
+    result = json.loads(safe_synthesize_reviews(["Great sound."], mode="bogus"))
+    assert "Unknown synthesis mode" in result["error"]
+
+
+def test_llm_mode_returns_model_reply(monkeypatch):
+    reply = json.dumps({"Pros": ["Great sound"], "Cons": ["Short battery"]})
+    monkeypatch.setattr(review_synthesis_tool, "ChatOpenAI", lambda **kwargs: FakeListChatModel(responses=[reply]))
+    result = json.loads(safe_synthesize_reviews(["Great sound.", "Battery dies fast."], mode="llm"))
+    assert result == {"Pros": ["Great sound"], "Cons": ["Short battery"]}
+
+
+def test_tool_accepts_react_string_input(monkeypatch):
+    reply = json.dumps({"Pros": ["Great sound"], "Cons": []})
+    monkeypatch.setattr(review_synthesis_tool, "ChatOpenAI", lambda **kwargs: FakeListChatModel(responses=[reply]))
+    # ZeroShotAgent hands single-input tools the raw Action Input string
+    assert json.loads(tool.run('["Great sound.", "Comfy."]')) == {"Pros": ["Great sound"], "Cons": []}
+
+
+def test_dedup_stats_are_per_call(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import tracing
+
+    spans = []
+    monkeypatch.setattr(tracing, "_finish", lambda s, started: spans.append(s))
+    monkeypatch.setattr(review_synthesis_tool, "ChatOpenAI", lambda **kwargs: FakeListChatModel(responses=["{}"]))
+    batches = [["Great sound."] * n for n in (1, 2, 3, 4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda reviews: safe_synthesize_reviews(reviews, mode="llm"), batches))
+    synthesis = sorted((s for s in spans if s.name == "review_synthesis"), key=lambda s: s.attrs["reviews_in"])
+    assert [(s.attrs["reviews_in"], s.attrs["reviews_out"]) for s in synthesis] == [(1, 1), (2, 1), (3, 1), (4, 1)]
+
+
+def test_import_creates_no_llm_cache(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get("PYTHONPATH", "")]))
+    subprocess.run([sys.executable, "-c", "import review_synthesis_tool"], cwd=tmp_path, env=env, check=True)
+    assert not (tmp_path / "llm_cache.db").exists()
+
+
+def test_llm_cache_installed_on_first_synthesis(monkeypatch):
+    installs = []
+    monkeypatch.setattr(review_synthesis_tool, "install_llm_cache", lambda: installs.append(1))
+    monkeypatch.setattr(review_synthesis_tool, "ChatOpenAI", lambda **kwargs: FakeListChatModel(responses=["{}"]))
+    safe_synthesize_reviews(["Great sound."], mode="llm")
+    assert installs
+
+
+def test_harvested_reviews_reach_synthesis(monkeypatch):
+    import product_scraper
+    from request_context import request_scope
+
+    url = "https://www.amazon.in/dp/B0TEST/"
+    harvested = [f"Review {i}: the battery lasts about {i} hours and the fit is fine." for i in range(100)]
+    monkeypatch.setattr(product_scraper, "scrape_products", lambda urls: [
+        {"url": url, "status": "ok", "specs": {"Product Title": "Buds"}, "reviews": harvested}])
+    seen = []
+    monkeypatch.setattr(review_synthesis_tool, "_synthesize",
+                        lambda reviews, mode, tokens: seen.append(reviews) or "{}")
+
+    with request_scope(query="battery life"):
+        observation = json.loads(product_scraper.product_scraper_tool.run(json.dumps([url])))
+        assert observation[0]["reviews_total"] == 100 and len(observation[0]["reviews"]) < 100
+        tool.run(url)
+    assert seen == [harvested]
+
+
+def test_dedup_savings_appear_in_the_prompt_budget_report(monkeypatch):
+    from context_builder import PromptBudgetCallback
+    from request_context import request_scope
+
+    monkeypatch.setattr(review_synthesis_tool, "ChatOpenAI", lambda **kwargs: FakeListChatModel(responses=["{}"]))
+    with request_scope():
+        budget = PromptBudgetCallback()
+        budget.on_llm_start({}, ["Thought: summarize the reviews"])
+        safe_synthesize_reviews(["Great sound, very clear."] * 5, mode="llm")
+        report = budget.report()
+    line = report.splitlines()[-1]
+    assert line.startswith("review dedup: 5 -> 1 reviews,") and line.endswith("synthesis tokens saved")
+    assert int(line.split(", ")[1].split()[0]) > 0
@@ -0,0 +1,76 @@
+# tests/test_scrape_cache.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import scrape_cache
+from scrape_cache import ScrapeCache, cached_scrape, canonical_product_key
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ScrapeCache(str(tmp_path / "scrape_cache.db"))
+    monkeypatch.setattr(scrape_cache, "_cache", cache)
+    return cache
+
+
+@pytest.mark.parametrize("url, key", [
+    ("https://www.amazon.in/Sony-WH/dp/B0C7S2FL8K/?ref=x", "amazon.in:B0C7S2FL8K"),
+    ("https://amazon.in/gp/product/b0c7s2fl8k", "amazon.in:B0C7S2FL8K"),
+    ("https://www.flipkart.com/poco/p/itm2c4f2561da8a0?pid=X&lid=Y", "flipkart:itm2c4f2561da8a0"),
+    ("https://Shop.example.com/item/42/?utm_source=a&color=red&ref=b", "https://shop.example.com/item/42?color=red"),
+])
+def test_canonical_product_key(url, key):
+    assert canonical_product_key(url) == key
+
+
+def test_concurrent_identical_requests_share_one_fetch(cache):
+    calls, release = [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"status": "ok", "specs": {"Product Title": "Buds"}}
+
+    urls = [f"https://www.amazon.in/dp/B0C7S2FL8K/?ref={i}" for i in range(6)]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(cached_scrape, url, "amazon", compute, 5) for url in urls]
+        time.sleep(0.2)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    # Followers get the shared result under their own URL
+    assert [r.get("url", url) for r, url in zip(results, urls)] == urls
+    assert all(r["specs"] == {"Product Title": "Buds"} for r in results)
+    # Later callers are served from the cache
+    assert cached_scrape(urls[0], "amazon", lambda: pytest.fail("refetched"), 5)["status"] == "ok"
+
+
+def test_each_lookup_is_counted_once(cache):
+    url = "https://www.flipkart.com/buds/p/itm2"
+    cached_scrape(url, "flipkart", lambda: {"url": url, "status": "ok"}, 5)
+    assert (cache.hits, cache.misses) == (0, 1)
+    cached_scrape(url, "flipkart", lambda: pytest.fail("refetched"), 5)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_errors_are_not_cached(cache):
+    url = "https://www.flipkart.com/buds/p/itm1"
+    assert cached_scrape(url, "flipkart", lambda: {"url": url, "status": "error", "error": "HTTP 503"}, 5)["error"]
+    assert cached_scrape(url, "flipkart", lambda: {"url": url, "status": "ok"}, 5)["status"] == "ok"
+
+
+def test_expired_and_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ScrapeCache(str(tmp_path / "small.db"), max_bytes=60)
+    cache.put("stale", {"v": 1}, ttl=-1)
+    assert cache.get("stale") is None
+    cache.put("a", {"v": "x" * 20}, ttl=60)
+    cache.put("b", {"v": "y" * 20}, ttl=60)
+    cache.get("a")  # b is now the least recently used
+    time.sleep(0.01)
+    cache.put("c", {"v": "z" * 20}, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
@@ -0,0 +1,58 @@
+# tests/test_tracing.py
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from tracing import Span, TraceRecorder
+
+
+def _span(name="step"):
+    # Fixed id and start so every serialized span has the same length
+    return Span(name=name, kind="tool", trace_id="t", span_id="0" * 16, start=1700000000.0, duration_ms=12.0)
+
+
+def test_spans_are_buffered_until_flush(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    recorder = TraceRecorder(jsonl_path=str(path), prometheus_path=None)
+    recorder.record(_span("a"))
+    recorder.record(_span("b"))
+    assert not path.exists()
+    recorder.flush()
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == ["a", "b"]
+
+
+def test_jsonl_rotates_at_the_size_cap(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    line_bytes = len(json.dumps(tracing.asdict(_span()), default=str)) + 1
+    recorder = TraceRecorder(jsonl_path=str(path), prometheus_path=None, jsonl_max_bytes=line_bytes * 3)
+    for _ in range(5):
+        recorder.record(_span())
+        recorder.flush()
+    assert len(path.read_text().splitlines()) == 2
+    assert len((tmp_path / "spans.jsonl.1").read_text().splitlines()) == 3
+    assert os.path.getsize(path) <= line_bytes * 3
+
+
+def test_concurrent_prometheus_writes_do_not_collide(tmp_path):
+    path = tmp_path / "metrics.prom"
+    recorder = TraceRecorder(jsonl_path=None, prometheus_path=str(path))
+    recorder.record(_span())
+
+    def write(_):
+        recorder.write_prometheus()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(200)))
+    assert "shopper_span_duration_seconds_count" in path.read_text()
+    assert sorted(os.listdir(tmp_path)) == ["metrics.prom"]
+
+
+def test_root_span_flushes_the_request(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "recorder", TraceRecorder(jsonl_path=str(path), prometheus_path=None))
+    with tracing.span("request", "request"):
+        with tracing.span("child", "tool"):
+            pass
+        assert not path.exists()
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == ["child", "request"]
@@ -0,0 +1,73 @@
+# tests/test_user_preference.py
+import json
+
+import chromadb
+import numpy as np
+import pytest
+
+import user_preference
+from user_preference import PreferenceIngestor, read_records, remove_legacy_chunks
+
+
+class FakeEmbedder:
+    def encode(self, texts, batch_size=32, **kwargs):
+        return np.array([[len(t), t.count(" "), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+
+
+@pytest.fixture
+def collection(client):
+    return client.get_or_create_collection(name=user_preference.COLLECTION_NAME)
+
+
+def _ingest(collection, records):
+    ingestor = PreferenceIngestor(collection, FakeEmbedder(), batch_size=4)
+    for source_key, text, user_id in records:
+        ingestor.add_record(source_key, text, user_id or "alice")
+    ingestor.flush()
+    return ingestor.stats
+
+
+def _documents(collection):
+    return sorted(collection.get()["documents"])
+
+
+def test_reingest_skips_unchanged_and_replaces_edited(collection):
+    _ingest(collection, [("f:1", "Likes leather boots.", None), ("f:2", "Budget under $100.", None)])
+    stats = _ingest(collection, [("f:1", "Likes suede boots.", None), ("f:2", "Budget under $100.", None)])
+    assert stats["unchanged"] == 1 and stats["written"] == 1 and stats["stale_removed"] == 1
+    assert _documents(collection) == ["Budget under $100.", "Likes suede boots."]
+
+
+def test_record_edited_to_empty_is_deleted(collection):
+    _ingest(collection, [("f:1", "Likes leather boots.", None), ("f:2", "Budget under $100.", None)])
+    _ingest(collection, [("f:1", "", None), ("f:2", "Budget under $100.", None)])
+    assert _documents(collection) == ["Budget under $100."]
+
+
+def test_legacy_rows_are_removed_when_samples_are_ingested(client, collection, monkeypatch):
+    # What the original script stored: one pref_<n> row per chunk, no metadata
+    legacy = ["Legacy chunk one.", "Legacy chunk two."]
+    collection.add(ids=["pref_0", "pref_1"], documents=legacy, embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    monkeypatch.setattr(user_preference, "get_chroma_client", lambda: client)
+    monkeypatch.setattr(user_preference, "get_embedder", FakeEmbedder)
+
+    stats = user_preference.ingest(user_preference.sample_records(), user_id="alice")
+    assert stats["legacy_removed"] == 2
+    documents = _documents(collection)
+    assert not set(legacy) & set(documents)
+    assert len(documents) == len(user_preference.user_preferences)
+    assert remove_legacy_chunks(collection) == 0
+
+
+def test_bad_jsonl_line_is_skipped(tmp_path, capsys):
+    path = tmp_path / "prefs.jsonl"
+    path.write_text("\n".join([json.dumps({"id": "a", "text": "Likes tea."}), "{not json",
+                               json.dumps("Prefers green.")]), encoding="utf-8")
+    records = list(read_records(str(path)))
+    assert records == [("prefs.jsonl:a", "Likes tea.", None), ("prefs.jsonl:3", "Prefers green.", None)]
+    assert "prefs.jsonl:2" in capsys.readouterr().out
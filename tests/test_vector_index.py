@@ -0,0 +1,124 @@
+# tests/test_vector_index.py
+import chromadb
+import pytest
+
+import vector_index
+from vector_index import PreferenceIndex, equality_filters
+
+
+@pytest.fixture
+def collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.get_or_create_collection("prefs", metadata={"hnsw:space": "cosine"})
+    collection.add(
+        ids=["a1", "a2", "b1"],
+        embeddings=[[1.0, 0.0, 0.0], [0.8, 0.6, 0.0], [1.0, 0.1, 0.0]],
+        documents=["alice boots", "alice bags", "bob boots"],
+        metadatas=[{"user_id": "alice"}, {"user_id": "alice"}, {"user_id": "bob"}],
+    )
+    return collection
+
+
+@pytest.fixture
+def numpy_backend(monkeypatch):
+    monkeypatch.setattr(vector_index, "BACKEND", "numpy")
+
+
+class CountingCollection:
+    """Forwards to a Chroma collection, counting count() calls."""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.counts = 0
+
+    def count(self):
+        self.counts += 1
+        return self._collection.count()
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def test_equality_filters():
+    assert equality_filters(None) == {}
+    assert equality_filters({"user_id": "alice"}) == {"user_id": "alice"}
+    assert equality_filters({"user_id": {"$eq": "alice"}}) == {"user_id": "alice"}
+    assert equality_filters({"user_id": {"$ne": "alice"}}) is None
+    assert equality_filters({"$and": [{"user_id": "alice"}, {"source": "x"}]}) is None
+
+
+def test_query_filters_by_user(collection, numpy_backend):
+    index = PreferenceIndex(collection)
+    docs = index.query([1.0, 0.0, 0.0], k=3, where={"user_id": "alice"})
+    assert [d.page_content for d in docs] == ["alice boots", "alice bags"]
+    assert all(d.metadata["user_id"] == "alice" for d in docs)
+
+
+def test_operator_filters_go_to_chroma(collection, numpy_backend):
+    index = PreferenceIndex(collection)
+    docs = index.query([1.0, 0.0, 0.0], k=3, where={"user_id": {"$ne": "alice"}})
+    assert [d.page_content for d in docs] == ["bob boots"]
+
+
+def test_queries_skip_count_within_sync_interval(collection, numpy_backend):
+    counting = CountingCollection(collection)
+    index = PreferenceIndex(counting)
+    counting.counts = 0
+    for _ in range(20):
+        index.query([1.0, 0.0, 0.0], k=2, where={"user_id": "alice"})
+    assert counting.counts == 0
+
+
+def test_external_writes_picked_up_after_sync_interval(collection, numpy_backend, monkeypatch):
+    index = PreferenceIndex(collection)
+    collection.add(ids=["c1"], embeddings=[[0.0, 0.0, 1.0]], documents=["carol scarves"],
+                   metadatas=[{"user_id": "carol"}])
+    assert index.query([0.0, 0.0, 1.0], k=1, where={"user_id": "carol"}) == []
+
+    monkeypatch.setattr(vector_index, "SYNC_INTERVAL", 0.0)
+    docs = index.query([0.0, 0.0, 1.0], k=1, where={"user_id": "carol"})
+    assert [d.page_content for d in docs] == ["carol scarves"]
+
+
+def test_snapshot_reload_diffs_against_chroma(collection, numpy_backend, tmp_path):
+    path = str(tmp_path / "snapshot" / "prefs")
+    PreferenceIndex(collection, path)
+    collection.delete(ids=["a2"])
+    reloaded = PreferenceIndex(collection, path)
+    assert len(reloaded.backend) == 2
+    assert [d.page_content for d in reloaded.query([0.8, 0.6, 0.0], k=3, where={"user_id": "alice"})] == \
+        ["alice boots"]
+
+
+def test_metadata_updates_reach_the_mirror_and_snapshot(collection, numpy_backend, tmp_path):
+    path = str(tmp_path / "snapshot" / "prefs")
+    index = PreferenceIndex(collection, path)
+    collection.update(ids=["b1"], metadatas=[{"user_id": "alice"}])
+    index.sync(force=True)
+    assert len(index.query([1.0, 0.0, 0.0], k=3, where={"user_id": "alice"})) == 3
+    reloaded = PreferenceIndex(collection, path)
+    assert reloaded.query([1.0, 0.0, 0.0], k=3, where={"user_id": "bob"}) == []
+
+
+def test_migrate_unscoped_then_query(tmp_path, numpy_backend, monkeypatch):
+    import memory_manager
+
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.get_or_create_collection("prefs", metadata={"hnsw:space": "cosine"})
+    collection.add(ids=["m1", "m2", "m3"], embeddings=[[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.8, 0.2, 0.0]],
+                   documents=["likes leather", "budget $100", "neutral tones"],
+                   metadatas=[{"source": "old"}] * 3)
+    index = PreferenceIndex(collection)
+    assert index.query([1.0, 0.0, 0.0], k=3, where={"user_id": "default"}) == []
+
+    class Store:
+        _collection = collection
+
+    def get_index():
+        return index
+
+    get_index.is_built = lambda: True
+    monkeypatch.setattr(memory_manager, "get_vectorstore", lambda: Store())
+    monkeypatch.setattr(memory_manager, "get_preference_index", get_index)
+    assert memory_manager.migrate_unscoped_preferences("default") == 3
+    assert len(index.query([1.0, 0.0, 0.0], k=3, where={"user_id": "default"})) == 3
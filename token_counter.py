@@ -0,0 +1,47 @@
+# token_counter.py
+"""
+Token counting shared by prompt-budgeting code.
+
+Uses tiktoken when it is installed and falls back to a ~4 characters/token
+estimate otherwise, which is close enough for budgeting English text.
+"""
+import threading
+
+ENCODING_NAME = "cl100k_base"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_unavailable = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_unavailable
+    if _encoding is None and not _encoding_unavailable:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_unavailable:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(ENCODING_NAME)
+                except Exception:
+                    _encoding_unavailable = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Return the (approximate) number of tokens in `text`."""
+    if not text:
+        return 0
+    enc = _get_encoding()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` so it fits in `max_tokens` tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _get_encoding()
+    if enc is not None:
+        return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+    return text[: max_tokens * 4]
@@ -0,0 +1,369 @@
+# tracing.py
+"""
+Spans and metrics for every agent request.
+
+A span is one timed unit of work: the whole request, a tool call, an LLM call,
+a SerpAPI search, a page fetch or a review synthesis. Spans nest through a
+context variable, carry attributes (bytes fetched, prompt/completion tokens,
+cost, cache hits, errors) and, when finished, are
+
+  - appended to TRACE_JSONL_PATH, one JSON object per line, in batches written
+    when a request ends (or every JSONL_FLUSH_SPANS spans); the file is rotated
+    to TRACE_JSONL_PATH + ".1" once it would exceed TRACE_JSONL_MAX_BYTES,
+  - folded into per-(kind, name) metrics, written in Prometheus text format
+    to PROMETHEUS_PATH after every request (for a node_exporter textfile
+    collector or a quick `cat`), and
+  - summarized by `summary()` for the Streamlit sidebar.
+
+Tool and LLM spans come from TracingCallback, which is registered with
+LangChain globally, so every chain, agent and chat model in the process is
+covered without passing callbacks around.
+"""
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import get_buffer_string
+from langchain_core.tracers.context import register_configure_hook
+
+from token_counter import count_tokens
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "./traces/spans.jsonl")
+PROMETHEUS_PATH = os.getenv("TRACE_PROMETHEUS_PATH", "./traces/metrics.prom")
+# The span log keeps at most this much in the current file plus one rotated file (0 = never rotate).
+TRACE_JSONL_MAX_BYTES = int(os.getenv("TRACE_JSONL_MAX_BYTES", str(50 * 1024 * 1024)))
+# Finished spans buffered before a write when no request ends in between.
+JSONL_FLUSH_SPANS = 200
+# Durations kept per (kind, name) for the p50/p95 in summary()
+RECENT_DURATIONS = 500
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# USD per 1M (prompt, completion) tokens; adjust to your billing.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gemini-pro-latest": (1.25, 10.00),
+}
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: str = None
+    start: float = field(default_factory=time.time)
+    duration_ms: float = None
+    status: str = "ok"
+    attrs: dict = field(default_factory=dict)
+
+    def add(self, key, amount=1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _new_span(name, kind, **attrs) -> Span:
+    parent = _current_span.get()
+    return Span(name=name, kind=kind, trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+                parent_id=parent.span_id if parent else None, attrs=attrs)
+
+
+def _price(model: str):
+    for prefix, price in MODEL_PRICES.items():
+        if model and model.startswith(prefix):
+            return price
+    return (0.0, 0.0)
+
+
+class TraceRecorder:
+    """Finished spans -> JSONL file and aggregated metrics."""
+
+    def __init__(self, jsonl_path=TRACE_JSONL_PATH, prometheus_path=PROMETHEUS_PATH,
+                 jsonl_max_bytes=TRACE_JSONL_MAX_BYTES):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.jsonl_max_bytes = jsonl_max_bytes
+        self._lock = threading.Lock()
+        self._pending = []  # JSONL lines not yet written
+        self._metrics = defaultdict(lambda: {
+            "count": 0, "errors": 0, "seconds": 0.0, "buckets": [0] * len(DURATION_BUCKETS),
+            "recent": deque(maxlen=RECENT_DURATIONS), "bytes": 0, "prompt_tokens": 0,
+            "completion_tokens": 0, "cost_usd": 0.0,
+        })
+        self._cache = defaultdict(int)  # (cache, "hit"|"miss") -> count
+
+    def record(self, span: Span):
+        seconds = (span.duration_ms or 0.0) / 1000
+        with self._lock:
+            m = self._metrics[(span.kind, span.name)]
+            m["count"] += 1
+            m["errors"] += span.status == "error"
+            m["seconds"] += seconds
+            m["recent"].append(seconds)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    m["buckets"][i] += 1
+            for key in ("bytes", "prompt_tokens", "completion_tokens", "cost_usd"):
+                m[key] += span.attrs.get(key, 0) or 0
+            if self.jsonl_path:
+                self._pending.append(json.dumps(asdict(span), default=str) + "\n")
+                if len(self._pending) >= JSONL_FLUSH_SPANS:
+                    self._write_pending()
+
+    def flush(self):
+        """Write buffered spans to the JSONL file."""
+        with self._lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        """Caller holds _lock."""
+        if not self._pending:
+            return
+        data = "".join(self._pending).encode("utf-8")
+        self._pending = []
+        os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+        try:
+            size = os.path.getsize(self.jsonl_path)
+        except FileNotFoundError:
+            size = 0
+        if self.jsonl_max_bytes and size and size + len(data) > self.jsonl_max_bytes:
+            os.replace(self.jsonl_path, self.jsonl_path + ".1")
+        with open(self.jsonl_path, "ab") as f:
+            f.write(data)
+
+    def record_cache(self, cache: str, hit: bool):
+        with self._lock:
+            self._cache[(cache, "hit" if hit else "miss")] += 1
+
+    def summary(self) -> list:
+        """One row per (kind, name), slowest total time first."""
+        rows = []
+        with self._lock:
+            for (kind, name), m in self._metrics.items():
+                recent = sorted(m["recent"])
+                pct = lambda q: recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+                rows.append({
+                    "kind": kind, "name": name, "calls": m["count"], "errors": m["errors"],
+                    "total_s": round(m["seconds"], 2), "p50_ms": round(pct(0.5)), "p95_ms": round(pct(0.95)),
+                    "bytes": m["bytes"], "tokens": m["prompt_tokens"] + m["completion_tokens"],
+                    "cost_usd": round(m["cost_usd"], 4),
+                })
+        return sorted(rows, key=lambda r: -r["total_s"])
+
+    def cache_summary(self) -> dict:
+        """{cache: {"hit": n, "miss": n}}"""
+        with self._lock:
+            out = defaultdict(lambda: {"hit": 0, "miss": 0})
+            for (cache, result), n in self._cache.items():
+                out[cache][result] = n
+            return dict(out)
+
+    def prometheus_text(self) -> str:
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            items = sorted(self._metrics.items())
+            metric("shopper_span_duration_seconds", "histogram", "Duration of agent spans.")
+            for (kind, name), m in items:
+                labels = f'kind="{kind}",name="{name}"'
+                for bound, n in zip(DURATION_BUCKETS, m["buckets"]):
+                    lines.append(f'shopper_span_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                lines.append(f'shopper_span_duration_seconds_bucket{{{labels},le="+Inf"}} {m["count"]}')
+                lines.append(f"shopper_span_duration_seconds_sum{{{labels}}} {m['seconds']:.6f}")
+                lines.append(f"shopper_span_duration_seconds_count{{{labels}}} {m['count']}")
+            for metric_name, key, help_text in (
+                ("shopper_span_errors_total", "errors", "Spans that ended in an error."),
+                ("shopper_fetched_bytes_total", "bytes", "Bytes fetched by scraper and search spans."),
+                ("shopper_llm_cost_usd_total", "cost_usd", "Estimated LLM spend in USD."),
+            ):
+                metric(metric_name, "counter", help_text)
+                for (kind, name), m in items:
+                    lines.append(f'{metric_name}{{kind="{kind}",name="{name}"}} {m[key]}')
+            metric("shopper_llm_tokens_total", "counter", "LLM tokens by model and direction.")
+            for (kind, name), m in items:
+                if kind == "llm":
+                    lines.append(f'shopper_llm_tokens_total{{model="{name}",type="prompt"}} {m["prompt_tokens"]}')
+                    lines.append(f'shopper_llm_tokens_total{{model="{name}",type="completion"}} {m["completion_tokens"]}')
+            metric("shopper_cache_lookups_total", "counter", "Cache lookups by cache and result.")
+            for (cache, result), n in sorted(self._cache.items()):
+                lines.append(f'shopper_cache_lookups_total{{cache="{cache}",result="{result}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        if not self.prometheus_path:
+            return
+        directory = os.path.dirname(self.prometheus_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # A private temp file per write: concurrent requests (and processes) never share one
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.chmod(tmp, 0o644)  # mkstemp makes it owner-only; textfile collectors run as another user
+            os.replace(tmp, self.prometheus_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+recorder = TraceRecorder()
+atexit.register(lambda: recorder.flush())
+
+
+def _finish(span: Span, started: float):
+    span.duration_ms = (time.perf_counter() - started) * 1000
+    if not TRACING_ENABLED:
+        return
+    try:
+        recorder.record(span)
+        if span.parent_id is None:
+            recorder.flush()
+            recorder.write_prometheus()
+    except Exception as e:
+        print(f"Tracing export failed: {e}")
+
+
+@contextmanager
+def span(name: str, kind: str, **attrs):
+    """Time the block as a child of the current span; exceptions mark it as an error and propagate."""
+    s = _new_span(name, kind, **attrs)
+    token = _current_span.set(s)
+    started = time.perf_counter()
+    try:
+        yield s
+    except Exception as e:
+        s.status = "error"
+        s.attrs["error"] = str(e)[:500]
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(s, started)
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup, and attribute hits to the current span."""
+    if not TRACING_ENABLED:
+        return
+    recorder.record_cache(cache, hit)
+    s = _current_span.get()
+    if s is not None and hit:
+        s.add(f"{cache}_cache_hits")
+
+
+# --- LangChain tool and LLM spans --- #
+class TracingCallback(BaseCallbackHandler):
+    """Opens a span per tool call and per LLM call, with token usage and estimated cost for the latter."""
+
+    def __init__(self):
+        self._open = {}  # run_id -> (span, started, previous current span, prompt text)
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, name, kind, prompt_text="", **attrs):
+        s = _new_span(name, kind, **attrs)
+        with self._lock:
+            self._open[run_id] = (s, time.perf_counter(), _current_span.get(), prompt_text)
+        # Nested work on this thread (page fetches, cache lookups) becomes a child of this span
+        _current_span.set(s)
+
+    def _end(self, run_id, error=None):
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return None, None, ""
+        s, started, previous, prompt_text = entry
+        _current_span.set(previous)
+        if error is not None:
+            s.status = "error"
+            s.attrs["error"] = str(error)[:500]
+        return s, started, prompt_text
+
+    @staticmethod
+    def _model_name(serialized, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name")
+        if not model:
+            model = ((serialized or {}).get("kwargs") or {}).get("model") or ((serialized or {}).get("kwargs") or {}).get("model_name")
+        return str(model or (serialized or {}).get("name") or "llm").replace("models/", "")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, self._model_name(serialized, kwargs), "llm", "\n".join(prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, self._model_name(serialized, kwargs), "llm",
+                    "\n".join(get_buffer_string(batch) for batch in messages))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        s, started, prompt_text = self._end(run_id)
+        if s is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        if prompt_tokens is None:
+            for generations in response.generations:
+                for g in generations:
+                    meta = getattr(getattr(g, "message", None), "usage_metadata", None) or {}
+                    if meta:
+                        prompt_tokens = (prompt_tokens or 0) + meta.get("input_tokens", 0)
+                        completion_tokens = (completion_tokens or 0) + meta.get("output_tokens", 0)
+        if prompt_tokens is None:
+            # Provider reported nothing (or the answer came from the LLM cache): estimate
+            s.attrs["tokens_estimated"] = True
+            prompt_tokens = count_tokens(prompt_text)
+            completion_tokens = sum(count_tokens(g.text) for gens in response.generations for g in gens)
+        s.attrs["prompt_tokens"] = prompt_tokens
+        s.attrs["completion_tokens"] = completion_tokens or 0
+        prompt_price, completion_price = _price(s.name)
+        if not s.attrs.get("llm_cache_hits"):
+            s.attrs["cost_usd"] = (prompt_tokens * prompt_price + s.attrs["completion_tokens"] * completion_price) / 1e6
+        _finish(s, started)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        s, started, _ = self._end(run_id, error)
+        if s is not None:
+            _finish(s, started)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "tool", "tool",
+                    input_chars=len(str(input_str)))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        s, started, _ = self._end(run_id)
+        if s is not None:
+            s.attrs["output_chars"] = len(output if isinstance(output, str) else str(output))
+            _finish(s, started)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        s, started, _ = self._end(run_id, error)
+        if s is not None:
+            _finish(s, started)
+
+
+_callback_var: ContextVar = ContextVar("tracing_callback", default=TracingCallback() if TRACING_ENABLED else None)
+register_configure_hook(_callback_var, inheritable=True)
+
+
+def summary() -> list:
+    return recorder.summary()
+
+
+def cache_summary() -> dict:
+    return recorder.cache_summary()
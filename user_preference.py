@@ -1,6 +1,33 @@
+"""
+Ingest user preferences into ChromaDB.
+
+    python user_preference.py                          # the built-in sample preferences
+    python user_preference.py prefs.jsonl prefs.csv    # stream preference files
+    python user_preference.py prefs.jsonl --batch-size 128 --user-id alice
+    python user_preference.py --migrate-unscoped       # tag pre-existing rows with --user-id
+
+JSONL lines are objects with a "text" (or "preference") field and optional
+"id" and "user_id" fields, or bare JSON strings. CSV files need a "text" (or
+"preference") column and may have "id" and "user_id" columns. Records
+without a user id belong to --user-id. Records are chunked, embedded in fixed-size
+batches and upserted under ids derived from (source, chunk) content, so
+re-running skips unchanged chunks and replaces the chunks of edited records.
+A record whose text is now empty has its chunks deleted. JSONL lines that do
+not parse are reported and skipped.
+
+The original version of this script stored the built-in samples as pref_0..pref_N
+without source metadata. Ingesting the samples (or --migrate-unscoped) removes
+those rows so they do not sit beside the new content-addressed chunks.
+"""
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import chromadb
+from shared_resources import get_chroma_client, get_embedder, COLLECTION_NAME
+from request_context import DEFAULT_USER_ID
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
 
 # Sample preferences
 user_preferences = [
@@ -17,28 +44,186 @@ user_preferences = [
     "Interested in fitness and wellness products."
 ]
 
+DEFAULT_BATCH_SIZE = 64
+# Ids checked per lookup when removing chunks stored by the original script.
+LEGACY_PROBE = 100
+
 # Optional splitting (if texts are long)
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
-chunks = text_splitter.split_text(" ".join(user_preferences))
-print(f"✅ Created {len(chunks)} text chunks.")
 
-# Initialize persistent Chroma client
-client = chromadb.PersistentClient(path="./chroma_db")
 
-# Create (or get existing) collection
-collection = client.get_or_create_collection(name="user_preferences")
+def _record_text(record):
+    if isinstance(record, dict):
+        return record.get("text") or record.get("preference") or ""
+    return str(record)
+
+
+def read_records(path):
+    """Yield (source_key, text, user_id or None) for each record in a .jsonl or .csv file, one at a time."""
+    name = os.path.basename(path)
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield f"{name}:{row.get('id') or line_no}", _record_text(row), row.get("user_id")
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"⚠️ Skipping {name}:{line_no}: invalid JSON ({e})")
+                    continue
+                is_obj = isinstance(record, dict)
+                record_id = record.get("id") if is_obj else None
+                user_id = record.get("user_id") if is_obj else None
+                yield f"{name}:{record_id or line_no}", _record_text(record), user_id
+
+
+def sample_records():
+    for i, text in enumerate(user_preferences):
+        yield f"sample:{i}", text, None
+
+
+def chunk_id(source_key: str, chunk: str) -> str:
+    return "pref_" + hashlib.sha1(f"{source_key}\0{chunk}".encode("utf-8")).hexdigest()[:20]
+
+
+def remove_legacy_chunks(collection) -> int:
+    """Delete the pref_0..pref_N chunks written by the original script (no source metadata). Returns the count."""
+    removed, start = 0, 0
+    while True:
+        found = collection.get(ids=[f"pref_{i}" for i in range(start, start + LEGACY_PROBE)], include=["metadatas"])
+        if not found["ids"]:
+            return removed
+        legacy = [cid for cid, meta in zip(found["ids"], found["metadatas"]) if not (meta or {}).get("source")]
+        if legacy:
+            collection.delete(ids=legacy)
+            removed += len(legacy)
+        start += LEGACY_PROBE
+
+
+class PreferenceIngestor:
+    """Embeds and upserts preference chunks in batches, skipping unchanged ones."""
+
+    def __init__(self, collection, embedder, batch_size=DEFAULT_BATCH_SIZE):
+        self.collection = collection
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self._batch = []     # (id, chunk, metadata)
+        self._sources = {}   # source_key -> ids of its current chunks (records in the open batch)
+        self.stats = {"records": 0, "chunks": 0, "unchanged": 0, "written": 0, "stale_removed": 0,
+                      "legacy_removed": 0}
+        self._started = time.perf_counter()
+
+    def add_record(self, source_key: str, text: str, user_id: str = DEFAULT_USER_ID):
+        text = (text or "").strip()
+        # Partition by user: the same file record for two users is two sources
+        source_key = f"{user_id}/{source_key}"
+        # An empty record keeps no chunks, so flush() deletes whatever it had before
+        chunks = text_splitter.split_text(text) if text else []
+        ids = set()
+        for chunk in chunks:
+            cid = chunk_id(source_key, chunk)
+            if cid in ids:
+                continue
+            ids.add(cid)
+            self._batch.append((cid, chunk, {"source": source_key, "user_id": user_id}))
+        self._sources[source_key] = ids
+        self.stats["records"] += 1
+        # Records are never split across batches, so stale detection sees all of a record's chunks
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._batch and not self._sources:
+            return
+        batch, sources = self._batch, self._sources
+        self._batch, self._sources = [], {}
+
+        ids = [cid for cid, _, _ in batch]
+        existing = set(self.collection.get(ids=ids, include=[])["ids"]) if ids else set()
+        new = [item for item in batch if item[0] not in existing]
+        if new:
+            embeddings = self.embedder.encode([chunk for _, chunk, _ in new], batch_size=self.batch_size).tolist()
+            self.collection.upsert(
+                ids=[cid for cid, _, _ in new],
+                documents=[chunk for _, chunk, _ in new],
+                embeddings=embeddings,
+                metadatas=[meta for _, _, meta in new],
+            )
+
+        # Chunks left over from earlier versions of these records
+        stored = self.collection.get(where={"source": {"$in": list(sources)}}, include=["metadatas"])
+        stale = [cid for cid, meta in zip(stored["ids"], stored["metadatas"])
+                 if cid not in sources.get((meta or {}).get("source"), ())]
+        if stale:
+            self.collection.delete(ids=stale)
+
+        self.stats["chunks"] += len(batch)
+        self.stats["unchanged"] += len(batch) - len(new)
+        self.stats["written"] += len(new)
+        self.stats["stale_removed"] += len(stale)
+        self._report()
+
+    def _report(self):
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        s = self.stats
+        print(
+            f"… {s['records']} records, {s['chunks']} chunks "
+            f"({s['written']} written, {s['unchanged']} unchanged, {s['stale_removed']} stale removed) "
+            f"— {s['chunks'] / elapsed:.1f} chunks/s"
+        )
+
+
+def ingest(records, batch_size=DEFAULT_BATCH_SIZE, user_id=DEFAULT_USER_ID) -> dict:
+    """
+    Ingest an iterable of (source_key, text, user_id) records; returns the ingestion stats.
+
+    Records whose user_id is None belong to `user_id`.
+    """
+    # Shared persistent Chroma client
+    collection = get_chroma_client().get_or_create_collection(name=COLLECTION_NAME)
+    # Embedding model (cached: re-ingesting unchanged chunks skips the model)
+    embedder = get_embedder()
+
+    ingestor = PreferenceIngestor(collection, embedder, batch_size)
+    replaces_legacy = False
+    for source_key, text, record_user in records:
+        replaces_legacy = replaces_legacy or source_key.startswith("sample:")
+        ingestor.add_record(source_key, text, record_user or user_id)
+    ingestor.flush()
+    if replaces_legacy:
+        # The samples are now stored under content-addressed ids; drop the original script's copies
+        ingestor.stats["legacy_removed"] = remove_legacy_chunks(collection)
+    return ingestor.stats
+
 
-# Embedding model
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest user preferences into ChromaDB.")
+    parser.add_argument("files", nargs="*", help=".jsonl or .csv preference files (default: built-in samples)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--user-id", default=DEFAULT_USER_ID, help="owner of records without a user_id")
+    parser.add_argument("--migrate-unscoped", action="store_true",
+                        help="assign --user-id to stored preferences that have no user_id, then exit")
+    args = parser.parse_args()
 
-# Create embeddings
-embeddings = embedder.encode(chunks).tolist()
+    if args.migrate_unscoped:
+        from memory_manager import migrate_unscoped_preferences
+        print(f"✅ Assigned user '{args.user_id}' to {migrate_unscoped_preferences(args.user_id)} preferences.")
+        raise SystemExit(0)
 
-# Add to Chroma
-collection.add(
-    documents=chunks,
-    embeddings=embeddings,
-    ids=[f"pref_{i}" for i in range(len(chunks))]
-)
+    def _all_records():
+        if not args.files:
+            yield from sample_records()
+        for path in args.files:
+            yield from read_records(path)
 
-print("✅ User preferences added to ChromaDB!")
\ No newline at end of file
+    started = time.perf_counter()
+    stats = ingest(_all_records(), batch_size=args.batch_size, user_id=args.user_id)
+    elapsed = time.perf_counter() - started
+    print(f"✅ Ingested {stats['chunks']} chunks from {stats['records']} records in {elapsed:.1f}s "
+          f"({stats['chunks'] / max(elapsed, 1e-9):.1f} chunks/s).")
+    print(f"Embedding cache: {get_embedder().stats()}")
@@ -0,0 +1,427 @@
+# vector_index.py
+"""
+In-process vector index backends for preference retrieval.
+
+ChromaDB stays the store of record. For small and medium collections a copy
+of the vectors is mirrored into an in-process index so a query is a NumPy
+matrix product (or an HNSW lookup) instead of a Chroma round trip:
+
+  numpy   exact brute force over a normalized matrix, snapshotted to disk and
+          memory-mapped on reload                  (<= NUMPY_MAX_ROWS rows)
+  hnsw    approximate HNSW graph via hnswlib       (<= HNSW_MAX_ROWS rows)
+  chroma  query Chroma directly                    (anything larger)
+
+The backend is picked from the collection size (PREFERENCE_INDEX_BACKEND
+overrides it) and re-picked when the collection crosses a threshold. The
+mirror follows Chroma incrementally: writes made in this process are applied
+directly, and writes from other processes (e.g. the ingestion command),
+metadata updates included, are picked up by the first query after
+SYNC_INTERVAL seconds. Queries in between do not touch Chroma at all.
+
+The in-process backends evaluate equality filters only (`{"key": value}` or
+`{"key": {"$eq": value}}`); queries with any other Chroma operator go to Chroma.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from shared_resources import lazy_resource, get_vectorstore, COLLECTION_NAME
+
+BACKEND = os.getenv("PREFERENCE_INDEX_BACKEND", "auto")  # auto | numpy | hnsw | chroma
+NUMPY_MAX_ROWS = 50_000
+HNSW_MAX_ROWS = 2_000_000
+SYNC_INTERVAL = 30.0
+SNAPSHOT_DIR = "./vector_index"
+_PAGE_SIZE = 5000
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def equality_filters(where) -> dict:
+    """`where` as {key: value} when it only has equality conditions, else None (Chroma must evaluate it)."""
+    filters = {}
+    for key, expected in (where or {}).items():
+        if key.startswith("$"):
+            return None
+        if isinstance(expected, dict):
+            if set(expected) != {"$eq"}:
+                return None
+            expected = expected["$eq"]
+        filters[key] = expected
+    return filters
+
+
+def mmr_select(query_embedding, embeddings, k: int, lambda_mult: float = 0.5) -> list:
+    """Maximal marginal relevance: indices of `k` rows balancing similarity to the query against each other."""
+    if not len(embeddings) or k <= 0:
+        return []
+    vectors = _normalize(embeddings)
+    relevance = vectors @ _normalize(query_embedding)[0]
+    selected = [int(np.argmax(relevance))]
+    redundancy = vectors @ vectors[selected[0]]
+    while len(selected) < min(k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+class NumpyIndex:
+    """Exact cosine search over a normalized float32 matrix; `where` is an equality_filters() dict."""
+
+    name = "numpy"
+
+    def __init__(self):
+        self._matrix = None  # (rows, dim); a read-only memmap right after load()
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids, self._docs, self._metas = [], [], []
+        self._rows = {}
+        self._columns = {}   # metadata key -> object array, built on demand for filtering
+
+    def __len__(self):
+        return int(self._alive.sum())
+
+    def metadatas(self):
+        """{id: metadata} of the live rows."""
+        return {i: m for i, m, alive in zip(self._ids, self._metas, self._alive) if alive}
+
+    def add(self, ids, embeddings, documents, metadatas):
+        vectors = _normalize(embeddings)
+        fresh = []
+        for i, doc_id in enumerate(ids):
+            row = self._rows.get(doc_id)
+            if row is None:
+                fresh.append(i)
+                continue
+            if not self._matrix.flags.writeable:
+                self._matrix = np.array(self._matrix)
+            self._matrix[row] = vectors[i]
+            self._docs[row], self._metas[row] = documents[i], metadatas[i] or {}
+            self._alive[row] = True
+        if fresh:
+            start = len(self._ids)
+            block = vectors[fresh]
+            self._matrix = block if self._matrix is None else np.vstack([self._matrix, block])
+            self._alive = np.concatenate([self._alive, np.ones(len(fresh), dtype=bool)])
+            for offset, i in enumerate(fresh):
+                self._rows[ids[i]] = start + offset
+                self._ids.append(ids[i])
+                self._docs.append(documents[i])
+                self._metas.append(metadatas[i] or {})
+        self._columns.clear()
+
+    def delete(self, ids):
+        for doc_id in ids:
+            row = self._rows.get(doc_id)
+            if row is not None:
+                self._alive[row] = False
+
+    def _column(self, key):
+        if key not in self._columns:
+            self._columns[key] = np.array([m.get(key) for m in self._metas], dtype=object)
+        return self._columns[key]
+
+    def query(self, embedding, k, where=None):
+        if self._matrix is None or not len(self):
+            return []
+        mask = self._alive.copy()
+        for key, expected in (where or {}).items():
+            mask &= self._column(key) == expected
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        query = _normalize(embedding)[0]
+        if len(candidates) * 4 < len(mask):
+            # Selective filter (e.g. one user's rows): only score the candidate rows
+            scores = self._matrix[candidates] @ query
+        else:
+            scores = (self._matrix @ query)[candidates]
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[candidates[t]], self._docs[candidates[t]], self._metas[candidates[t]], float(scores[t]))
+                for t in top]
+
+    def save(self, path):
+        # Write-then-rename: a live index may still be memory-mapping the previous snapshot
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".npy.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self._matrix if self._matrix is not None else np.zeros((0, 0))))
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"ids": self._ids, "documents": self._docs, "metadatas": self._metas,
+                       "alive": self._alive.tolist()}, f)
+        os.replace(path + ".npy.tmp", path + ".npy")
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        index._matrix = np.load(path + ".npy", mmap_mode="r")
+        index._ids, index._docs, index._metas = meta["ids"], meta["documents"], meta["metadatas"]
+        index._alive = np.array(meta["alive"], dtype=bool)
+        index._rows = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        return index
+
+
+class HnswIndex:
+    """Approximate cosine search with hnswlib; metadata filters are applied inside the graph search."""
+
+    name = "hnsw"
+
+    def __init__(self, dim, capacity=1024, ef_construction=200, m=16, ef=64):
+        self.dim = dim
+        self.ef = ef
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(max_elements=capacity, ef_construction=ef_construction, M=m)
+        self._index.set_ef(ef)
+        self._labels = {}  # id -> label
+        self._entries = []  # label -> (id, document, metadata, alive)
+        self._groups = {}   # metadata key -> {value: set of live labels}, built on demand
+
+    def __len__(self):
+        return len(self._labels)
+
+    def metadatas(self):
+        """{id: metadata} of the live rows."""
+        return {doc_id: self._entries[label][2] for doc_id, label in self._labels.items()}
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.delete(ids)  # re-added ids get fresh labels
+        start = len(self._entries)
+        needed = start + len(ids)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        labels = np.arange(start, needed)
+        self._index.add_items(_normalize(embeddings), labels)
+        for label, doc_id, doc, meta in zip(labels, ids, documents, metadatas):
+            self._labels[doc_id] = int(label)
+            self._entries.append([doc_id, doc, meta or {}, True])
+        self._groups.clear()
+
+    def delete(self, ids):
+        for doc_id in ids:
+            label = self._labels.pop(doc_id, None)
+            if label is not None:
+                self._index.mark_deleted(label)
+                self._entries[label][3] = False
+                self._groups.clear()
+
+    def _allowed(self, where):
+        allowed = None
+        for key, expected in where.items():
+            if key not in self._groups:
+                groups = {}
+                for label in self._labels.values():
+                    groups.setdefault(self._entries[label][2].get(key), set()).add(label)
+                self._groups[key] = groups
+            labels = self._groups[key].get(expected, set())
+            allowed = labels if allowed is None else allowed & labels
+        return allowed
+
+    def query(self, embedding, k, where=None):
+        allowed_set = self._allowed(where) if where else set(self._labels.values())
+        allowed = list(allowed_set)
+        if not allowed:
+            return []
+        k = min(k, len(allowed))
+        self._index.set_ef(max(self.ef, k))
+        try:
+            labels, distances = self._index.knn_query(_normalize(embedding), k=k, filter=allowed_set.__contains__)
+        except RuntimeError:
+            # Very selective filters can starve the graph walk; score the allowed rows exactly instead
+            vectors = _normalize(self._index.get_items(allowed))
+            scores = vectors @ _normalize(embedding)[0]
+            order = np.argsort(-scores)[:k]
+            return [(*self._entries[allowed[i]][:3], float(scores[i])) for i in order]
+        return [(*self._entries[int(label)][:3], 1.0 - float(dist)) for label, dist in zip(labels[0], distances[0])]
+
+
+class ChromaIndex:
+    """Pass-through to the Chroma collection (no in-process copy)."""
+
+    name = "chroma"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __len__(self):
+        return self.collection.count()
+
+    def metadatas(self):
+        return None  # Chroma is the store itself; nothing to mirror
+
+    def add(self, ids, embeddings, documents, metadatas):
+        pass
+
+    def delete(self, ids):
+        pass
+
+    def query(self, embedding, k, where=None):
+        res = self.collection.query(
+            query_embeddings=[list(map(float, np.asarray(embedding).ravel()))],
+            n_results=k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [(doc_id, doc, meta or {}, -float(dist)) for doc_id, doc, meta, dist in
+                zip(res["ids"][0], res["documents"][0], res["metadatas"][0], res["distances"][0])]
+
+
+def choose_backend(count: int) -> str:
+    if BACKEND != "auto":
+        return BACKEND
+    if count <= NUMPY_MAX_ROWS:
+        return "numpy"
+    if hnswlib is not None and count <= HNSW_MAX_ROWS:
+        return "hnsw"
+    return "chroma"
+
+
+class PreferenceIndex:
+    """Keeps the chosen in-process backend in step with the Chroma collection."""
+
+    def __init__(self, collection, snapshot_path=None):
+        self.collection = collection
+        self.snapshot_path = snapshot_path
+        self._lock = threading.RLock()
+        self._last_sync = 0.0
+        self.backend = None
+        self._load_or_build()
+
+    @property
+    def backend_name(self):
+        return self.backend.name
+
+    def _pages(self, ids=None):
+        """Yield (ids, embeddings, documents, metadatas) pages from Chroma."""
+        include = ["embeddings", "documents", "metadatas"]
+        if ids is not None:
+            for start in range(0, len(ids), _PAGE_SIZE):
+                page = self.collection.get(ids=ids[start:start + _PAGE_SIZE], include=include)
+                yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+            return
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=_PAGE_SIZE, offset=offset)
+            if not len(page["ids"]):
+                return
+            yield page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+            offset += len(page["ids"])
+
+    def _remote_metadatas(self) -> dict:
+        """{id: metadata} of every row in Chroma, read page by page."""
+        remote, offset = {}, 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=_PAGE_SIZE, offset=offset)
+            if not len(page["ids"]):
+                return remote
+            for doc_id, meta in zip(page["ids"], page["metadatas"]):
+                remote[doc_id] = meta or {}
+            offset += len(page["ids"])
+
+    def _new_backend(self, name):
+        if name == "chroma":
+            return ChromaIndex(self.collection)
+        if name == "hnsw":
+            if hnswlib is None:
+                raise ImportError("PREFERENCE_INDEX_BACKEND=hnsw requires the hnswlib package.")
+            # Dimension comes from the first stored vector
+            first = self.collection.get(include=["embeddings"], limit=1)["embeddings"]
+            dim = len(first[0]) if len(first) else 384
+            return HnswIndex(dim, capacity=max(1024, self.collection.count()))
+        return NumpyIndex()
+
+    def _load_or_build(self):
+        count = self.collection.count()
+        name = choose_backend(count)
+        if name == "numpy" and self.snapshot_path and os.path.exists(self.snapshot_path + ".json"):
+            try:
+                self.backend = NumpyIndex.load(self.snapshot_path)
+                self.sync(force=True)  # id-level diff against Chroma
+                return
+            except Exception as e:
+                print(f"Ignoring unreadable vector index snapshot: {e}")
+        self.rebuild(name)
+
+    def rebuild(self, name=None):
+        with self._lock:
+            count = self.collection.count()
+            name = name or choose_backend(count)
+            started = time.perf_counter()
+            backend = self._new_backend(name)
+            if name != "chroma":
+                for page in self._pages():
+                    backend.add(*page)
+            self.backend = backend
+            self._last_sync = time.monotonic()
+            if name == "numpy" and self.snapshot_path:
+                backend.save(self.snapshot_path)
+            print(f"Preference index: {name} backend over {count} rows built in {time.perf_counter() - started:.2f}s")
+
+    def sync(self, force=False):
+        """
+        Pick up writes made outside this process: added and deleted rows, and metadata updates.
+
+        A no-op until SYNC_INTERVAL has passed since the last sync, unless forced.
+        """
+        if not force and time.monotonic() - self._last_sync < SYNC_INTERVAL:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._last_sync < SYNC_INTERVAL:
+                return  # another thread synced while we waited
+            if choose_backend(self.collection.count()) != self.backend.name:
+                self.rebuild()
+                return
+            local = self.backend.metadatas()
+            if local is not None:
+                remote = self._remote_metadatas()
+                removed = [doc_id for doc_id in local if doc_id not in remote]
+                # New rows, and rows whose metadata changed (e.g. tagged by migrate_unscoped_preferences)
+                changed = [doc_id for doc_id, meta in remote.items() if local.get(doc_id) != meta]
+                if removed:
+                    self.backend.delete(removed)
+                for page in self._pages(changed):
+                    self.backend.add(*page)
+                if (changed or removed) and self.backend.name == "numpy" and self.snapshot_path:
+                    self.backend.save(self.snapshot_path)
+            self._last_sync = time.monotonic()
+
+    def add(self, ids, embeddings, documents, metadatas):
+        """Mirror rows this process just wrote to Chroma."""
+        with self._lock:
+            self.backend.add(ids, embeddings, documents, metadatas)
+
+    def query(self, embedding, k=3, where=None) -> list:
+        """Top-k Documents for `embedding`, filtered by `where` on metadata."""
+        self.sync()
+        filters = equality_filters(where)
+        with self._lock:
+            if filters is None or self.backend.name == "chroma":
+                hits = ChromaIndex(self.collection).query(embedding, k, where)
+            else:
+                hits = self.backend.query(embedding, k, filters)
+        return [Document(page_content=doc, metadata=dict(meta)) for _, doc, meta, _ in hits]
+
+
+@lazy_resource("preference_index")
+def get_preference_index() -> PreferenceIndex:
+    return PreferenceIndex(get_vectorstore()._collection, os.path.join(SNAPSHOT_DIR, COLLECTION_NAME))
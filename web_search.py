@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from serpapi.google_search import GoogleSearch
 from langchain_core.tools import tool
+from tracing import span
 
 # Load .env file
 load_dotenv()
@@ -31,8 +32,10 @@ def web_search_tool(query: str) -> str:
     "num": 3
     }
 
-    search = GoogleSearch(params)
-    results = search.get_dict() or {}
+    with span("serpapi", "search", query=query) as s:
+        search = GoogleSearch(params)
+        results = search.get_dict() or {}
+        s.attrs["organic_results"] = len(results.get("organic_results") or [])
     # print(results) # debug
 
     # organic_results may not always be present depending on SerpAPI response or errors.